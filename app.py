@@ -8,7 +8,13 @@ from chatarena.arena import Arena, TooManyInvalidActions
 from chatarena.backends import BACKEND_REGISTRY
 from chatarena.backends.human import HumanBackendError
 from chatarena.config import ArenaConfig
-from chatarena.database import SupabaseDB, log_arena, log_messages, supabase_available
+from chatarena.database import (
+    BatchedDBWriter,
+    SupabaseDB,
+    log_arena,
+    log_messages,
+    supabase_available,
+)
 from chatarena.environments import ENV_REGISTRY
 from chatarena.message import Message
 
@@ -53,7 +59,8 @@ def load_examples():
 
 EXAMPLE_REGISTRY = load_examples()
 
-DB = SupabaseDB() if supabase_available else None
+# Logging runs in a background thread, so the UI never waits for the database
+DB = BatchedDBWriter(SupabaseDB()) if supabase_available else None
 
 
 def get_moderator_components(visible=True):
@@ -0,0 +1,283 @@
+"""
+Benchmarks of the framework overhead, with the stub backend (no model or network call).
+
+Each scenario measures one hot path for a history length and a number of players:
+    - message_pool: MessagePool.get_visible_messages
+    - openai_prompt: the prompt assembly of OpenAIChat.query (the API call is replaced by a fixed response)
+    - arena_step: Arena.step in a conversation
+    - pettingzoo_step: observe() and step() of the PettingZoo compatibility wrapper
+
+For each scenario, the report gives the operations per second, the memory allocated by the setup (the history)
+and the peak memory allocated by an operation. Results can be saved as a JSON baseline and compared to a previous one:
+
+    python benchmarks/bench_overhead.py --output benchmarks/baselines/overhead.json
+    python benchmarks/bench_overhead.py --compare benchmarks/baselines/overhead.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+# OpenAIChat needs an API key to be constructed, the benchmark never sends a request
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chatarena.agent import Player  # noqa: E402
+from chatarena.arena import Arena  # noqa: E402
+from chatarena.backends import StubBackend  # noqa: E402
+from chatarena.environments.conversation import Conversation  # noqa: E402
+from chatarena.message import Message, MessagePool  # noqa: E402
+
+HISTORY_LENGTHS = [10, 1_000, 100_000]
+PLAYER_COUNTS = [2, 20, 200]
+QUICK_HISTORY_LENGTHS = [10, 1_000]
+QUICK_PLAYER_COUNTS = [2, 20]
+
+
+def make_history(num_messages: int, player_names: List[str]) -> List[Message]:
+    """One message per turn, with every fourth message only visible to its author."""
+    return [
+        Message(
+            agent_name=player_names[i % len(player_names)],
+            content=f"Message {i} with a few words of content.",
+            turn=i,
+            visible_to="all" if i % 4 else [player_names[i % len(player_names)]],
+        )
+        for i in range(num_messages)
+    ]
+
+
+def make_arena(num_players: int) -> Arena:
+    player_names = [f"Player {i}" for i in range(num_players)]
+    players = [
+        Player(name=name, role_desc="You chat.", backend=StubBackend())
+        for name in player_names
+    ]
+    return Arena(players=players, environment=Conversation(player_names=player_names))
+
+
+def set_history(environment: Conversation, num_messages: int):
+    """
+    Set the history of the conversation to num_messages messages.
+
+    The steps add messages, so the history is truncated back before each step to keep its length constant.
+    """
+    pool = environment.message_pool
+    if len(pool._messages) > num_messages:
+        del pool._messages[num_messages:]
+    else:
+        for message in make_history(num_messages, environment.player_names):
+            pool.append_message(message)
+    environment._current_turn = num_messages
+    environment._next_player_idx = num_messages % environment.num_players
+
+
+# A scenario builds its state and returns the operation to measure
+Scenario = Callable[[int, int], Callable[[], object]]
+
+
+def message_pool_scenario(num_messages: int, num_players: int):
+    player_names = [f"Player {i}" for i in range(num_players)]
+    pool = MessagePool()
+    for message in make_history(num_messages, player_names):
+        pool.append_message(message)
+    return lambda: pool.get_visible_messages(player_names[0], turn=num_messages)
+
+
+def openai_prompt_scenario(num_messages: int, num_players: int):
+    try:
+        from chatarena.backends.openai import OpenAIChat
+    except ImportError:
+        return None
+
+    class PromptOnlyOpenAIChat(OpenAIChat):
+        def _get_response(self, messages, *args, **kwargs):
+            return "Response."
+
+    backend = PromptOnlyOpenAIChat()
+    player_names = [f"Player {i}" for i in range(num_players)]
+    history = make_history(num_messages, player_names)
+    return lambda: backend.query(
+        agent_name=player_names[0], role_desc="You chat.", history_messages=history
+    )
+
+
+def arena_step_scenario(num_messages: int, num_players: int):
+    arena = make_arena(num_players)
+    set_history(arena.environment, num_messages)
+
+    def step():
+        set_history(arena.environment, num_messages)
+        arena.step()
+
+    return step
+
+
+def pettingzoo_step_scenario(num_messages: int, num_players: int):
+    try:
+        from chatarena.pettingzoo_compatibility import PettingZooCompatibilityV0
+    except ImportError:
+        return None
+
+    arena = make_arena(num_players)
+    env = PettingZooCompatibilityV0(env=arena, max_turns=10**9)
+    env.reset()
+    set_history(arena.environment, num_messages)
+
+    def step():
+        set_history(arena.environment, num_messages)
+        env.agent_selection = arena.environment.get_next_player()
+        env.observe(env.agent_selection)
+        env.step("Hello.")
+
+    return step
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    "message_pool": message_pool_scenario,
+    "openai_prompt": openai_prompt_scenario,
+    "arena_step": arena_step_scenario,
+    "pettingzoo_step": pettingzoo_step_scenario,
+}
+
+
+def measure_speed(op: Callable[[], object], min_time: float) -> Tuple[int, float]:
+    """Run the operation for at least min_time seconds, and return the number of runs and the elapsed time."""
+    num_ops = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_time:
+        op()
+        num_ops += 1
+        elapsed = time.perf_counter() - start
+    return num_ops, elapsed
+
+
+def run_scenario(
+    scenario: Scenario, num_messages: int, num_players: int, min_time: float
+):
+    gc.collect()
+    tracemalloc.start()
+    op = scenario(num_messages, num_players)
+    if op is None:
+        tracemalloc.stop()
+        return None
+    setup_memory = tracemalloc.get_traced_memory()[0]
+    # The peak memory of an operation, after a warm-up run
+    op()
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    op()
+    op_memory = tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+
+    # The speed is measured without tracemalloc, which slows down allocations
+    num_ops, elapsed = measure_speed(op, min_time)
+    return {
+        "messages": num_messages,
+        "players": num_players,
+        "ops_per_sec": num_ops / elapsed,
+        "setup_memory_bytes": setup_memory,
+        "op_peak_memory_bytes": op_memory,
+    }
+
+
+def run_benchmarks(
+    names: List[str],
+    history_lengths: List[int],
+    player_counts: List[int],
+    min_time: float,
+) -> Dict[str, Dict]:
+    results = {}
+    for name in names:
+        for num_messages in history_lengths:
+            for num_players in player_counts:
+                key = f"{name}[messages={num_messages},players={num_players}]"
+                result = run_scenario(
+                    SCENARIOS[name], num_messages, num_players, min_time
+                )
+                if result is None:
+                    print(f"{key}: skipped (missing dependency)")
+                    continue
+                results[key] = result
+                print(
+                    f"{key}: {result['ops_per_sec']:,.1f} ops/s, "
+                    f"setup {result['setup_memory_bytes'] / 2**20:.1f} MiB, "
+                    f"op peak {result['op_peak_memory_bytes'] / 2**10:.1f} KiB"
+                )
+    return results
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float):
+    """Print the changes from the baseline, and return the scenarios slower by more than the threshold."""
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        ratio = result["ops_per_sec"] / baseline[key]["ops_per_sec"]
+        memory_ratio = (result["op_peak_memory_bytes"] + 1) / (
+            baseline[key]["op_peak_memory_bytes"] + 1
+        )
+        flag = "REGRESSION" if ratio < 1 - threshold else ""
+        print(f"{key}: {ratio:.2f}x speed, {memory_ratio:.2f}x op memory {flag}")
+        if flag:
+            regressions.append(key)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS))
+    parser.add_argument(
+        "--quick",
+        action="store_true",
+        help="only the small history lengths and player counts",
+    )
+    parser.add_argument("--min-time", type=float, default=0.2)
+    parser.add_argument("--output", help="save the results as a JSON baseline")
+    parser.add_argument("--compare", help="compare the results to a JSON baseline")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="relative slowdown reported as a regression",
+    )
+    args = parser.parse_args()
+
+    results = run_benchmarks(
+        args.scenarios,
+        QUICK_HISTORY_LENGTHS if args.quick else HISTORY_LENGTHS,
+        QUICK_PLAYER_COUNTS if args.quick else PLAYER_COUNTS,
+        args.min_time,
+    )
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "results": results,
+                },
+                f,
+                indent=2,
+                sort_keys=True,
+            )
+            f.write("\n")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
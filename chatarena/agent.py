@@ -2,18 +2,27 @@ import logging
 import re
 import uuid
 from abc import abstractmethod
-from typing import List, Union
+from typing import List, Optional, Tuple, Union
 
 from tenacity import RetryError
 
 from .backends import IntelligenceBackend, load_backend
-from .config import AgentConfig, BackendConfig, Configurable
+from .config import AgentConfig, BackendConfig, Config, Configurable
+from .memory import RollingSummaryMemory
 from .message import SYSTEM_NAME, Message
+from .terminal_checks import TerminalCheck, load_terminal_check
+from .tracing import span
 
 # A special signal sent by the player to indicate that it is not possible to continue the conversation, and it requests to end the conversation.
 # It contains a random UUID string to avoid being exploited by any of the players.
 SIGNAL_END_OF_CONVERSATION = f"<<<<<<END_OF_CONVERSATION>>>>>>{uuid.uuid4()}"
 
+# The moderator appends its terminal decision on a line of this form when the response and the check are fused
+TERMINAL_DECISION_PATTERN = re.compile(
+    r"^\s*TERMINAL\s*:\s*(\S+)\s*$", re.IGNORECASE | re.MULTILINE
+)
+AFFIRMATIVE_PATTERN = r"yes|y|yea|yeah|yep|yup|sure|ok|okay|alright"
+
 
 class Agent(Configurable):
     """An abstract base class for all the agents in the chatArena environment."""
@@ -52,6 +61,7 @@ class Player(Agent):
         role_desc: str,
         backend: Union[BackendConfig, IntelligenceBackend],
         global_prompt: str = None,
+        memory: Union[Config, RollingSummaryMemory] = None,
         **kwargs,
     ):
         """
@@ -62,6 +72,7 @@ class Player(Agent):
             role_desc (str): Description of the player's role.
             backend (Union[BackendConfig, IntelligenceBackend]): The backend that will be used for decision making. It can be either a LLM backend or a Human backend.
             global_prompt (str): A universal prompt that applies to all players. Defaults to None.
+            memory (Union[Config, RollingSummaryMemory]): Optional memory that summarizes old messages before they are sent to the backend. Defaults to None.
         """
 
         if isinstance(backend, BackendConfig):
@@ -74,11 +85,20 @@ class Player(Agent):
                 f"backend must be a BackendConfig or an IntelligenceBackend, but got {type(backend)}"
             )
 
+        if isinstance(memory, dict):
+            memory = RollingSummaryMemory.from_config(memory)
+        elif memory is not None and not isinstance(memory, RollingSummaryMemory):
+            raise ValueError(
+                f"memory must be a Config or a RollingSummaryMemory, but got {type(memory)}"
+            )
+
         assert (
             name != SYSTEM_NAME
         ), f"Player name cannot be {SYSTEM_NAME}, which is reserved for the system."
 
         # Register the fields in the _config
+        if memory is not None:
+            kwargs["memory"] = memory.to_config()
         super().__init__(
             name=name,
             role_desc=role_desc,
@@ -88,14 +108,24 @@ class Player(Agent):
         )
 
         self.backend = backend
+        self.memory = memory
 
     def to_config(self) -> AgentConfig:
-        return AgentConfig(
+        config = AgentConfig(
             name=self.name,
             role_desc=self.role_desc,
             backend=self.backend.to_config(),
             global_prompt=self.global_prompt,
         )
+        if self.memory is not None:
+            config["memory"] = self.memory.to_config()
+        return config
+
+    def _recall(self, observation: List[Message]) -> List[Message]:
+        """Pass the observation through the memory, if the player has one."""
+        if self.memory is None:
+            return observation
+        return self.memory.compress(observation, self.name, backend=self.backend)
 
     def act(self, observation: List[Message]) -> str:
         """
@@ -107,21 +137,58 @@ class Player(Agent):
         Returns:
             str: The action (response) of the player.
         """
-        try:
-            response = self.backend.query(
-                agent_name=self.name,
-                role_desc=self.role_desc,
-                history_messages=observation,
-                global_prompt=self.global_prompt,
-                request_msg=None,
-            )
-        except RetryError as e:
-            err_msg = f"Agent {self.name} failed to generate a response. Error: {e.last_attempt.exception()}. Sending signal to end the conversation."
-            logging.warning(err_msg)
-            response = SIGNAL_END_OF_CONVERSATION + err_msg
+        with span("player.act", player=self.name):
+            with span("player.recall", player=self.name):
+                history_messages = self._recall(observation)
+            try:
+                with span("backend.query", player=self.name):
+                    response = self.backend.query(
+                        agent_name=self.name,
+                        role_desc=self.role_desc,
+                        history_messages=history_messages,
+                        global_prompt=self.global_prompt,
+                        request_msg=None,
+                    )
+            except RetryError as e:
+                err_msg = f"Agent {self.name} failed to generate a response. Error: {e.last_attempt.exception()}. Sending signal to end the conversation."
+                logging.warning(err_msg)
+                response = SIGNAL_END_OF_CONVERSATION + err_msg
 
         return response
 
+    def act_candidates(
+        self, observation: List[Message], num_candidates: int
+    ) -> List[str]:
+        """
+        Generate several candidate actions for the same observation, e.g., to keep the first valid one.
+
+        Parameters:
+            observation (List[Message]): The messages that the player has observed from the environment.
+            num_candidates (int): The number of candidates.
+
+        Returns:
+            List[str]: The candidate actions (responses) of the player.
+        """
+        with span("player.act_candidates", player=self.name, n=num_candidates):
+            with span("player.recall", player=self.name):
+                history_messages = self._recall(observation)
+            try:
+                with span("backend.query", player=self.name):
+                    responses = self.backend.query_candidates(
+                        num_candidates,
+                        agent_name=self.name,
+                        role_desc=self.role_desc,
+                        history_messages=history_messages,
+                        global_prompt=self.global_prompt,
+                        request_msg=None,
+                    )
+            except RetryError as e:
+                err_msg = f"Agent {self.name} failed to generate a response. Error: {e.last_attempt.exception()}. Sending signal to end the conversation."
+                logging.warning(err_msg)
+                responses = [SIGNAL_END_OF_CONVERSATION + err_msg]
+
+        return responses
+
     def __call__(self, observation: List[Message]) -> str:
         return self.act(observation)
 
@@ -141,7 +208,7 @@ class Player(Agent):
             response = self.backend.async_query(
                 agent_name=self.name,
                 role_desc=self.role_desc,
-                history_messages=observation,
+                history_messages=self._recall(observation),
                 global_prompt=self.global_prompt,
                 request_msg=None,
             )
@@ -159,6 +226,8 @@ class Player(Agent):
         This is usually called at the end of each episode.
         """
         self.backend.reset()
+        if self.memory is not None:
+            self.memory.reset()
 
 
 class Moderator(Player):
@@ -174,6 +243,8 @@ class Moderator(Player):
         backend: Union[BackendConfig, IntelligenceBackend],
         terminal_condition: str,
         global_prompt: str = None,
+        terminal_checks: List[Union[Config, TerminalCheck]] = None,
+        llm_check_period: int = 1,
         **kwargs,
     ):
         """
@@ -184,8 +255,22 @@ class Moderator(Player):
             backend (Union[BackendConfig, IntelligenceBackend]): The backend that will be used for decision making.
             terminal_condition (str): The condition that signifies the end of the conversation.
             global_prompt (str): A universal prompt that applies to the moderator. Defaults to None.
+            terminal_checks (List[Union[Config, TerminalCheck]]): Rule-based checks that run before the backend is consulted. Defaults to None.
+            llm_check_period (int): Only consult the backend for the terminal condition every this many checks. Defaults to 1.
         """
+        terminal_checks = [
+            check if isinstance(check, TerminalCheck) else load_terminal_check(check)
+            for check in terminal_checks or []
+        ]
+        assert llm_check_period >= 1, "llm_check_period must be at least 1"
+
         name = "Moderator"
+        # The configs written by to_config include the name, which is always the same
+        kwargs.pop("name", None)
+        if terminal_checks:
+            kwargs["terminal_checks"] = [check.to_config() for check in terminal_checks]
+        if llm_check_period != 1:
+            kwargs["llm_check_period"] = llm_check_period
         super().__init__(
             name=name,
             role_desc=role_desc,
@@ -195,15 +280,55 @@ class Moderator(Player):
         )
 
         self.terminal_condition = terminal_condition
+        self.terminal_checks = terminal_checks
+        self.llm_check_period = llm_check_period
+        self._num_terminal_checks = 0
 
     def to_config(self) -> AgentConfig:
-        return AgentConfig(
+        config = AgentConfig(
             name=self.name,
             role_desc=self.role_desc,
             backend=self.backend.to_config(),
             terminal_condition=self.terminal_condition,
             global_prompt=self.global_prompt,
         )
+        if self.terminal_checks:
+            config["terminal_checks"] = [
+                check.to_config() for check in self.terminal_checks
+            ]
+        if self.llm_check_period != 1:
+            config["llm_check_period"] = self.llm_check_period
+        if self.memory is not None:
+            config["memory"] = self.memory.to_config()
+        return config
+
+    def reset(self):
+        super().reset()
+        for check in self.terminal_checks:
+            check.reset()
+        self._num_terminal_checks = 0
+
+    def _precheck_terminal(self, history: List[Message]) -> Optional[bool]:
+        """
+        Run the cheap checks that may decide the terminal condition without consulting the backend.
+
+        Returns:
+            Optional[bool]: The decision, or None if the backend needs to be consulted.
+        """
+        # If the last message is the signal, then the conversation is over
+        if history and history[-1].content == SIGNAL_END_OF_CONVERSATION:
+            return True
+
+        for check in self.terminal_checks:
+            decision = check(history)
+            if decision is not None:
+                return decision
+
+        # Only consult the backend every llm_check_period checks
+        self._num_terminal_checks += 1
+        if self._num_terminal_checks % self.llm_check_period != 0:
+            return False
+        return None
 
     def is_terminal(self, history: List[Message], *args, **kwargs) -> bool:
         """
@@ -215,9 +340,9 @@ class Moderator(Player):
         Returns:
             bool: True if the conversation is over, otherwise False.
         """
-        # If the last message is the signal, then the conversation is over
-        if history[-1].content == SIGNAL_END_OF_CONVERSATION:
-            return True
+        decision = self._precheck_terminal(history)
+        if decision is not None:
+            return decision
 
         try:
             request_msg = Message(
@@ -239,10 +364,59 @@ class Moderator(Player):
             )
             return True
 
-        if re.match(
-            r"yes|y|yea|yeah|yep|yup|sure|ok|okay|alright", response, re.IGNORECASE
-        ):
+        if re.match(AFFIRMATIVE_PATTERN, response, re.IGNORECASE):
             # print(f"Decision: {response}. Conversation is ended by moderator.")
             return True
         else:
             return False
+
+    def act_and_check_terminal(
+        self, history: List[Message], *args, **kwargs
+    ) -> Tuple[str, bool]:
+        """
+        Generate the moderator response and decide whether the episode is over with a single backend call.
+
+        The moderator is asked to append a `TERMINAL: yes/no` line to its response, which is parsed and removed.
+
+        Parameters:
+            history (List[Message]): The conversation history.
+
+        Returns:
+            Tuple[str, bool]: The moderator response and whether the conversation is over.
+        """
+        # If the last message is the signal, then the conversation is over
+        if history and history[-1].content == SIGNAL_END_OF_CONVERSATION:
+            return "", True
+
+        # When the cheap checks decide, a plain response is enough
+        decision = self._precheck_terminal(history)
+        if decision is not None:
+            return self.act(history), decision
+
+        request_msg = Message(
+            agent_name=self.name,
+            content=f"Now you speak, {self.name}. After your response, add one final line "
+            f"'TERMINAL: yes' or 'TERMINAL: no' answering the following question: {self.terminal_condition}",
+            turn=-1,
+        )
+        try:
+            response = self.backend.query(
+                agent_name=self.name,
+                role_desc=self.role_desc,
+                history_messages=self._recall(history),
+                global_prompt=self.global_prompt,
+                request_msg=request_msg,
+                *args,
+                **kwargs,
+            )
+        except RetryError as e:
+            err_msg = f"Agent {self.name} failed to generate a response. Error: {e.last_attempt.exception()}."
+            logging.warning(err_msg)
+            return SIGNAL_END_OF_CONVERSATION + err_msg, True
+
+        decisions = TERMINAL_DECISION_PATTERN.findall(response)
+        terminal = bool(decisions) and bool(
+            re.match(AFFIRMATIVE_PATTERN, decisions[-1], re.IGNORECASE)
+        )
+        response = TERMINAL_DECISION_PATTERN.sub("", response).strip()
+        return response, terminal
@@ -1,13 +1,24 @@
 import csv
 import json
 import logging
+import os
 import uuid
 from typing import Dict, List, Union
 
 from .agent import Player
 from .backends import Human
+from .checkpoint import (
+    append_checkpoint,
+    messages_to_rows,
+    read_checkpoint,
+    rows_to_messages,
+    write_full_checkpoint,
+)
 from .config import ArenaConfig
 from .environments import Environment, TimeStep, load_environment
+from .message import SYSTEM_NAME, Message
+from .tracing import span
+from .writers import JSONLHistorySink
 
 
 class TooManyInvalidActions(Exception):
@@ -18,7 +29,12 @@ class Arena:
     """Utility class that manages the game environment and players."""
 
     def __init__(
-        self, players: List[Player], environment: Environment, global_prompt: str = None
+        self,
+        players: List[Player],
+        environment: Environment,
+        global_prompt: str = None,
+        history_sink: JSONLHistorySink = None,
+        num_candidates: int = 1,
     ):
         # Create a container for the players and environment and reset the game
         self.players = players
@@ -28,6 +44,16 @@ class Arena:
         self.current_timestep = environment.reset()
         self.uuid = uuid.uuid4()  # Generate a unique id for the game
         self.invalid_actions_retry = 5
+        # Number of candidate actions sampled at once, the first valid one is taken
+        self.num_candidates = num_candidates
+
+        # Messages are streamed to the sink as the game runs
+        self.history_sink = history_sink
+        self._num_logged_messages = 0
+        self._log_history()
+
+        # (path, conversation id, number of messages) of the last checkpoint, for incremental checkpoints
+        self._last_checkpoint = None
 
     @property
     def num_players(self):
@@ -45,29 +71,96 @@ class Arena:
             player.reset()
         # Reset the uuid
         self.uuid = uuid.uuid4()
+        self._num_logged_messages = 0
+        self._log_history()
+        self._last_checkpoint = None
         return self.current_timestep
 
+    def close(self):
+        """Release the threads of the environment and of the player backends."""
+        self.environment.close()
+        for player in self.players:
+            player.backend.close()
+
+    def attach_history_sink(self, history_sink: JSONLHistorySink):
+        """Stream the messages of the game to a sink, starting with the messages already in the history."""
+        self.history_sink = history_sink
+        self._num_logged_messages = 0
+        self._log_history()
+
+    def _log_history(self):
+        """Write the messages added since the previous call to the history sink."""
+        if self.history_sink is None:
+            return
+        # Read the message pool directly when possible, as get_observation may have side effects
+        message_pool = getattr(self.environment, "message_pool", None)
+        if message_pool is not None:
+            messages = message_pool.get_all_messages()
+        else:
+            messages = self.environment.get_observation()
+        if len(messages) < self._num_logged_messages:  # the history has been reset
+            self._num_logged_messages = 0
+        self.history_sink.write_messages(
+            messages[self._num_logged_messages :], arena_id=str(self.uuid)
+        )
+        self._num_logged_messages = len(messages)
+
     def step(self) -> TimeStep:
         """Take a step in the game: one player takes an action and the environment updates."""
+        with span("arena.step"):
+            return self._step()
+
+    def _step(self) -> TimeStep:
         player_name = self.environment.get_next_player()
         player = self.name_to_player[player_name]  # get the player object
-        observation = self.environment.get_observation(
-            player_name
-        )  # get the observation for the player
+        with span("environment.get_observation", player=player_name):
+            observation = self.environment.get_observation(
+                player_name
+            )  # get the observation for the player
 
         timestep = None
-        for i in range(
-            self.invalid_actions_retry
+        rejected_actions = []
+        num_attempts = 0
+        while (
+            num_attempts < self.invalid_actions_retry
         ):  # try to take an action for a few times
-            action = player(observation)  # take an action
-            if self.environment.check_action(action, player_name):  # action is valid
-                timestep = self.environment.step(
-                    player_name, action
-                )  # update the environment
+            # Sample several candidates at once (counted as attempts), so that an invalid action costs no extra round-trip
+            num_candidates = min(
+                self.num_candidates, self.invalid_actions_retry - num_attempts
+            )
+            if num_candidates > 1:
+                actions = player.act_candidates(observation, num_candidates)
+            else:
+                actions = [player(observation)]  # take an action
+            num_attempts += num_candidates
+
+            for action in actions:
+                with span("environment.check_action", player=player_name):
+                    is_valid = self.environment.check_action(action, player_name)
+                if is_valid:  # action is valid
+                    with span("environment.step", player=player_name):
+                        timestep = self.environment.step(
+                            player_name, action
+                        )  # update the environment
+                    break
+                else:  # action is invalid
+                    logging.warning(f"{player_name} made an invalid action {action}")
+                    rejected_actions.append(action)
+            if timestep is not None:
                 break
-            else:  # action is invalid
-                logging.warning(f"{player_name} made an invalid action {action}")
-                continue
+
+            # Tell the player why its actions were rejected, without adding the feedback to the history
+            feedback = self.environment.get_invalid_action_feedback(
+                rejected_actions, player_name
+            )
+            observation = list(observation) + [
+                Message(
+                    agent_name=SYSTEM_NAME,
+                    content=feedback,
+                    turn=observation[-1].turn if observation else 0,
+                    visible_to=player_name,
+                )
+            ]
 
         if (
             timestep is None
@@ -76,6 +169,7 @@ class Arena:
             logging.warning(warning_msg)
             raise TooManyInvalidActions(warning_msg)
 
+        self._log_history()
         return timestep
 
     def next_is_human(self):
@@ -122,7 +216,12 @@ class Arena:
         ] = player_names  # add the player names to the environment config
         env = load_environment(config.environment)
 
-        return cls(players, env, global_prompt=global_prompt)
+        return cls(
+            players,
+            env,
+            global_prompt=global_prompt,
+            num_candidates=config.get("num_candidates", 1),
+        )
 
     def to_config(self) -> ArenaConfig:
         """Convert the arena to a config."""
@@ -131,11 +230,14 @@ class Arena:
         #     "environment": self.environment.to_config(),
         #     "global_prompt": self.global_prompt
         # }
-        return ArenaConfig(
+        config = ArenaConfig(
             players=[player.to_config() for player in self.players],
             environment=self.environment.to_config(),
             global_prompt=self.global_prompt,
         )
+        if self.num_candidates != 1:
+            config["num_candidates"] = self.num_candidates
+        return config
 
     def launch_cli(self, max_steps: int = None, interactive: bool = True):
         """Launch the command line interface."""
@@ -149,14 +251,88 @@ class Arena:
         config = self.to_config()
         config.save(path)
 
+    def checkpoint(self, path: str, incremental: bool = True):
+        """
+        Save the state of the game (messages, environment and backend states) to a checkpoint file.
+
+        With incremental checkpoints, checkpointing the same game to the same path again only appends
+        the messages added since the previous checkpoint, so checkpointing every step stays cheap.
+        """
+        message_pool = self.environment.message_pool
+        # Get the environment state first, as it may record pending messages (e.g., a pipelined moderator)
+        environment_state = self.environment.get_state()
+        messages = message_pool.get_all_messages()
+        record = {
+            "uuid": self.uuid,
+            "environment": environment_state,
+            "backends": {
+                player.name: player.backend.get_state() for player in self.players
+            },
+        }
+
+        last_checkpoint = self._last_checkpoint
+        if (
+            incremental
+            and last_checkpoint is not None
+            and last_checkpoint[:2] == (path, message_pool.conversation_id)
+            and last_checkpoint[2] <= len(messages)
+            and os.path.exists(path)
+        ):
+            record["messages"] = messages_to_rows(messages[last_checkpoint[2] :])
+            append_checkpoint(path, record)
+        else:
+            record["config"] = self.to_config()
+            record["conversation_id"] = message_pool.conversation_id
+            record["messages"] = messages_to_rows(messages)
+            write_full_checkpoint(path, record)
+        self._last_checkpoint = (path, message_pool.conversation_id, len(messages))
+
+    def restore(self, path: str):
+        """
+        Restore the state of the game from a checkpoint file written by `checkpoint`.
+
+        The arena must have the same players and environment as the checkpointed one (see `from_checkpoint`).
+        """
+        records = read_checkpoint(path)
+        state = records[-1]
+
+        message_pool = self.environment.message_pool
+        message_pool.reset()
+        for record in records:
+            message_pool._messages.extend(rows_to_messages(record["messages"]))
+        message_pool.conversation_id = records[0]["conversation_id"]
+
+        self.environment.set_state(state["environment"])
+        for player in self.players:
+            if player.name in state["backends"]:
+                player.backend.set_state(state["backends"][player.name])
+        self.uuid = state["uuid"]
+        self.current_timestep = TimeStep(
+            observation=self.environment.get_observation(),
+            reward=self.environment.get_zero_rewards(),
+            terminal=False,
+        )
+
+        # The restored messages were logged before the checkpoint, and further checkpoints can be incremental
+        num_messages = len(message_pool.get_all_messages())
+        self._num_logged_messages = num_messages
+        self._last_checkpoint = (path, message_pool.conversation_id, num_messages)
+
+    @classmethod
+    def from_checkpoint(cls, path: str):
+        """Create an arena from the config saved in a checkpoint file, and restore its state."""
+        config = read_checkpoint(path)[0]["config"]
+        arena = cls.from_config(config)
+        arena.restore(path)
+        return arena
+
     def save_history(self, path: str):
         """
         Save the history of the game to a file.
 
-        Supports csv and json formats.
+        Supports csv and json formats, as well as parquet and arrow (requires pyarrow).
         """
         messages = self.environment.get_observation()
-        message_rows = []
 
         if path.endswith(".csv"):
             header = [
@@ -167,6 +343,7 @@ class Arena:
                 "visible_to",
                 "msg_type",
             ]
+            message_rows = []
             for message in messages:
                 message_row = [
                     message.agent_name,
@@ -183,6 +360,7 @@ class Arena:
                 writer.writerow(header)
                 writer.writerows(message_rows)
         elif path.endswith(".json"):
+            message_rows = []
             for message in messages:
                 message_row = {
                     "agent_name": message.agent_name,
@@ -196,5 +374,14 @@ class Arena:
 
             with open(path, "w") as f:
                 json.dump(message_rows, f, indent=4)
+        elif path.endswith((".parquet", ".arrow")):
+            from .columnar import save_columnar_history
+
+            message_pool = getattr(self.environment, "message_pool", None)
+            save_columnar_history(
+                messages,
+                path,
+                conversation_id=getattr(message_pool, "conversation_id", None),
+            )
         else:
             raise ValueError("Invalid file format")
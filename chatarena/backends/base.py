@@ -1,5 +1,6 @@
 from abc import abstractmethod
-from typing import Dict, List, Type
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple, Type
 
 from ..config import BackendConfig, Configurable
 from ..message import Message
@@ -10,6 +11,11 @@ class IntelligenceBackend(Configurable):
 
     stateful = None
     type_name = None
+    # Attributes holding the state of a stateful backend (e.g., a session id), saved in arena checkpoints
+    _state_attributes: Tuple[str, ...] = ()
+    # Thread pool of the concurrent candidate queries, created on the first use
+    _candidates_executor: Optional[ThreadPoolExecutor] = None
+    _candidates_max_workers = 0
 
     @abstractmethod
     def __init__(self, **kwargs):
@@ -58,6 +64,63 @@ class IntelligenceBackend(Configurable):
         """Async querying."""
         raise NotImplementedError
 
+    def query_candidates(
+        self,
+        num_candidates: int,
+        agent_name: str,
+        role_desc: str,
+        history_messages: List[Message],
+        global_prompt: str = None,
+        request_msg: Message = None,
+        *args,
+        **kwargs,
+    ) -> List[str]:
+        """
+        Sample several responses to the same prompt.
+
+        The default implementation sends independent queries concurrently (or one after another for stateful backends,
+        whose state would be corrupted by concurrent queries). Backends whose API can return several samples
+        in a single call should override it.
+        """
+
+        def query():
+            return self.query(
+                agent_name,
+                role_desc,
+                history_messages,
+                global_prompt,
+                request_msg,
+                *args,
+                **kwargs,
+            )
+
+        if self.stateful or num_candidates == 1:
+            return [query() for _ in range(num_candidates)]
+        if self._candidates_max_workers < num_candidates:
+            self.close()
+            self._candidates_executor = ThreadPoolExecutor(max_workers=num_candidates)
+            self._candidates_max_workers = num_candidates
+        futures = [
+            self._candidates_executor.submit(query) for _ in range(num_candidates)
+        ]
+        return [future.result() for future in futures]
+
+    def close(self):
+        """Shut down the thread pool of the candidate queries, if any."""
+        if self._candidates_executor is not None:
+            self._candidates_executor.shutdown(wait=False)
+            self._candidates_executor = None
+            self._candidates_max_workers = 0
+
+    def get_state(self) -> Dict[str, Any]:
+        """Return the state of the backend for checkpointing."""
+        return {name: getattr(self, name) for name in self._state_attributes}
+
+    def set_state(self, state: Dict[str, Any]):
+        """Restore a state returned by get_state."""
+        for name, value in state.items():
+            setattr(self, name, value)
+
     # reset the state of the backend
     def reset(self):
         if self.stateful:
@@ -28,6 +28,7 @@ class CohereAIChat(IntelligenceBackend):
     """Interface to the Cohere API."""
 
     stateful = True
+    _state_attributes = ("session_id", "last_msg_hash")
     type_name = "cohere-chat"
 
     def __init__(
@@ -5,6 +5,7 @@ from typing import List
 from tenacity import retry, stop_after_attempt, wait_random_exponential
 
 from ..message import SYSTEM_NAME, Message
+from ..tracing import span
 from .base import IntelligenceBackend, register_backend
 
 try:
@@ -85,6 +86,18 @@ class OpenAIChat(IntelligenceBackend):
         response = response.strip()
         return response
 
+    @retry(stop=stop_after_attempt(6), wait=wait_random_exponential(min=1, max=60))
+    def _get_responses(self, messages, n: int) -> List[str]:
+        completion = client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+            stop=STOP,
+            n=n,
+        )
+        return [choice.message.content.strip() for choice in completion.choices]
+
     def query(
         self,
         agent_name: str,
@@ -106,6 +119,43 @@ class OpenAIChat(IntelligenceBackend):
             request_msg: the request from the system to guide the agent's next response
         """
 
+        messages = self._build_messages(
+            agent_name, role_desc, history_messages, global_prompt, request_msg
+        )
+
+        # The time spent building the prompt is the self time of the backend.query span
+        with span("backend.request", model=self.model):
+            response = self._get_response(messages, *args, **kwargs)
+
+        return self._clean_response(response, agent_name)
+
+    def query_candidates(
+        self,
+        num_candidates: int,
+        agent_name: str,
+        role_desc: str,
+        history_messages: List[Message],
+        global_prompt: str = None,
+        request_msg: Message = None,
+        *args,
+        **kwargs,
+    ) -> List[str]:
+        """Sample several responses to the same prompt in a single API call (with the n parameter)."""
+        messages = self._build_messages(
+            agent_name, role_desc, history_messages, global_prompt, request_msg
+        )
+        with span("backend.request", model=self.model, n=num_candidates):
+            responses = self._get_responses(messages, num_candidates)
+        return [self._clean_response(response, agent_name) for response in responses]
+
+    def _build_messages(
+        self,
+        agent_name: str,
+        role_desc: str,
+        history_messages: List[Message],
+        global_prompt: str = None,
+        request_msg: Message = None,
+    ) -> List[dict]:
         # Merge the role description and the global prompt as the system prompt for the agent
         if global_prompt:  # Prepend the global prompt if it exists
             system_prompt = f"You are a helpful assistant.\n{global_prompt.strip()}\n{BASE_PROMPT}\n\nYour name is {agent_name}.\n\nYour role:{role_desc}"
@@ -158,8 +208,10 @@ class OpenAIChat(IntelligenceBackend):
                     else:
                         raise ValueError(f"Invalid role: {messages[-1]['role']}")
 
-        response = self._get_response(messages, *args, **kwargs)
+        return messages
 
+    @staticmethod
+    def _clean_response(response: str, agent_name: str) -> str:
         # Remove the agent name if the response starts with it
         response = re.sub(rf"^\s*\[.*]:", "", response).strip()  # noqa: F541
         response = re.sub(
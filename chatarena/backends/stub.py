@@ -0,0 +1,45 @@
+from typing import List
+
+from ..message import Message
+from .base import IntelligenceBackend, register_backend
+
+
+@register_backend
+class StubBackend(IntelligenceBackend):
+    """
+    A backend answering with a fixed template, without any model or network call.
+
+    It is meant for tests and benchmarks, to measure the overhead of the framework alone.
+    """
+
+    stateful = False
+    type_name = "stub"
+
+    def __init__(
+        self, response: str = "{agent_name} says message {num_messages}.", **kwargs
+    ):
+        """
+        Initialize the backend.
+
+        Parameters:
+            response (str): The template of the responses, formatted with agent_name and num_messages (the number of history messages).
+        """
+        super().__init__(response=response, **kwargs)
+        self.response = response
+
+    def query(
+        self,
+        agent_name: str,
+        role_desc: str,
+        history_messages: List[Message],
+        global_prompt: str = None,
+        request_msg: Message = None,
+        *args,
+        **kwargs,
+    ) -> str:
+        return self.response.format(
+            agent_name=agent_name, num_messages=len(history_messages)
+        )
+
+    async def async_query(self, *args, **kwargs) -> str:
+        return self.query(*args, **kwargs)
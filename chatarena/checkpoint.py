@@ -0,0 +1,86 @@
+"""
+Binary checkpoint format for arenas.
+
+A checkpoint file starts with a magic header, followed by frames. Each frame is a little-endian
+length prefix and a zlib-compressed pickle of a record. The first record is a full checkpoint,
+and the following ones are incremental: they only hold the messages added since the previous record,
+along with the (small) environment and backend states. Restoring replays the messages of all the
+records and applies the states of the last one. A frame truncated by an interrupted write is ignored.
+
+Note that checkpoints are pickles: only restore checkpoints from trusted sources.
+"""
+import os
+import pickle
+import struct
+import zlib
+from typing import Any, Dict, List, Tuple
+
+from .message import Message
+
+MAGIC = b"CHATARENA-CKPT\x01"
+_LENGTH = struct.Struct("<I")
+
+
+def messages_to_rows(messages: List[Message]) -> List[Tuple]:
+    """Convert messages to plain tuples, which are faster to pickle and smaller than dataclasses."""
+    return [
+        (
+            m.agent_name,
+            m.content,
+            m.turn,
+            m.timestamp,
+            m.visible_to,
+            m.msg_type,
+            m.logged,
+        )
+        for m in messages
+    ]
+
+
+def rows_to_messages(rows: List[Tuple]) -> List[Message]:
+    return [Message(*row) for row in rows]
+
+
+def _encode(record: Dict[str, Any]) -> bytes:
+    payload = zlib.compress(pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL))
+    return _LENGTH.pack(len(payload)) + payload
+
+
+def write_full_checkpoint(path: str, record: Dict[str, Any]):
+    """Write a new checkpoint file, atomically replacing any previous one."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(_encode(record))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def append_checkpoint(path: str, record: Dict[str, Any]):
+    """Append an incremental record to an existing checkpoint file."""
+    with open(path, "ab") as f:
+        f.write(_encode(record))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def read_checkpoint(path: str) -> List[Dict[str, Any]]:
+    """Read all the complete records of a checkpoint file."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{path} is not an arena checkpoint")
+
+    records = []
+    offset = len(MAGIC)
+    while offset + _LENGTH.size <= len(data):
+        (length,) = _LENGTH.unpack_from(data, offset)
+        offset += _LENGTH.size
+        if offset + length > len(data):  # truncated by an interrupted write
+            break
+        records.append(pickle.loads(zlib.decompress(data[offset : offset + length])))
+        offset += length
+    if not records:
+        raise ValueError(f"{path} does not contain a complete checkpoint")
+    return records
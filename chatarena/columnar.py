@@ -0,0 +1,202 @@
+"""
+Columnar export of the message history (Arrow IPC stream or Parquet).
+
+Messages are written as record batches (Arrow) or row groups (Parquet) with dictionary-encoded
+`agent_name`, `msg_type` and `conversation_id` columns, so appending a few messages is cheap
+and histories of many runs can be scanned without parsing JSON.
+Arrow files are read back zero-copy through a memory map.
+"""
+from typing import List, Optional, Union
+
+from .message import Message, MessagePool
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    is_pyarrow_available = False
+else:
+    is_pyarrow_available = True
+
+COLUMNAR_FORMATS = ("arrow", "parquet")
+
+
+def _message_schema() -> "pa.Schema":
+    string_dictionary = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema(
+        [
+            ("conversation_id", string_dictionary),
+            ("agent_name", string_dictionary),
+            ("content", pa.string()),
+            ("turn", pa.int64()),
+            ("timestamp", pa.int64()),
+            ("visible_to", pa.list_(pa.string())),
+            ("msg_type", string_dictionary),
+        ]
+    )
+
+
+def _infer_format(path: str) -> str:
+    if path.endswith(".parquet"):
+        return "parquet"
+    elif path.endswith((".arrow", ".feather", ".ipc")):
+        return "arrow"
+    raise ValueError(f"Cannot infer the columnar format of {path}")
+
+
+def messages_to_record_batch(
+    messages: List[Message], conversation_id: Optional[str] = None
+) -> "pa.RecordBatch":
+    """
+    Convert messages to an Arrow record batch.
+
+    Parameters:
+        messages (List[Message]): The messages to convert.
+        conversation_id (Optional[str]): The ID of the conversation the messages belong to.
+
+    Returns:
+        pa.RecordBatch: One row per message.
+    """
+    assert is_pyarrow_available, "pyarrow package is not installed"
+    schema = _message_schema()
+    columns = [
+        [conversation_id] * len(messages),
+        [m.agent_name for m in messages],
+        [m.content for m in messages],
+        [m.turn for m in messages],
+        [m.timestamp for m in messages],
+        [
+            [m.visible_to] if isinstance(m.visible_to, str) else list(m.visible_to)
+            for m in messages
+        ],
+        [m.msg_type for m in messages],
+    ]
+    arrays = [
+        pa.array(column, type=field.type) for column, field in zip(columns, schema)
+    ]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def table_to_messages(table: "pa.Table") -> List[Message]:
+    """Convert a table read from a columnar history back to messages."""
+    messages = []
+    for row in table.to_pylist():
+        visible_to = row["visible_to"]
+        messages.append(
+            Message(
+                agent_name=row["agent_name"],
+                content=row["content"],
+                turn=row["turn"],
+                timestamp=row["timestamp"],
+                visible_to="all" if visible_to == ["all"] else visible_to,
+                msg_type=row["msg_type"],
+            )
+        )
+    return messages
+
+
+class ColumnarHistoryWriter:
+    """
+    Append messages to an Arrow IPC or Parquet file.
+
+    Each `write` call adds one record batch (Arrow) or row group (Parquet), without rewriting the file.
+    `write_pool` only exports the messages added to the pool since its previous call.
+    Messages are only appended within one writer: a new writer creates its file, replacing an existing one,
+    so the histories of several runs go to separate files (e.g., one file per run in a directory).
+    """
+
+    def __init__(self, path: str, format: Optional[str] = None):
+        """
+        Initialize the writer.
+
+        Parameters:
+            path (str): The path of the file, which is overwritten if it exists.
+            format (Optional[str]): "arrow" or "parquet", inferred from the file extension if None.
+        """
+        assert is_pyarrow_available, "pyarrow package is not installed"
+        self.path = path
+        self.format = format or _infer_format(path)
+        assert (
+            self.format in COLUMNAR_FORMATS
+        ), f"format must be one of {COLUMNAR_FORMATS}"
+        self.schema = _message_schema()
+        if self.format == "parquet":
+            self._writer = pq.ParquetWriter(path, self.schema)
+        else:
+            # The stream format allows new dictionary entries in later batches (the file format does not)
+            self._sink = pa.OSFile(path, "wb")
+            self._writer = pa.ipc.new_stream(
+                self._sink,
+                self.schema,
+                options=pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True),
+            )
+        self._num_exported = {}  # number of messages exported from each pool
+        self.num_rows = 0
+
+    def write(self, messages: List[Message], conversation_id: Optional[str] = None):
+        """Append messages as a new record batch or row group."""
+        if not messages:
+            return
+        batch = messages_to_record_batch(messages, conversation_id=conversation_id)
+        if self.format == "parquet":
+            self._writer.write_table(pa.Table.from_batches([batch]))
+        else:
+            self._writer.write_batch(batch)
+        self.num_rows += batch.num_rows
+
+    def write_pool(self, message_pool: MessagePool):
+        """Append the messages added to the pool since the previous call."""
+        messages = message_pool.get_all_messages()
+        key = message_pool.conversation_id
+        start = self._num_exported.get(key, 0)
+        if len(messages) < start:  # the pool has been reset
+            start = 0
+        self.write(messages[start:], conversation_id=key)
+        self._num_exported[key] = len(messages)
+
+    def close(self):
+        self._writer.close()
+        if self.format == "arrow":
+            self._sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def read_history(path: str, format: Optional[str] = None) -> "pa.Table":
+    """
+    Read a columnar history.
+
+    Arrow files are memory-mapped, so the columns are not copied into memory.
+
+    Parameters:
+        path (str): The path of the file.
+        format (Optional[str]): "arrow" or "parquet", inferred from the file extension if None.
+
+    Returns:
+        pa.Table: One row per message.
+    """
+    assert is_pyarrow_available, "pyarrow package is not installed"
+    format = format or _infer_format(path)
+    if format == "parquet":
+        return pq.read_table(path, memory_map=True)
+    # The table keeps the memory map open as long as its buffers are referenced
+    source = pa.memory_map(path, "r")
+    return pa.ipc.open_stream(source).read_all()
+
+
+def save_columnar_history(
+    messages: Union[List[Message], MessagePool],
+    path: str,
+    format: Optional[str] = None,
+    conversation_id: Optional[str] = None,
+):
+    """Write messages (or the content of a message pool) to a new columnar file, replacing an existing one."""
+    with ColumnarHistoryWriter(path, format=format) as writer:
+        if isinstance(messages, MessagePool):
+            writer.write_pool(messages)
+        else:
+            writer.write(messages, conversation_id=conversation_id)
@@ -1,5 +1,10 @@
 import copy
+import hashlib
+import itertools
 import json
+import random
+import weakref
+from typing import Any, Dict, Iterator, Tuple
 
 from .utils import AttributedDict
 
@@ -24,6 +29,76 @@ class Config(AttributedDict):
                     for item in value
                 ]
 
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        # Link the nested configs to this one, so that mutating them invalidates its fingerprint
+        for child in value if isinstance(value, list) else [value]:
+            if isinstance(child, Config):
+                parents = child.__dict__.setdefault("_parents", [])
+                if not any(parent_ref() is self for parent_ref in parents):
+                    parents.append(weakref.ref(self))
+        self._invalidate()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._invalidate()
+
+    def pop(self, *args):
+        value = super().pop(*args)
+        self._invalidate()
+        return value
+
+    def popitem(self):
+        item = super().popitem()
+        self._invalidate()
+        return item
+
+    def clear(self):
+        super().clear()
+        self._invalidate()
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def __getstate__(self):
+        # The fingerprint and the links to the parent configs are not copied nor pickled
+        return {}
+
+    def _invalidate(self):
+        self.__dict__.pop("_fingerprint", None)
+        for parent_ref in self.__dict__.get("_parents", ()):
+            parent = parent_ref()
+            if parent is not None:
+                parent._invalidate()
+
+    def to_canonical_json(self) -> str:
+        """
+        Serialize the config to a canonical JSON string.
+
+        Keys are sorted and separators are compact, so equal configs have the same serialization,
+        whatever the order of their keys or the file they were loaded from.
+        """
+        return json.dumps(
+            self, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+        )
+
+    def fingerprint(self) -> str:
+        """
+        Return the SHA-256 hex digest of the canonical serialization.
+
+        The fingerprint is memoized until the config, or one of its nested configs, is mutated.
+        Note that in-place mutations of lists (e.g., appending a player) are not tracked: assign a new list instead.
+        """
+        fingerprint = self.__dict__.get("_fingerprint")
+        if fingerprint is None:
+            fingerprint = hashlib.sha256(
+                self.to_canonical_json().encode("utf-8")
+            ).hexdigest()
+            self.__dict__["_fingerprint"] = fingerprint
+        return fingerprint
+
     def save(self, path: str):
         # save config to file
         with open(path, "w") as f:
@@ -117,6 +192,104 @@ class ArenaConfig(Config):
         if not isinstance(self["environment"], EnvironmentConfig):
             raise ValueError("The environment field must be an EnvironmentConfig")
 
+        # check the sweep spec if specified
+        if "sweep" in self:
+            sweep = self["sweep"]
+            if sweep.get("mode", "grid") not in SWEEP_MODES:
+                raise ValueError(f"The sweep mode must be one of {SWEEP_MODES}")
+            if not sweep.get("axes"):
+                raise ValueError("The sweep axes are not specified")
+            if sweep.get("mode") == "random" and "num_samples" not in sweep:
+                raise ValueError("A random sweep needs the num_samples field")
+
+    def iter_variants(self) -> Iterator[Tuple[Dict[str, Any], "ArenaConfig"]]:
+        """
+        Lazily expand the sweep spec into concrete configs.
+
+        The sweep spec is the "sweep" field of the config:
+            - "mode": "grid" (cartesian product of the axes, the default), "zip" (the i-th values of all the axes)
+              or "random" (independent samples of the axes).
+            - "axes": a mapping from dotted config paths (e.g., "players.0.backend.temperature", or "players.*.backend.model"
+              for every player) to a list of values. In random mode, an axis can also be a {"low": ..., "high": ...} range.
+            - "num_samples" and "seed": the number of variants and the random seed of a random sweep.
+
+        Each variant is built when the generator reaches it, so large sweeps are never materialized.
+        A config without sweep spec has a single variant.
+
+        Yields:
+            Tuple[Dict[str, Any], ArenaConfig]: The values of the axes and the config of the variant (without the sweep spec).
+        """
+        base = self.deepcopy()
+        sweep = base.pop("sweep", None)
+        if sweep is None:
+            yield {}, base
+            return
+
+        paths = list(sweep["axes"].keys())
+        axes = [sweep["axes"][path] for path in paths]
+        mode = sweep.get("mode", "grid")
+        if mode == "grid":
+            assignments = itertools.product(*axes)
+        elif mode == "zip":
+            if len({len(values) for values in axes}) != 1:
+                raise ValueError("The axes of a zip sweep must have the same length")
+            assignments = zip(*axes)
+        else:
+            rng = random.Random(sweep.get("seed"))
+            assignments = (
+                tuple(_sample_axis(values, rng) for values in axes)
+                for _ in range(sweep["num_samples"])
+            )
+
+        for values in assignments:
+            config = base.deepcopy()
+            for path, value in zip(paths, values):
+                set_by_path(config, path, copy.deepcopy(value))
+            yield dict(zip(paths, values)), config
+
+
+SWEEP_MODES = ("grid", "zip", "random")
+
+
+def _sample_axis(values, rng: random.Random):
+    if isinstance(values, dict):
+        return rng.uniform(values["low"], values["high"])
+    return rng.choice(values)
+
+
+def set_by_path(config: Config, path: str, value):
+    """
+    Set a value of a nested config by its dotted path.
+
+    List items are addressed by their index, and "*" addresses all the items of a list.
+    """
+    *parents, last = path.split(".")
+    nodes = [config]
+    for key in parents:
+        nodes = [child for node in nodes for child in _children(node, key, path)]
+    for node in nodes:
+        if isinstance(node, list):
+            for index in _list_indices(node, last, path):
+                node[index] = value
+        else:
+            node[last] = value
+
+
+def _children(node, key: str, path: str):
+    if isinstance(node, list):
+        return [node[index] for index in _list_indices(node, key, path)]
+    if key not in node:
+        raise KeyError(f"{key} of the path {path} is not in the config")
+    return [node[key]]
+
+
+def _list_indices(node: list, key: str, path: str):
+    if key == "*":
+        return range(len(node))
+    if not key.lstrip("-").isdigit():
+        raise KeyError(f"{key} of the path {path} is not a list index")
+    return [int(key)]
+
 
 # Initialize with different config class depending on whether the config is for environment or backend
 def init_config(config: dict):
@@ -2,12 +2,17 @@
 Datastore module for chat_arena.
 
 This module provides utilities for storing the messages and the game results into database.
-Currently, it supports Supabase.
+Currently, it supports Supabase and a local SQLite database, optionally behind a batched background writer.
 """
 import json
+import logging
 import os
+import queue
+import sqlite3
+import threading
+import time
 import uuid
-from typing import List
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 from .arena import Arena
 from .message import Message
@@ -26,78 +31,126 @@ else:
     supabase_available = True
 
 
-# Store the messages into the Supabase database
-class SupabaseDB:
-    def __init__(self):
-        assert supabase_available and SUPABASE_URL and SUPABASE_SECRET_KEY
-        supabase_client = supabase.create_client(SUPABASE_URL, SUPABASE_SECRET_KEY)
-        self.client = supabase_client
+# Builds the rows of an arena, the storage is implemented by subclasses
+class ArenaDB:
+    """
+    Base class of the databases storing arenas.
 
-    # Save Arena state to Supabase
-    def save_arena(self, arena: Arena):
-        # Save the environment config
-        self._save_environment(arena)
+    Subclasses implement `insert_rows`. Every row has a deterministic primary key
+    (the arena uuid, or a uuid5 derived from it), so inserting the same rows again is a no-op
+    and failed inserts can be retried safely.
+    """
+
+    # Primary key of each table
+    primary_keys = {
+        "Arena": "arena_id",
+        "Moderator": "moderator_id",
+        "Player": "player_id",
+        "Message": "message_id",
+        "Reward": "reward_id",
+    }
 
-        # Save the player configs
-        self._save_player_configs(arena)
+    def insert_rows(self, table: str, rows: List[Dict[str, Any]]):
+        """Insert rows into a table, ignoring the rows which are already stored."""
+        raise NotImplementedError
+
+    # Save Arena state to the database
+    def save_arena(self, arena: Arena):
+        for table, rows in self.arena_rows(arena).items():
+            if rows:
+                self.insert_rows(table, rows)
 
         # Save the messages
         self.save_messages(arena)
 
-    # Save the environment config of the arena
-    def _save_environment(self, arena: Arena):
+    # Save the messages which are not logged yet, they are marked as logged once they are stored
+    def save_messages(self, arena: Arena, messages: List[Message] = None):
+        messages = self.unlogged_messages(arena, messages)
+        if messages:
+            self.insert_rows("Message", self.message_rows(arena, messages))
+            for message in messages:
+                message.logged = True
+
+    # Save the final rewards of the players (requires a Reward table)
+    def save_rewards(self, arena: Arena, rewards: Dict[str, float]):
+        self.insert_rows("Reward", self.reward_rows(arena, rewards))
+
+    # Rows of the final rewards of the players
+    def reward_rows(
+        self, arena: Arena, rewards: Dict[str, float]
+    ) -> List[Dict[str, Any]]:
+        return [
+            {
+                "reward_id": str(uuid.uuid5(arena.uuid, f"reward: {player_name}")),
+                "arena_id": str(arena.uuid),
+                "player_name": player_name,
+                "reward": reward,
+            }
+            for player_name, reward in rewards.items()
+        ]
+
+    # Rows of the environment config, the moderator and the player configs of the arena
+    def arena_rows(self, arena: Arena) -> Dict[str, List[Dict[str, Any]]]:
         env = arena.environment
         env_config = env.to_config()
         moderator_config = env_config.pop("moderator", None)
 
-        arena_row = {
-            "arena_id": str(arena.uuid),
-            "global_prompt": arena.global_prompt,
-            "env_type": env_config["env_type"],
-            "env_config": json.dumps(env_config),
-        }
-        self.client.table("Arena").insert(arena_row).execute()
+        rows = {"Arena": [], "Moderator": [], "Player": []}
+        rows["Arena"].append(
+            {
+                "arena_id": str(arena.uuid),
+                "global_prompt": arena.global_prompt,
+                "env_type": env_config["env_type"],
+                "env_config": json.dumps(env_config),
+            }
+        )
 
         # Get the moderator config
         if moderator_config:
-            moderator_row = {
-                "moderator_id": str(
-                    uuid.uuid5(arena.uuid, json.dumps(moderator_config))
-                ),
-                "arena_id": str(arena.uuid),
-                "role_desc": moderator_config["role_desc"],
-                "terminal_condition": moderator_config["terminal_condition"],
-                "backend_type": moderator_config["backend"]["backend_type"],
-                "temperature": moderator_config["backend"]["temperature"],
-                "max_tokens": moderator_config["backend"]["max_tokens"],
-            }
-            self.client.table("Moderator").insert(moderator_row).execute()
+            rows["Moderator"].append(
+                {
+                    "moderator_id": str(
+                        uuid.uuid5(arena.uuid, json.dumps(moderator_config))
+                    ),
+                    "arena_id": str(arena.uuid),
+                    "role_desc": moderator_config["role_desc"],
+                    "terminal_condition": moderator_config["terminal_condition"],
+                    "backend_type": moderator_config["backend"]["backend_type"],
+                    "temperature": moderator_config["backend"].get("temperature", None),
+                    "max_tokens": moderator_config["backend"].get("max_tokens", None),
+                }
+            )
 
-    # Save the player configs of the arena
-    def _save_player_configs(self, arena: Arena):
-        player_rows = []
         for player in arena.players:
             player_config = player.to_config()
-            player_row = {
-                "player_id": str(uuid.uuid5(arena.uuid, json.dumps(player_config))),
-                "arena_id": str(arena.uuid),
-                "name": player.name,
-                "role_desc": player_config["role_desc"],
-                "backend_type": player_config["backend"]["backend_type"],
-                "temperature": player_config["backend"].get("temperature", None),
-                "max_tokens": player_config["backend"].get("max_tokens", None),
-            }
-            player_rows.append(player_row)
+            rows["Player"].append(
+                {
+                    "player_id": str(uuid.uuid5(arena.uuid, json.dumps(player_config))),
+                    "arena_id": str(arena.uuid),
+                    "name": player.name,
+                    "role_desc": player_config["role_desc"],
+                    "backend_type": player_config["backend"]["backend_type"],
+                    "temperature": player_config["backend"].get("temperature", None),
+                    "max_tokens": player_config["backend"].get("max_tokens", None),
+                    # The same for identical player configs across arenas, to compare them
+                    "config_id": player_config.fingerprint(),
+                }
+            )
+        return rows
 
-        self.client.table("Player").insert(player_rows).execute()
-
-    # Save the messages
-    def save_messages(self, arena: Arena, messages: List[Message] = None):
+    # The messages (all the messages of the arena by default) which are not logged yet
+    def unlogged_messages(
+        self, arena: Arena, messages: List[Message] = None
+    ) -> List[Message]:
         if messages is None:
             messages = arena.environment.get_observation()
+        return [msg for msg in messages if not msg.logged]
 
-        # Filter messages that are already logged
-        messages = [msg for msg in messages if not msg.logged]
+    # Rows of the messages which are not logged yet, the caller marks them as logged once they are stored
+    def message_rows(
+        self, arena: Arena, messages: List[Message] = None
+    ) -> List[Dict[str, Any]]:
+        messages = self.unlogged_messages(arena, messages)
 
         message_rows = []
         for message in messages:
@@ -112,15 +165,413 @@ class SupabaseDB:
                 "visible_to": json.dumps(message.visible_to),
             }
             message_rows.append(message_row)
+        return message_rows
+
+
+# Store the messages into the Supabase database
+class SupabaseDB(ArenaDB):
+    def __init__(self):
+        assert supabase_available and SUPABASE_URL and SUPABASE_SECRET_KEY
+        supabase_client = supabase.create_client(SUPABASE_URL, SUPABASE_SECRET_KEY)
+        self.client = supabase_client
+
+    def arena_rows(self, arena: Arena) -> Dict[str, List[Dict[str, Any]]]:
+        rows = super().arena_rows(arena)
+        # The Supabase Player table has no config_id column
+        for player_row in rows["Player"]:
+            player_row.pop("config_id")
+        return rows
+
+    def insert_rows(self, table: str, rows: List[Dict[str, Any]]):
+        # Upsert on the primary key, so that retries don't fail on duplicates
+        self.client.table(table).upsert(
+            rows, on_conflict=self.primary_keys[table], ignore_duplicates=True
+        ).execute()
+
+
+# Store the arenas into a local SQLite database, with the same tables as the Supabase database
+class SQLiteDB(ArenaDB):
+    schema = {
+        "Arena": ["arena_id", "global_prompt", "env_type", "env_config"],
+        "Moderator": [
+            "moderator_id",
+            "arena_id",
+            "role_desc",
+            "terminal_condition",
+            "backend_type",
+            "temperature",
+            "max_tokens",
+        ],
+        "Player": [
+            "player_id",
+            "arena_id",
+            "name",
+            "role_desc",
+            "backend_type",
+            "temperature",
+            "max_tokens",
+            "config_id",
+        ],
+        "Message": [
+            "message_id",
+            "arena_id",
+            "agent_name",
+            "content",
+            "turn",
+            "timestamp",
+            "msg_type",
+            "visible_to",
+        ],
+        "Reward": ["reward_id", "arena_id", "player_name", "reward"],
+    }
+    indexes = {
+        "message_arena_turn": ("Message", ["arena_id", "turn"]),
+        "message_agent_name": ("Message", ["agent_name"]),
+        "player_arena": ("Player", ["arena_id"]),
+        "player_config": ("Player", ["config_id"]),
+        "reward_arena": ("Reward", ["arena_id"]),
+        "arena_env_type": ("Arena", ["env_type"]),
+    }
+
+    def __init__(self, path: str = ":memory:"):
+        """
+        Initialize the database.
 
-        self.client.table("Message").insert(message_rows).execute()
+        Parameters:
+            path (str): The path of the database file (in memory by default).
+        """
+        self.path = path
+        # The connection may be used by a background writer thread, the lock serializes the accesses
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self.connection:
+            for table, columns in self.schema.items():
+                column_defs = ", ".join(
+                    f"{column} PRIMARY KEY"
+                    if column == self.primary_keys[table]
+                    else column
+                    for column in columns
+                )
+                self.connection.execute(
+                    f'CREATE TABLE IF NOT EXISTS "{table}" ({column_defs})'
+                )
+            for index, (table, columns) in self.indexes.items():
+                self.connection.execute(
+                    f'CREATE INDEX IF NOT EXISTS {index} ON "{table}" ({", ".join(columns)})'
+                )
 
-        # Mark the messages as logged
+    def insert_rows(self, table: str, rows: List[Dict[str, Any]]):
+        columns = self.schema[table]
+        placeholders = ", ".join("?" for _ in columns)
+        with self._lock, self.connection:
+            self.connection.executemany(
+                f'INSERT OR IGNORE INTO "{table}" ({", ".join(columns)}) VALUES ({placeholders})',
+                [tuple(row.get(column) for column in columns) for row in rows],
+            )
+
+    def ingest(self, games: Iterable[Tuple[Arena, Optional[Dict[str, float]]]]):
+        """
+        Bulk-ingest finished games in a single transaction.
+
+        Parameters:
+            games (Iterable[Tuple[Arena, Optional[Dict[str, float]]]]): The arenas and the final rewards of their players.
+        """
+        rows: Dict[str, List[Dict[str, Any]]] = {table: [] for table in self.schema}
+        messages: List[Message] = []
+        for arena, rewards in games:
+            for table, table_rows in self.arena_rows(arena).items():
+                rows[table].extend(table_rows)
+            arena_messages = self.unlogged_messages(arena)
+            rows["Message"].extend(self.message_rows(arena, arena_messages))
+            messages.extend(arena_messages)
+            if rewards:
+                rows["Reward"].extend(self.reward_rows(arena, rewards))
+
+        with self._lock, self.connection:
+            for table, table_rows in rows.items():
+                columns = self.schema[table]
+                placeholders = ", ".join("?" for _ in columns)
+                self.connection.executemany(
+                    f'INSERT OR IGNORE INTO "{table}" ({", ".join(columns)}) VALUES ({placeholders})',
+                    [
+                        tuple(row.get(column) for column in columns)
+                        for row in table_rows
+                    ],
+                )
+        # The transaction is committed
         for message in messages:
             message.logged = True
 
+    def query(self, sql: str, parameters=()) -> List[tuple]:
+        """Run a read query and return all the rows."""
+        with self._lock:
+            return self.connection.execute(sql, parameters).fetchall()
+
+    @staticmethod
+    def _recent_arenas(
+        env_type: Optional[str], last_n: Optional[int]
+    ) -> Tuple[str, list]:
+        """SQL selecting the ids of the last arenas (in insertion order) of an environment type."""
+        sql = 'SELECT arena_id FROM "Arena"'
+        parameters = []
+        if env_type is not None:
+            sql += " WHERE env_type = ?"
+            parameters.append(env_type)
+        if last_n is not None:
+            sql += " ORDER BY rowid DESC LIMIT ?"
+            parameters.append(last_n)
+        return sql, parameters
+
+    def win_rates(
+        self,
+        env_type: Optional[str] = None,
+        last_n: Optional[int] = None,
+        group_by: str = "config_id",
+    ) -> List[Dict[str, Any]]:
+        """
+        Win rate of each player config (or name, or backend type) over the games with rewards.
+
+        A player wins a game if its reward is the highest one and not all the players are tied.
+
+        Parameters:
+            env_type (Optional[str]): Only count the games of this environment type.
+            last_n (Optional[int]): Only count the last n games.
+            group_by (str): "config_id", "name" or "backend_type".
+
+        Returns:
+            List[Dict[str, Any]]: The number of games, wins and the win rate of each group, best first.
+        """
+        assert group_by in ("config_id", "name", "backend_type")
+        arenas_sql, parameters = self._recent_arenas(env_type, last_n)
+        sql = f"""
+            WITH recent AS ({arenas_sql}),
+            results AS (
+                SELECT r.arena_id, r.player_name, r.reward,
+                       MAX(r.reward) OVER (PARTITION BY r.arena_id) AS max_reward,
+                       MIN(r.reward) OVER (PARTITION BY r.arena_id) AS min_reward
+                FROM "Reward" r JOIN recent ON r.arena_id = recent.arena_id
+            )
+            SELECT p.{group_by} AS player_group,
+                   COUNT(*) AS games,
+                   SUM(res.reward = res.max_reward AND res.max_reward > res.min_reward) AS wins
+            FROM results res
+            JOIN "Player" p ON p.arena_id = res.arena_id AND p.name = res.player_name
+            GROUP BY p.{group_by}
+            ORDER BY CAST(wins AS REAL) / games DESC
+        """
+        return [
+            {"group": group, "games": games, "wins": wins, "win_rate": wins / games}
+            for group, games, wins in self.query(sql, parameters)
+        ]
+
+    def average_turns(
+        self, env_type: Optional[str] = None, last_n: Optional[int] = None
+    ) -> Optional[float]:
+        """Average number of turns per game."""
+        arenas_sql, parameters = self._recent_arenas(env_type, last_n)
+        sql = f"""
+            SELECT AVG(num_turns) FROM (
+                SELECT MAX(m.turn) + 1 AS num_turns
+                FROM "Message" m JOIN ({arenas_sql}) recent ON m.arena_id = recent.arena_id
+                GROUP BY m.arena_id
+            )
+        """
+        return self.query(sql, parameters)[0][0]
+
+    def tokens_per_game(
+        self, env_type: Optional[str] = None, last_n: Optional[int] = None
+    ) -> Optional[float]:
+        """
+        Average number of tokens per game.
+
+        Tokens are approximated by the whitespace-separated words of the messages, as the tokenizer depends on the backend.
+        """
+        arenas_sql, parameters = self._recent_arenas(env_type, last_n)
+        sql = f"""
+            SELECT AVG(num_tokens) FROM (
+                SELECT SUM(
+                    CASE WHEN LENGTH(TRIM(m.content)) = 0 THEN 0
+                    ELSE LENGTH(TRIM(m.content)) - LENGTH(REPLACE(TRIM(m.content), ' ', '')) + 1 END
+                ) AS num_tokens
+                FROM "Message" m JOIN ({arenas_sql}) recent ON m.arena_id = recent.arena_id
+                GROUP BY m.arena_id
+            )
+        """
+        return self.query(sql, parameters)[0][0]
+
+    def close(self):
+        self.connection.close()
+
+
+# Queue the rows of another database and write them in bulk from a background thread
+class BatchedDBWriter(ArenaDB):
+    """
+    Asynchronous database sink.
+
+    The rows are built on the calling thread (so they reflect the arena at call time) and queued.
+    A background thread coalesces them into one bulk insert per table once `batch_size` rows
+    are queued or `flush_interval` seconds have passed. Failed inserts are retried with exponential
+    backoff, which is safe since the rows have deterministic primary keys.
+
+    Messages are marked as logged once their rows are written. The rows of messages given up after
+    the retries are kept in `failed_rows`, and the messages are written again by a later `save_arena`.
+    """
+
+    def __init__(
+        self,
+        database: ArenaDB,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        max_retries: int = 3,
+        retry_delay: float = 0.5,
+    ):
+        """
+        Initialize the writer.
+
+        Parameters:
+            database (ArenaDB): The database the rows are written to.
+            batch_size (int): The number of queued rows that triggers a bulk insert.
+            flush_interval (float): The maximum time in seconds a row stays queued.
+            max_retries (int): The number of retries of a failed bulk insert.
+            retry_delay (float): The delay before the first retry, doubled at each retry.
+        """
+        self.database = database
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.failed_rows: Dict[str, List[Dict[str, Any]]] = {}
+
+        self._queue: queue.Queue = queue.Queue()
+        self._closed = False
+        # Ids of the queued message rows, not to queue them again before they are written
+        self._queued_message_ids = set()
+        self._message_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def insert_rows(self, table: str, rows: List[Dict[str, Any]]):
+        self._put(table, rows, [])
+
+    # The rows are built by the database they are written to
+    def arena_rows(self, arena: Arena) -> Dict[str, List[Dict[str, Any]]]:
+        return self.database.arena_rows(arena)
+
+    def message_rows(
+        self, arena: Arena, messages: List[Message] = None
+    ) -> List[Dict[str, Any]]:
+        return self.database.message_rows(arena, messages)
+
+    def reward_rows(
+        self, arena: Arena, rewards: Dict[str, float]
+    ) -> List[Dict[str, Any]]:
+        return self.database.reward_rows(arena, rewards)
+
+    def save_messages(self, arena: Arena, messages: List[Message] = None):
+        messages = self.unlogged_messages(arena, messages)
+        rows = self.message_rows(arena, messages)
+        with self._message_lock:
+            queued = [
+                (message, row)
+                for message, row in zip(messages, rows)
+                if row["message_id"] not in self._queued_message_ids
+            ]
+            self._queued_message_ids.update(row["message_id"] for _, row in queued)
+        if queued:
+            self._put("Message", [row for _, row in queued], queued)
+
+    def _put(
+        self,
+        table: str,
+        rows: List[Dict[str, Any]],
+        messages: List[Tuple[Message, Dict[str, Any]]],
+    ):
+        if self._closed:
+            raise ValueError("Cannot write to a closed writer")
+        self._queue.put((table, rows, messages))
+
+    def flush(self):
+        """Block until all the queued rows have been written."""
+        if self._closed:
+            raise ValueError("Cannot flush a closed writer")
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+
+    def close(self):
+        """Write the queued rows and stop the writer thread."""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join()
+
+    def _write(
+        self,
+        pending: Dict[str, List[Dict[str, Any]]],
+        messages: List[Tuple[Message, Dict[str, Any]]],
+    ):
+        # Insert the tables in order, so that the referenced rows are written first
+        for table in [*self.database.primary_keys, *pending]:
+            rows = pending.pop(table, None)
+            if not rows:
+                continue
+            written = self._insert_with_retries(table, rows)
+            if table == "Message" and written:
+                for message, _ in messages:
+                    message.logged = True
+        with self._message_lock:
+            self._queued_message_ids.difference_update(
+                row["message_id"] for _, row in messages
+            )
+
+    def _insert_with_retries(self, table: str, rows: List[Dict[str, Any]]) -> bool:
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.database.insert_rows(table, rows)
+                return True
+            except Exception as e:
+                if attempt == self.max_retries:
+                    logging.warning(f"Failed to write {len(rows)} rows to {table}: {e}")
+                    self.failed_rows.setdefault(table, []).extend(rows)
+                else:
+                    time.sleep(self.retry_delay * 2**attempt)
+        return False
+
+    def _run(self):
+        pending: Dict[str, List[Dict[str, Any]]] = {}
+        pending_messages: List[Tuple[Message, Dict[str, Any]]] = []
+        num_pending = 0
+        deadline = None
+        while True:
+            timeout = (
+                None if deadline is None else max(0.0, deadline - time.monotonic())
+            )
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = "timeout"
+
+            if isinstance(item, tuple):
+                table, rows, messages = item
+                pending.setdefault(table, []).extend(rows)
+                pending_messages.extend(messages)
+                num_pending += len(rows)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                if num_pending < self.batch_size:
+                    continue
+
+            # Flush on size, time, explicit flush or close
+            self._write(pending, pending_messages)
+            pending_messages = []
+            num_pending, deadline = 0, None
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is None:
+                return
+
 
-# Log the arena results into the Supabase database
+# Log the arena results into the database
 def log_arena(arena: Arena, database=None):
     if database is None:
         pass
@@ -128,7 +579,7 @@ def log_arena(arena: Arena, database=None):
         database.save_arena(arena)
 
 
-# Log the messages into the Supabase database
+# Log the messages into the database
 def log_messages(arena: Arena, messages: List[Message], database=None):
     if database is None:
         pass
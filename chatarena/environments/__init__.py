@@ -3,6 +3,7 @@ from .base import ENV_REGISTRY, Environment, TimeStep, register_env
 from .chameleon import Chameleon
 from .conversation import Conversation, ModeratedConversation
 from .pettingzoo_chess import PettingzooChess
+from .pettingzoo_classic import PettingzooClassic, TextRenderer, register_renderer
 from .pettingzoo_tictactoe import PettingzooTicTacToe
 
 
@@ -11,7 +12,10 @@ def load_environment(config: EnvironmentConfig):
     try:
         env_cls = ENV_REGISTRY[config["env_type"]]
     except KeyError:
-        raise ValueError(f"Unknown environment type: {config['env_type']}")
+        # Any PettingZoo classic environment without a hand-written one, e.g., "pettingzoo:connect_four"
+        if not config["env_type"].startswith(f"{PettingzooClassic.type_name}:"):
+            raise ValueError(f"Unknown environment type: {config['env_type']}")
+        env_cls = PettingzooClassic
 
     env = env_cls.from_config(config)
     return env
@@ -1,6 +1,6 @@
 from abc import abstractmethod
 from dataclasses import dataclass
-from typing import Dict, List, Type
+from typing import Any, Dict, List, Tuple, Type
 
 from ..config import Configurable, EnvironmentConfig
 from ..message import Message
@@ -42,6 +42,8 @@ class Environment(Configurable):
     """
 
     type_name = None
+    # Attributes which are not saved in checkpoints (e.g., thread pools or agents), besides the message pool
+    _non_checkpoint_attributes: Tuple[str, ...] = ()
 
     @abstractmethod
     def __init__(self, player_names: List[str], **kwargs):
@@ -78,10 +80,33 @@ class Environment(Configurable):
         """
         pass
 
+    def close(self):
+        """Release the resources of the environment (e.g., threads), if any."""
+        pass
+
     def to_config(self) -> EnvironmentConfig:
         self._config_dict["env_type"] = self.type_name
         return EnvironmentConfig(**self._config_dict)
 
+    def get_state(self) -> Dict[str, Any]:
+        """
+        Return the state of the environment for checkpointing, except the message pool (saved separately).
+
+        Returns:
+            Dict[str, Any]: The picklable attributes of the environment.
+        """
+        excluded = {"message_pool", "_config_dict", *self._non_checkpoint_attributes}
+        return {k: v for k, v in self.__dict__.items() if k not in excluded}
+
+    def set_state(self, state: Dict[str, Any]):
+        """
+        Restore a state returned by `get_state`.
+
+        Parameters:
+            state (Dict[str, Any]): The state of the environment.
+        """
+        self.__dict__.update(state)
+
     @property
     def num_players(self) -> int:
         """Get the number of players."""
@@ -138,6 +163,41 @@ class Environment(Configurable):
         """
         pass
 
+    def step_simultaneous(self, actions: Dict[str, str]) -> TimeStep:
+        """
+        Execute a single transition in which several players act at the same time.
+
+        The default implementation applies the actions in the order the players are due to act, and stops at the
+        first player without an action or when the episode ends. The rewards of the intermediate steps are summed.
+        Environments with genuinely simultaneous moves should override it.
+
+        Parameters:
+            actions (Dict[str, str]): The actions of the players, keyed by player name.
+
+        Returns:
+            TimeStep: An object of the TimeStep class containing the observation, reward, and done state.
+        """
+        pending = dict(actions)
+        rewards = self.get_zero_rewards()
+        timestep = None
+        while pending:
+            player_name = self.get_next_player()
+            if player_name not in pending:
+                break
+            timestep = self.step(player_name, pending.pop(player_name))
+            for name, reward in timestep.reward.items():
+                rewards[name] = rewards.get(name, 0.0) + reward
+            if timestep.terminal:
+                break
+
+        if timestep is None:
+            raise ValueError(f"No action for the next player: {self.get_next_player()}")
+        return TimeStep(
+            observation=timestep.observation,
+            reward=rewards,
+            terminal=timestep.terminal,
+        )
+
     @abstractmethod
     def check_action(self, action: str, player_name: str) -> bool:
         """
@@ -155,6 +215,22 @@ class Environment(Configurable):
         """
         return True
 
+    def get_invalid_action_feedback(self, actions: List[str], player_name: str) -> str:
+        """
+        Explain to a player why its actions were rejected by `check_action`, before it tries again.
+
+        Environments can override it to give the expected format or the legal actions.
+
+        Parameters:
+            actions (List[str]): The rejected actions.
+            player_name (str): The name of the player.
+
+        Returns:
+            str: The feedback message.
+        """
+        rejected = "; ".join(f'"{action}"' for action in actions[-3:])
+        return f"Your previous responses were not valid actions: {rejected}. Please respond with a valid action."
+
     @abstractmethod
     def is_terminal(self) -> bool:
         """
@@ -1,4 +1,5 @@
-from typing import List, Union
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple, Union
 
 from ..agent import SIGNAL_END_OF_CONVERSATION, Moderator
 from ..config import AgentConfig, EnvironmentConfig
@@ -93,6 +94,35 @@ class Conversation(Environment):
         )  # Return all the messages
         return timestep
 
+    def step_simultaneous(self, actions: Dict[str, str]) -> TimeStep:
+        """
+        Step function for players speaking at the same time.
+
+        All the messages are recorded in the same turn, so none of the players sees the others' messages before acting.
+
+        Args:
+            actions: the actions of the players, keyed by player name
+        """
+        for player_name in self.player_names:
+            if player_name in actions:
+                message = Message(
+                    agent_name=player_name,
+                    content=actions[player_name],
+                    turn=self._current_turn,
+                )
+                self.message_pool.append_message(message)
+
+        # A whole round has been played
+        self._current_turn += 1
+        self._next_player_idx = 0
+
+        timestep = TimeStep(
+            observation=self.get_observation(),
+            reward=self.get_zero_rewards(),
+            terminal=self.is_terminal(),
+        )  # Return all the messages
+        return timestep
+
 
 @register_env
 class ModeratedConversation(Conversation):
@@ -101,9 +131,15 @@ class ModeratedConversation(Conversation):
 
     Next speaker order is either parallel or round-robin.
     Moderator is a special agent that can see all messages and can decide whether the conversation is over.
+
+    With `fused_moderator`, the moderator response and the terminal check come from a single backend call.
+    With `pipeline_moderator`, the moderator call runs in the background while the next player is queried,
+    as long as the next player cannot see the moderator message. The terminal decision of a pipelined call is
+    then applied at the beginning of the next step, before the action of the next player is recorded.
     """
 
     type_name = "moderated_conversation"
+    _non_checkpoint_attributes = ("moderator", "_executor", "_pending_moderator")
 
     def __init__(
         self,
@@ -112,9 +148,17 @@ class ModeratedConversation(Conversation):
         parallel: bool = False,
         moderator_visibility="all",
         moderator_period=None,
+        fused_moderator: bool = False,
+        pipeline_moderator: bool = False,
         **kwargs,
     ):
-        super().__init__(player_names=player_names, parallel=parallel, **kwargs)
+        super().__init__(
+            player_names=player_names,
+            parallel=parallel,
+            fused_moderator=fused_moderator,
+            pipeline_moderator=pipeline_moderator,
+            **kwargs,
+        )
 
         if isinstance(moderator, AgentConfig):
             moderator_config = moderator
@@ -134,6 +178,26 @@ class ModeratedConversation(Conversation):
         else:
             self.moderator_period = moderator_period
 
+        self.fused_moderator = fused_moderator
+        self.pipeline_moderator = pipeline_moderator
+        self._executor = None
+        self._pending_moderator: Future = None
+        self._moderator_terminal = False
+
+    def reset(self):
+        self.close()
+        self._moderator_terminal = False
+        return super().reset()
+
+    def close(self):
+        """Cancel the pending moderator decision and stop the thread of the pipelined moderator."""
+        if self._pending_moderator is not None:
+            self._pending_moderator.cancel()
+            self._pending_moderator = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
     def to_config(self) -> EnvironmentConfig:
         # This environment contains some special config arguments that needs to be handle specially
         return EnvironmentConfig(
@@ -143,7 +207,86 @@ class ModeratedConversation(Conversation):
             moderator=self.moderator.to_config(),
             moderator_visibility=self.moderator_visibility,
             moderator_period=self.moderator_period,
+            fused_moderator=self.fused_moderator,
+            pipeline_moderator=self.pipeline_moderator,
+        )
+
+    def get_state(self) -> Dict[str, Any]:
+        # A pipelined moderator call must be recorded before the state is saved
+        self._resolve_pending_moderator()
+        state = super().get_state()
+        state["_moderator_state"] = {
+            "backend": self.moderator.backend.get_state(),
+            "num_terminal_checks": self.moderator._num_terminal_checks,
+        }
+        return state
+
+    def set_state(self, state: Dict[str, Any]):
+        state = dict(state)
+        moderator_state = state.pop("_moderator_state", None)
+        super().set_state(state)
+        if moderator_state is not None:
+            self.moderator.backend.set_state(moderator_state["backend"])
+            self.moderator._num_terminal_checks = moderator_state["num_terminal_checks"]
+
+    def _is_visible_to(self, player_name: str) -> bool:
+        """Check whether a player can see the moderator messages."""
+        return (
+            self.moderator_visibility == "all"
+            or player_name in self.moderator_visibility
+        )
+
+    def _moderate(self, turn: int) -> Tuple[Message, bool]:
+        """Query the moderator and return its message along with its terminal decision."""
+        # Take a snapshot, as a pipelined call runs while the next player is queried
+        moderator_history = list(self.message_pool.get_all_messages())
+        if self.fused_moderator:
+            moderator_response, terminal = self.moderator.act_and_check_terminal(
+                moderator_history
+            )
+        else:
+            moderator_response = self.moderator(moderator_history)
+            terminal = None
+        moderator_message = Message(
+            agent_name=self.moderator.name,
+            content=moderator_response,
+            turn=turn,
+            visible_to=self.moderator_visibility,
         )
+        if terminal is None:
+            # The terminal check also sees the moderator response, like in the sequential mode
+            terminal = self.moderator.is_terminal(
+                moderator_history + [moderator_message]
+            )
+        return moderator_message, terminal
+
+    def _resolve_pending_moderator(self) -> bool:
+        """Wait for a pipelined moderator call, record its message and return its terminal decision."""
+        if self._pending_moderator is None:
+            return self._moderator_terminal
+        moderator_message, terminal = self._pending_moderator.result()
+        self._pending_moderator = None
+        self.message_pool.append_message(moderator_message)
+        self._moderator_terminal = self._moderator_terminal or terminal
+        return self._moderator_terminal
+
+    def get_observation(self, player_name=None) -> List[Message]:
+        """Get observation for the player."""
+        if player_name is None or self._is_visible_to(player_name):
+            self._resolve_pending_moderator()
+        return super().get_observation(player_name)
+
+    def step_simultaneous(self, actions: Dict[str, str]) -> TimeStep:
+        """
+        Step function for players acting at the same time.
+
+        The actions are applied one by one, so that the moderator still speaks at its usual period.
+        With `parallel=True`, all the player messages of a round end up in the same turn.
+
+        Args:
+            actions: the actions of the players, keyed by player name
+        """
+        return Environment.step_simultaneous(self, actions)
 
     def step(self, player_name: str, action: str) -> TimeStep:
         """
@@ -153,6 +296,14 @@ class ModeratedConversation(Conversation):
             player_name: the name of the player that takes the action
             action: the action that the agents wants to take
         """
+        # A pipelined moderator call from the previous step may have ended the conversation
+        if self._resolve_pending_moderator():
+            return TimeStep(
+                observation=self.get_observation(),
+                reward=self.get_zero_rewards(),
+                terminal=True,
+            )
+
         message = Message(
             agent_name=player_name, content=action, turn=self._current_turn
         )
@@ -165,18 +316,21 @@ class ModeratedConversation(Conversation):
             self.moderator_period == "round" and self._next_player_idx == 0
         ):
             # Moderator's turn
-            moderator_history = self.message_pool.get_all_messages()
-            moderator_response = self.moderator(moderator_history)
-            moderator_message = Message(
-                agent_name=self.moderator.name,
-                content=moderator_response,
-                turn=self._current_turn,
-                visible_to=self.moderator_visibility,
-            )
-            self.message_pool.append_message(moderator_message)
-            terminal = (
-                self.moderator.is_terminal(moderator_history) or self.is_terminal()
-            )
+            if self.pipeline_moderator and not self._is_visible_to(
+                self.get_next_player()
+            ):
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=1)
+                self._pending_moderator = self._executor.submit(
+                    self._moderate, self._current_turn
+                )
+                terminal = self.is_terminal()
+            else:
+                moderator_message, moderator_terminal = self._moderate(
+                    self._current_turn
+                )
+                self.message_pool.append_message(moderator_message)
+                terminal = moderator_terminal or self.is_terminal()
         else:
             terminal = self.is_terminal()
 
@@ -184,9 +338,10 @@ class ModeratedConversation(Conversation):
         if not self.parallel or self._next_player_idx == 0:
             self._current_turn += 1
 
+        # Return all the messages recorded so far, without waiting for a pipelined moderator call
         timestep = TimeStep(
-            observation=self.get_observation(),
+            observation=self.message_pool.get_all_messages(),
             reward=self.get_zero_rewards(),
             terminal=terminal,
-        )  # Return all the messages
+        )
         return timestep
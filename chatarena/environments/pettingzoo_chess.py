@@ -1,5 +1,5 @@
 import re
-from typing import List, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 from pettingzoo.classic import chess_v6
 from pettingzoo.classic.chess.chess_utils import chess, get_move_plane
@@ -7,49 +7,117 @@ from pettingzoo.classic.chess.chess_utils import chess, get_move_plane
 from chatarena.environments.base import Environment, TimeStep, register_env
 
 from ..message import Message, MessagePool
+from .pettingzoo_classic import replay_actions
 
+ACTION_PATTERN = re.compile(r"Move \((\d), (\d)\) to \((\d), (\d)\)")
+MOVE_NOTATIONS = ("uci", "san", "coordinates")
 
-def action_string_to_alphazero_format(action: str, player_index: int) -> int:
-    pattern = r"Move \((\d), (\d)\) to \((\d), (\d)\)"
-    match = re.match(pattern, action)
 
+def action_string_to_coords(action: str) -> Optional[Tuple[int, int, int, int]]:
+    """Parse the (x1, y1, x2, y2) board coordinates of an action, or return None."""
+    match = ACTION_PATTERN.match(action)
     if not match:
-        return -1
+        return None
+    return tuple(int(coord) for coord in match.groups())
 
-    coords = [int(coord) for coord in match.groups()]
-    x1, y1, x2, y2 = coords
 
-    if player_index == 1:
-        x1, y1, x2, y2 = 7 - x1, 7 - y1, 7 - x2, 7 - y2
-    move = chess.Move(from_square=8 * y1 + x1, to_square=8 * y2 + x2, promotion=None)
-    move_plane = get_move_plane(move)
+def move_to_action_string(move: chess.Move) -> str:
+    """The canonical string of a move (the inverse of action_string_to_coords)."""
+    x1, y1 = chess.square_file(move.from_square), chess.square_rank(move.from_square)
+    x2, y2 = chess.square_file(move.to_square), chess.square_rank(move.to_square)
+    return f"Move ({x1}, {y1}) to ({x2}, {y2})"
+
 
-    return x1 * 8 * 73 + y1 * 73 + move_plane
+def move_to_alphazero_format(move: chess.Move, player_index: int) -> int:
+    """The AlphaZero action index of a move of the player, including the underpromotions."""
+    if player_index == 1:
+        # The action space of black is the one of the board mirrored vertically (chess.Board.mirror)
+        move = chess.Move(
+            from_square=chess.square_mirror(move.from_square),
+            to_square=chess.square_mirror(move.to_square),
+            promotion=move.promotion,
+        )
+    x1, y1 = chess.square_file(move.from_square), chess.square_rank(move.from_square)
+    return x1 * 8 * 73 + y1 * 73 + get_move_plane(move)
 
 
 @register_env
 class PettingzooChess(Environment):
-    type_name = "pettingzoo:chess"
+    """
+    Chess, with the moves in UCI (e.g., "e2e4"), SAN (e.g., "Nf3") or coordinates (e.g., "Move (4, 1) to (4, 3)").
+
+    After each move, the moderator gives the position in FEN and the last move, so that the size of the
+    prompt grows by a short message per turn. The full board is available with `render`.
+    """
 
-    def __init__(self, player_names: List[str], **kwargs):
-        super().__init__(player_names=player_names, **kwargs)
+    type_name = "pettingzoo:chess"
+    # The PettingZoo environment is not saved, the game is replayed from its actions on restore
+    _non_checkpoint_attributes = ("env",)
+
+    def __init__(
+        self,
+        player_names: List[str],
+        show_legal_moves: bool = False,
+        notation: str = "uci",
+        board_format: str = "fen",
+        **kwargs,
+    ):
+        """
+        Initialize the environment.
+
+        Parameters:
+            player_names (List[str]): The names of the two players.
+            show_legal_moves (bool): Whether the moderator lists the legal moves of the player to move with the board.
+            notation (str): The notation of the moves given by the moderator: "uci", "san" or "coordinates".
+                The moves of the players are accepted in any of them.
+            board_format (str): The board given by the moderator: "fen", or "ansi" for the full board.
+        """
+        if notation not in MOVE_NOTATIONS:
+            raise ValueError(f"Unknown notation: {notation}")
+        if board_format not in ("fen", "ansi"):
+            raise ValueError(f"Unknown board format: {board_format}")
+        super().__init__(
+            player_names=player_names,
+            show_legal_moves=show_legal_moves,
+            notation=notation,
+            board_format=board_format,
+            **kwargs,
+        )
         self.env = chess_v6.env(render_mode="ansi")
+        self.show_legal_moves = show_legal_moves
+        self.notation = notation
+        self.board_format = board_format
+        # Legal moves and parsed actions of the current position, computed once per position
+        self._legal_moves: Optional[Dict[str, chess.Move]] = None
+        self._sans: Optional[Dict[chess.Move, str]] = None
+        self._san_moves: Optional[Dict[str, chess.Move]] = None
+        self._legal_move_strings: Optional[List[str]] = None
+        self._parsed_actions: Dict[str, Optional[chess.Move]] = {}
 
         # The "state" of the environment is maintained by the message pool
         self.message_pool = MessagePool()
         self._terminal = False
+        self._actions: List[int] = []
         self.reset()
 
+    @property
+    def board(self) -> chess.Board:
+        return self.env.unwrapped.board
+
     def reset(self):
         self.env.reset()
+        self._actions = []
         self.current_player = 0
         self.turn = 0
         self.message_pool.reset()
-
-        obs_dict, reward, terminal, truncation, info = self.env.last()
-        observation = self.get_observation()
-        self._terminal = terminal
-        return TimeStep(observation=observation, reward=reward, terminal=terminal)
+        self._new_position()
+        self._terminal = False
+        self._moderator_speak(self._describe_position())
+        return TimeStep(
+            observation=self.get_observation(),
+            reward=self.get_zero_rewards(),
+            terminal=False,
+        )
 
     def get_next_player(self) -> str:
         return self.player_names[self.current_player]
@@ -69,6 +137,17 @@ class PettingzooChess(Environment):
         )
         self.message_pool.append_message(message)
 
+    def _describe_position(self, last_move: Optional[str] = None) -> str:
+        if self.board_format == "fen":
+            text = f"FEN: {self.board.fen()}"
+        else:
+            text = "\n" + self.render()
+        if last_move is not None:
+            text += f"\nLast move: {last_move}"
+        if self.show_legal_moves and not self._terminal:
+            text += f"\nLegal moves: {', '.join(self.legal_moves)}"
+        return text
+
     def is_terminal(self) -> bool:
         return self._terminal
 
@@ -76,42 +155,133 @@ class PettingzooChess(Environment):
         assert (
             player_name == self.get_next_player()
         ), f"Wrong player! It is {self.get_next_player()} turn."
-        self._moderator_speak("\n" + self.env.render())
 
         message = Message(agent_name=player_name, content=action, turn=self.turn)
         self.message_pool.append_message(message)
-        # Convert the action to the AlphaZero format
-        alphazero_move = action_string_to_alphazero_format(action, self.current_player)
-        if alphazero_move == -1:
+        # Reuse the action parsed by check_action
+        move = self.parse_action(action)
+        if move is None:
             raise ValueError(f"Invalid action: {action}")
 
-        obs_dict, reward, terminal, truncation, info = self.env.last()
-        self.env.step(alphazero_move)
-        self._terminal = terminal  # Update the terminal state
+        last_move = self._move_to_string(move)
+        action = move_to_alphazero_format(move, self.current_player)
+        self.env.step(action)
+        self._actions.append(action)
+        self._new_position()
         reward = {
-            self.player_names[self.current_player]: reward,
-            self.player_names[1 - self.current_player]: 0,
+            player: float(self.env.rewards[agent])
+            for player, agent in zip(self.player_names, self.env.possible_agents)
         }
+        self._terminal = any(self.env.terminations.values()) or any(
+            self.env.truncations.values()
+        )
 
         self.current_player = 1 - self.current_player
         self.turn += 1
+        self._moderator_speak(self._describe_position(last_move))
 
         return TimeStep(
-            observation=self.get_observation(), reward=reward, terminal=terminal
+            observation=self.get_observation(), reward=reward, terminal=self._terminal
         )
 
+    def set_state(self, state: Dict[str, Any]):
+        super().set_state(state)
+        replay_actions(self.env, self._actions)
+        self._new_position()
+
+    def _new_position(self):
+        self._legal_moves = None
+        self._sans = None
+        self._san_moves = None
+        self._legal_move_strings = None
+        self._parsed_actions = {}
+
+    def _get_legal_moves(self) -> Dict[str, chess.Move]:
+        """The legal moves, by UCI and coordinates strings."""
+        if self._legal_moves is None:
+            self._legal_moves = {}
+            for move in self.board.legal_moves:
+                self._legal_moves[move.uci()] = move
+                # The coordinates of a promotion stand for the queen promotion
+                if move.promotion in (None, chess.QUEEN):
+                    self._legal_moves[move_to_action_string(move)] = move
+        return self._legal_moves
+
+    def _get_sans(self) -> Dict[chess.Move, str]:
+        """The SAN of the legal moves, computed only when needed (SAN is slower to compute than UCI)."""
+        if self._sans is None:
+            self._sans = {move: self.board.san(move) for move in self.board.legal_moves}
+        return self._sans
+
+    def _get_san_moves(self) -> Dict[str, chess.Move]:
+        """The legal moves by SAN, without the check and checkmate suffixes."""
+        if self._san_moves is None:
+            self._san_moves = {
+                san.rstrip("+#"): move for move, san in self._get_sans().items()
+            }
+        return self._san_moves
+
+    def _move_to_string(self, move: chess.Move) -> str:
+        if self.notation == "san":
+            if self._sans is not None:
+                return self._sans[move]
+            return self.board.san(move)
+        elif self.notation == "coordinates":
+            return move_to_action_string(move)
+        return move.uci()
+
+    @property
+    def legal_moves(self) -> List[str]:
+        """The legal moves of the player to move, in the notation of the environment."""
+        if self._legal_move_strings is None:
+            if self.notation == "san":
+                self._legal_move_strings = list(self._get_sans().values())
+            else:
+                self._legal_move_strings = [
+                    self._move_to_string(move) for move in self.board.legal_moves
+                ]
+        return list(self._legal_move_strings)
+
+    def parse_action(self, action: str) -> Optional[chess.Move]:
+        """
+        Parse an action in UCI, SAN or coordinates into a move, or return None if it is not a legal move.
+
+        The result is cached until the position changes, so that step() reuses the parsing of check_action().
+        """
+        if action not in self._parsed_actions:
+            self._parsed_actions[action] = self._parse_move(action)
+        return self._parsed_actions[action]
+
+    def _parse_move(self, action: str) -> Optional[chess.Move]:
+        legal_moves = self._get_legal_moves()
+        coords = action_string_to_coords(action.strip())
+        if coords is not None:
+            return legal_moves.get("Move ({}, {}) to ({}, {})".format(*coords))
+        tokens = action.split()
+        if not tokens:
+            return None
+        # The move is the first word, e.g., "e2e4 <EOS>"
+        move = tokens[0].rstrip(".,;")
+        if move.lower() in legal_moves:
+            return legal_moves[move.lower()]
+        move = move.rstrip("+#!?").replace("0", "O")
+        return self._get_san_moves().get(move)
+
     def check_action(self, action: str, agent_name: str) -> bool:
-        # This can be implemented depending on how you want to validate actions for a given agent
-        alphazero_move = action_string_to_alphazero_format(action, self.current_player)
-        if alphazero_move == -1:
-            return False
-        elif self.env.last()[0]["action_mask"][alphazero_move] == 0:
-            return False
-        else:
-            return True
+        return self.parse_action(action) is not None
+
+    def get_invalid_action_feedback(self, actions: List[str], player_name: str) -> str:
+        return (
+            f"{super().get_invalid_action_feedback(actions, player_name)}"
+            f" The legal moves are: {', '.join(self.legal_moves)}."
+        )
+
+    def render(self) -> str:
+        """The full board, as text."""
+        return self.env.render()
 
     def print(self):
-        print(self.env.render())
+        print(self.render())
 
 
 def test_chess_environment():
@@ -123,12 +293,7 @@ def test_chess_environment():
     env.print()
 
     # Move sequence: 1. e4 e5 2. Nf3 Nc6
-    moves = [
-        "Move (4, 1) to (4, 3)",
-        "Move (4, 6) to (4, 4)",
-        "Move (6, 0) to (5, 2)",
-        "Move (1, 7) to (2, 5)",
-    ]
+    moves = ["e2e4", "e5", "Move (6, 0) to (5, 2)", "Nc6"]
 
     for i, move in enumerate(moves):
         assert env.check_action(move, env.get_next_player())
@@ -141,9 +306,10 @@ def test_chess_environment():
 if __name__ == "__main__":
     env = chess_v6.env()
 
-    # Test the conversion function with an example action string
-    action = "Move (0, 1) to (0, 3)"
-    alphazero_move = action_string_to_alphazero_format(action, 0)
+    # Test the conversion of an example action to the AlphaZero format
+    chess_env = PettingzooChess(["player1", "player2"])
+    move = chess_env.parse_action("Move (0, 1) to (0, 3)")
+    alphazero_move = move_to_alphazero_format(move, 0)
     print(alphazero_move)
 
     test_chess_environment()
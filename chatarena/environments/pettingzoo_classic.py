@@ -0,0 +1,468 @@
+"""
+Generic text adapter for the PettingZoo classic environments.
+
+Any classic environment is available as the `pettingzoo:<env_id>` environment type (e.g., "pettingzoo:connect_four"
+or "pettingzoo:connect_four_v3"), unless a hand-written environment is registered under that name.
+The observations, action masks and legal moves are turned into text by a `TextRenderer`:
+a game-specific renderer registered with `register_renderer`, or a generic one for board planes or vectors.
+
+Renderers cache the text of the observations by their bytes (with their shape and dtype), and are shared by all the environments,
+so a position seen again (in the same game or another one) is not rendered twice.
+"""
+import importlib
+import pkgutil
+import random
+import re
+import threading
+from collections import OrderedDict
+from math import sqrt
+from typing import Any, Dict, List, Optional, Sequence, Type, Union
+
+import numpy as np
+import pettingzoo.classic
+
+from ..config import EnvironmentConfig
+from ..message import Message, MessagePool
+from .base import Environment, TimeStep, register_env
+
+
+class TextRenderer:
+    """
+    Turns the observations and actions of a PettingZoo environment into text.
+
+    Subclasses implement `render_observation`, and can override `action_to_string` to name the actions.
+    """
+
+    name: str = None
+
+    def __init__(self, cache_size: int = 4096):
+        """
+        Initialize the renderer.
+
+        Parameters:
+            cache_size (int): The maximum number of rendered observations kept in the cache.
+        """
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[bytes, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.num_hits = 0
+        self.num_misses = 0
+
+    def render(self, observation: np.ndarray) -> str:
+        """Render an observation, or return its cached text if it was already rendered."""
+        key = (
+            observation.tobytes()
+            + str(observation.shape).encode()
+            + observation.dtype.str.encode()
+        )
+        with self._lock:
+            text = self._cache.get(key)
+            if text is not None:
+                self._cache.move_to_end(key)
+                self.num_hits += 1
+                return text
+            self.num_misses += 1
+
+        text = self.render_observation(observation)
+        with self._lock:
+            self._cache[key] = text
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return text
+
+    def render_observation(self, observation: np.ndarray) -> str:
+        raise NotImplementedError
+
+    def action_to_string(self, action: int, num_actions: int) -> str:
+        """The canonical string of an action, among num_actions."""
+        return f"Action {action}"
+
+
+class PlanesRenderer(TextRenderer):
+    """
+    Renders a (height, width, planes) board, with a symbol for each of the first planes.
+
+    The first plane is the one of the observing player in the classic environments, so its pieces are shown as "X".
+    """
+
+    name = "planes"
+
+    def __init__(
+        self,
+        symbols: Sequence[str] = ("X", "O"),
+        empty: str = "_",
+        transpose: bool = False,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        # The symbol of each plane, and the empty symbol at index 0
+        self.symbols = np.array([empty, *symbols])
+        self.transpose = transpose
+
+    def render_observation(self, observation: np.ndarray) -> str:
+        planes = observation[..., : len(self.symbols) - 1] != 0
+        if self.transpose:
+            planes = planes.transpose(1, 0, 2)
+        # The index of the first plane set in each cell (plus one), or 0 if the cell is empty
+        occupied = planes.any(axis=-1)
+        cells = self.symbols[np.where(occupied, planes.argmax(axis=-1) + 1, 0)]
+        return "".join("| " + " | ".join(row) + " |\n" for row in cells.tolist())
+
+
+class VectorRenderer(TextRenderer):
+    """Renders any observation as the list of its non-zero features."""
+
+    name = "vector"
+
+    def render_observation(self, observation: np.ndarray) -> str:
+        observation = np.asarray(observation).ravel()
+        features = [
+            str(index) if value == 1 else f"{index}={value}"
+            for index, value in zip(
+                observation.nonzero()[0].tolist(),
+                observation[observation.nonzero()].tolist(),
+            )
+        ]
+        return f"Observation features: {', '.join(features) or 'none'}"
+
+
+RENDERER_REGISTRY: Dict[str, Type[TextRenderer]] = {}
+# The shared instances of the renderers, with their caches
+_renderers: Dict[str, TextRenderer] = {}
+
+
+def register_renderer(cls: Type[TextRenderer]) -> Type[TextRenderer]:
+    """
+    Register a renderer class, under the name of the environment it renders (without version, e.g., "connect_four").
+
+    Parameters:
+        cls (Type[TextRenderer]): The class to register.
+
+    Returns:
+        Type[TextRenderer]: The class that was registered.
+    """
+    RENDERER_REGISTRY[cls.name] = cls
+    return cls
+
+
+register_renderer(PlanesRenderer)
+register_renderer(VectorRenderer)
+
+
+def load_renderer(name: str) -> TextRenderer:
+    """Return the shared instance of a registered renderer."""
+    if name not in _renderers:
+        try:
+            renderer_cls = RENDERER_REGISTRY[name]
+        except KeyError:
+            raise ValueError(f"Unknown renderer: {name}")
+        _renderers.setdefault(name, renderer_cls())
+    return _renderers[name]
+
+
+@register_renderer
+class ConnectFourRenderer(PlanesRenderer):
+    name = "connect_four"
+
+    def render_observation(self, observation: np.ndarray) -> str:
+        columns = "  " + "   ".join(str(i + 1) for i in range(observation.shape[1]))
+        return f"{columns}\n{super().render_observation(observation)}"
+
+    def action_to_string(self, action: int, num_actions: int) -> str:
+        return f"Column {action + 1}"
+
+
+@register_renderer
+class GoRenderer(PlanesRenderer):
+    name = "go"
+
+    def action_to_string(self, action: int, num_actions: int) -> str:
+        # The last action is a pass, the others are the flattened (row, column) of the board
+        size = int(round(sqrt(num_actions - 1)))
+        if action == size * size:
+            return "Pass"
+        row, column = divmod(action, size)
+        return f"Stone at ({row}, {column})"
+
+
+ENV_ID_PATTERN = re.compile(r"(.+)_v(\d+)")
+
+
+def load_pettingzoo_module(env_id: str):
+    """
+    Import the module of a PettingZoo classic environment.
+
+    Parameters:
+        env_id (str): The name of the environment, with a version (e.g., "connect_four_v3") or without (the latest).
+    """
+    if ENV_ID_PATTERN.fullmatch(env_id) is None:
+        versions = [
+            int(match.group(2))
+            for match in (
+                ENV_ID_PATTERN.fullmatch(module.name)
+                for module in pkgutil.iter_modules(pettingzoo.classic.__path__)
+            )
+            if match is not None and match.group(1) == env_id
+        ]
+        if not versions:
+            raise ValueError(f"Unknown PettingZoo classic environment: {env_id}")
+        env_id = f"{env_id}_v{max(versions)}"
+    return importlib.import_module(f"pettingzoo.classic.{env_id}")
+
+
+def replay_actions(env, actions: Sequence[Optional[int]], seed: Optional[int] = None):
+    """
+    Reset a PettingZoo environment and step it through the actions of a game, e.g., to restore a checkpoint.
+
+    Parameters:
+        env: The PettingZoo AEC environment.
+        actions (Sequence[Optional[int]]): The actions passed to `env.step` since the reset.
+        seed (Optional[int]): The seed of the reset, for the environments with chance events.
+    """
+    env.reset(seed=seed)
+    for action in actions:
+        env.step(action)
+
+
+@register_env
+class PettingzooClassic(Environment):
+    """
+    Any PettingZoo classic environment, played through text.
+
+    The players are mapped to the agents of the environment in order. Before each move, the moderator tells the
+    next player its observation (and its legal moves), which only this player sees. The moves are seen by everyone.
+    A move is the canonical string of a legal action (see `legal_moves`) or its index.
+    """
+
+    type_name = "pettingzoo"
+    # The PettingZoo environment is not saved, the game is replayed from its seed and actions on restore
+    _non_checkpoint_attributes = ("renderer", "env")
+
+    def __init__(
+        self,
+        player_names: List[str],
+        env_id: str,
+        renderer: Optional[str] = None,
+        show_legal_moves: bool = True,
+        env_kwargs: Optional[dict] = None,
+        **kwargs,
+    ):
+        """
+        Initialize the environment.
+
+        Parameters:
+            player_names (List[str]): The names of the players, one per agent of the environment.
+            env_id (str): The name of the PettingZoo classic environment (e.g., "connect_four").
+            renderer (Optional[str]): The name of a registered renderer. Defaults to the renderer registered for the
+                environment, or a generic one for board planes or vectors.
+            show_legal_moves (bool): Whether the moderator lists the legal moves of the next player.
+            env_kwargs (Optional[dict]): The arguments of the PettingZoo environment.
+        """
+        super().__init__(
+            player_names=player_names,
+            env_id=env_id,
+            renderer=renderer,
+            show_legal_moves=show_legal_moves,
+            env_kwargs=env_kwargs,
+            **kwargs,
+        )
+        self.env_id = env_id
+        self.env = load_pettingzoo_module(env_id).env(**(env_kwargs or {}))
+        if len(player_names) != len(self.env.possible_agents):
+            raise ValueError(
+                f"{env_id} has {len(self.env.possible_agents)} agents, got {len(player_names)} players"
+            )
+        self._agent_to_player = dict(zip(self.env.possible_agents, player_names))
+        self._player_to_agent = dict(zip(player_names, self.env.possible_agents))
+        self.show_legal_moves = show_legal_moves
+        self.renderer_name = renderer
+        self.renderer: Optional[TextRenderer] = None
+
+        # Legal moves and parsed actions of the current position, computed once per position
+        self._legal_moves: Optional[Dict[str, int]] = None
+        self._parsed_actions: Dict[str, Optional[int]] = {}
+
+        # The "state" of the environment is maintained by the message pool
+        self.message_pool = MessagePool()
+        self._terminal = False
+        self.turn = 0
+        self._seed: Optional[int] = None
+        self._actions: List[Optional[int]] = []
+        self.reset()
+
+    @classmethod
+    def from_config(cls, config: EnvironmentConfig):
+        config = dict(config)
+        env_type = config.pop("env_type")
+        if "env_id" not in config:
+            prefix, _, env_id = env_type.partition(":")
+            if not env_id:
+                raise ValueError(
+                    f"Unknown environment type: {env_type} (the env_id is missing, e.g., {prefix}:connect_four)"
+                )
+            config["env_id"] = env_id
+        return cls(**config)
+
+    def to_config(self) -> EnvironmentConfig:
+        config = super().to_config()
+        config["env_type"] = f"{self.type_name}:{self.env_id}"
+        return config
+
+    def reset(self):
+        # The seed is recorded, so that the chance events of the game can be replayed
+        self._seed = random.randrange(2**31)
+        self._actions = []
+        self.env.reset(seed=self._seed)
+        self.turn = 0
+        self.message_pool.reset()
+        self._new_position()
+        self._terminal = False
+        self._announce_observation()
+        return TimeStep(
+            observation=self.get_observation(),
+            reward=self.get_zero_rewards(),
+            terminal=False,
+        )
+
+    def get_next_player(self) -> str:
+        return self._agent_to_player[self.env.agent_selection]
+
+    def get_observation(self, player_name=None) -> List[Message]:
+        if player_name is None:
+            return self.message_pool.get_all_messages()
+        else:
+            return self.message_pool.get_visible_messages(
+                player_name, turn=self.turn + 1
+            )
+
+    def _moderator_speak(self, text: str, visible_to: Union[str, List[str]] = "all"):
+        """Moderator say something."""
+        message = Message(
+            agent_name="Moderator", content=text, turn=self.turn, visible_to=visible_to
+        )
+        self.message_pool.append_message(message)
+
+    def _get_renderer(self, observation: np.ndarray) -> TextRenderer:
+        if self.renderer is None:
+            name = self.renderer_name
+            if name is None:
+                env_name = ENV_ID_PATTERN.fullmatch(self.env.metadata["name"])
+                env_name = env_name.group(1) if env_name else self.env.metadata["name"]
+                if env_name in RENDERER_REGISTRY:
+                    name = env_name
+                else:
+                    name = "planes" if observation.ndim == 3 else "vector"
+            self.renderer = load_renderer(name)
+        return self.renderer
+
+    def _observe(self):
+        """The observation and the action mask of the next agent."""
+        observation = self.env.observe(self.env.agent_selection)
+        if isinstance(observation, dict) and "action_mask" in observation:
+            return np.asarray(observation["observation"]), observation["action_mask"]
+        # Environments without an action mask allow every action
+        num_actions = self.env.action_space(self.env.agent_selection).n
+        return np.asarray(observation), np.ones(num_actions, dtype=np.int8)
+
+    def _announce_observation(self):
+        observation, _ = self._observe()
+        text = "\n" + self._get_renderer(observation).render(observation)
+        if self.show_legal_moves:
+            text += f"\nLegal moves: {', '.join(self.legal_moves)}"
+        self._moderator_speak(text, visible_to=[self.get_next_player()])
+
+    def is_terminal(self) -> bool:
+        return self._terminal
+
+    def step(self, player_name: str, action: str) -> TimeStep:
+        assert (
+            player_name == self.get_next_player()
+        ), f"Wrong player! It is {self.get_next_player()} turn."
+
+        message = Message(agent_name=player_name, content=action, turn=self.turn)
+        self.message_pool.append_message(message)
+        # Reuse the action parsed by check_action
+        action_index = self.parse_action(action)
+        if action_index is None:
+            raise ValueError(f"Invalid action: {action}")
+
+        self.env.step(action_index)
+        self._actions.append(action_index)
+        self._new_position()
+        reward = {
+            self._agent_to_player[agent]: float(agent_reward)
+            for agent, agent_reward in self.env.rewards.items()
+        }
+        # The agents which are out of the game are removed by stepping them with None
+        while self.env.agents and self._is_done(self.env.agent_selection):
+            if all(self._is_done(agent) for agent in self.env.agents):
+                break
+            self.env.step(None)
+            self._actions.append(None)
+        self._terminal = not self.env.agents or all(
+            self._is_done(agent) for agent in self.env.agents
+        )
+
+        self.turn += 1
+        if not self._terminal:
+            self._announce_observation()
+
+        return TimeStep(
+            observation=self.get_observation(), reward=reward, terminal=self._terminal
+        )
+
+    def set_state(self, state: Dict[str, Any]):
+        super().set_state(state)
+        replay_actions(self.env, self._actions, seed=self._seed)
+        self._new_position()
+
+    def _is_done(self, agent: str) -> bool:
+        return self.env.terminations[agent] or self.env.truncations[agent]
+
+    def _new_position(self):
+        self._legal_moves = None
+        self._parsed_actions = {}
+
+    def _get_legal_moves(self) -> Dict[str, int]:
+        if self._legal_moves is None:
+            observation, action_mask = self._observe()
+            renderer = self._get_renderer(observation)
+            self._legal_moves = {
+                renderer.action_to_string(int(action), len(action_mask)): int(action)
+                for action in np.asarray(action_mask).nonzero()[0]
+            }
+        return self._legal_moves
+
+    @property
+    def legal_moves(self) -> List[str]:
+        """The canonical strings of the legal moves of the next player."""
+        return list(self._get_legal_moves())
+
+    def parse_action(self, action: str) -> Optional[int]:
+        """
+        Parse an action (a canonical string or an index) into its index, or return None if it is not a legal move.
+
+        The result is cached until the position changes, so that step() reuses the parsing of check_action().
+        """
+        if action not in self._parsed_actions:
+            legal_moves = self._get_legal_moves()
+            action_index = legal_moves.get(action.strip())
+            if action_index is None and action.strip().isdigit():
+                action_index = int(action.strip())
+                if action_index not in legal_moves.values():
+                    action_index = None
+            self._parsed_actions[action] = action_index
+        return self._parsed_actions[action]
+
+    def check_action(self, action: str, player_name: str) -> bool:
+        return self.parse_action(action) is not None
+
+    def get_invalid_action_feedback(self, actions: List[str], player_name: str) -> str:
+        return (
+            f"{super().get_invalid_action_feedback(actions, player_name)}"
+            f" The legal moves are: {', '.join(self.legal_moves)}."
+        )
+
+    def print(self):
+        observation, _ = self._observe()
+        print(self._get_renderer(observation).render(observation))
@@ -1,16 +1,19 @@
 import re
-from typing import List, Union
+from typing import Any, Dict, List, Optional, Union
 
 from pettingzoo.classic import tictactoe_v3
 
 from chatarena.environments.base import Environment, TimeStep, register_env
 
 from ..message import Message, MessagePool
+from .pettingzoo_classic import PlanesRenderer, replay_actions
+
+ACTION_PATTERN = re.compile(r"(X|O): \((\d), (\d)\)")
+TICTACTOE_RENDERER = PlanesRenderer(symbols=("X", "O"), transpose=True)
 
 
 def action_string_to_action(action: str) -> int:
-    pattern = r"(X|O): \((\d), (\d)\)"
-    match = re.match(pattern, action)
+    match = ACTION_PATTERN.match(action)
 
     if not match:
         return -1
@@ -27,24 +30,49 @@ def action_string_to_action(action: str) -> int:
     return row + column * 3
 
 
+def action_to_action_string(action: int, symbol: str) -> str:
+    """The canonical string of an action index (the inverse of action_string_to_action)."""
+    return f"{symbol}: ({action % 3 + 1}, {action // 3 + 1})"
+
+
 @register_env
 class PettingzooTicTacToe(Environment):
     type_name = "pettingzoo:tictactoe"
-
-    def __init__(self, player_names: List[str], **kwargs):
-        super().__init__(player_names=player_names, **kwargs)
+    # The PettingZoo environment is not saved, the game is replayed from its actions on restore
+    _non_checkpoint_attributes = ("env",)
+
+    def __init__(
+        self, player_names: List[str], show_legal_moves: bool = False, **kwargs
+    ):
+        """
+        Initialize the environment.
+
+        Parameters:
+            player_names (List[str]): The names of the two players.
+            show_legal_moves (bool): Whether the moderator lists the legal moves of the next player after each move.
+        """
+        super().__init__(
+            player_names=player_names, show_legal_moves=show_legal_moves, **kwargs
+        )
         self.env = tictactoe_v3.env()
+        self.show_legal_moves = show_legal_moves
+        # Legal moves and parsed actions of the current position, computed once per position
+        self._legal_moves: Optional[Dict[int, str]] = None
+        self._parsed_actions: Dict[str, Optional[int]] = {}
 
         # The "state" of the environment is maintained by the message pool
         self.message_pool = MessagePool()
         self._terminal = False
+        self._actions: List[int] = []
         self.reset()
 
     def reset(self):
         self.env.reset()
+        self._actions = []
         self.current_player = 0
         self.turn = 0
         self.message_pool.reset()
+        self._new_position()
 
         obs_dict, reward, terminal, truncation, info = self.env.last()
         observation = self.get_observation()
@@ -79,12 +107,14 @@ class PettingzooTicTacToe(Environment):
 
         message = Message(agent_name=player_name, content=action, turn=self.turn)
         self.message_pool.append_message(message)
-        # Convert the action to the AlphaZero format
-        action_index = action_string_to_action(action)
-        if action_index == -1:
+        # Reuse the action parsed by check_action
+        action_index = self.parse_action(action)
+        if action_index is None:
             raise ValueError(f"Invalid action: {action}")
 
         self.env.step(action_index)
+        self._actions.append(action_index)
+        self._new_position()
         obs_dict, reward, terminal, truncation, info = self.env.last()
 
         self._terminal = terminal  # Update the terminal state
@@ -95,36 +125,66 @@ class PettingzooTicTacToe(Environment):
 
         self.current_player = 1 - self.current_player
         self.turn += 1
-        self._moderator_speak("\n" + self.render_ansi(obs_dict["observation"]))
+        board = "\n" + self.render_ansi(obs_dict["observation"])
+        if self.show_legal_moves and not terminal:
+            board += f"\nLegal moves: {', '.join(self.legal_moves)}"
+        self._moderator_speak(board)
 
         return TimeStep(
             observation=self.get_observation(), reward=reward, terminal=terminal
         )
 
+    def set_state(self, state: Dict[str, Any]):
+        super().set_state(state)
+        replay_actions(self.env, self._actions)
+        self._new_position()
+
+    def _new_position(self):
+        self._legal_moves = None
+        self._parsed_actions = {}
+
+    def _get_legal_moves(self) -> Dict[int, str]:
+        if self._legal_moves is None:
+            symbol = "X" if self.current_player == 0 else "O"
+            action_mask = self.env.last()[0]["action_mask"]
+            self._legal_moves = {
+                int(action): action_to_action_string(int(action), symbol)
+                for action in action_mask.nonzero()[0]
+            }
+        return self._legal_moves
+
+    @property
+    def legal_moves(self) -> List[str]:
+        """The canonical strings of the legal moves of the next player."""
+        return list(self._get_legal_moves().values())
+
+    def parse_action(self, action: str) -> Optional[int]:
+        """
+        Parse an action into its index, or return None if it is not a legal move.
+
+        The result is cached until the position changes, so that step() reuses the parsing of check_action().
+        """
+        if action not in self._parsed_actions:
+            action_index = action_string_to_action(action)
+            self._parsed_actions[action] = (
+                action_index if action_index in self._get_legal_moves() else None
+            )
+        return self._parsed_actions[action]
+
     def check_action(self, action: str, agent_name: str) -> bool:
-        # This can be implemented depending on how you want to validate actions for a given agent
-        action_index = action_string_to_action(action)
-        if action_index == -1:
-            return False
-        elif self.env.last()[0]["action_mask"][action_index] == 0:
-            return False
-        else:
-            return True
+        return self.parse_action(action) is not None
+
+    def get_invalid_action_feedback(self, actions: List[str], player_name: str) -> str:
+        return (
+            f"{super().get_invalid_action_feedback(actions, player_name)}"
+            f" The legal moves are: {', '.join(self.legal_moves)}."
+        )
 
     def render_ansi(self, observation):
-        string = ""
-        observation = observation.transpose(1, 0, 2)
-        for row in observation:
-            string += "|"
-            for column in row:
-                symbol = "_"
-                if column[self.current_player] == 1:
-                    symbol = "X"
-                elif column[1 - self.current_player] == 1:
-                    symbol = "O"
-                string += " " + symbol + " |"
-            string += "\n"
-        return string
+        # The first plane of the observation is the one of the player to move
+        if self.current_player == 1:
+            observation = observation[..., ::-1]
+        return TICTACTOE_RENDERER.render(observation)
 
     def print(self):
         obs_dict, reward, terminal, truncation, info = self.env.last()
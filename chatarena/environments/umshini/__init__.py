@@ -1,9 +1,11 @@
 from .content_moderation import ContentModerationEnv, create_content_moderation_env
 from .debate import DebateEnv, create_debate_env
 from .deception import DeceptionEnv, create_deception_env
+from .judge import JudgeService, get_judge_service
 from .pettingzoo_wrapper import PettingZooCompatibilityV0
 from .symmetric_content_moderation import (
     SymmetricContentModerationEnv,
     create_symmetric_content_moderation_env,
 )
 from .symmetric_deception import SymmetricDeceptionEnv, create_symmetric_deception_env
+from .vector import UmshiniVectorEnv, make_vector_env
@@ -1,6 +1,7 @@
 # pyright: reportGeneralTypeIssues=false
 
-from typing import Dict, List, Union
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
 from langchain.prompts import PromptTemplate
 from pettingzoo.utils import agent_selector
@@ -8,9 +9,28 @@ from pettingzoo.utils import agent_selector
 from chatarena.environments.base import Environment, TimeStep
 from chatarena.message import Message, MessagePool
 
+JUDGING_MODES = ("sync", "background", "episode_end")
+
+# Judge calls are network bound, so a small thread pool shared by all environments is enough
+_judge_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_judge_executor() -> ThreadPoolExecutor:
+    global _judge_executor
+    if _judge_executor is None:
+        _judge_executor = ThreadPoolExecutor(
+            max_workers=8, thread_name_prefix="umshini-judge"
+        )
+    return _judge_executor
+
 
 class UmshiniBaseEnv(Environment):
     type_name = "base"
+    # How judgments are made: "sync" blocks the turn on the judge, "background" queues the judge call
+    # right away and "episode_end" runs all the queued calls in one concurrent batch when the episode ends.
+    # Deferred rewards are reconciled into the terminal TimeStep. The announcements of deferred judgments are added to
+    # the message pool when they are reconciled, stamped with the turn they judge, so they come later in the transcript.
+    judging_mode = "sync"
     _colors = {
         "red": "\033[91m",
         "green": "\033[92m",
@@ -37,6 +57,7 @@ class UmshiniBaseEnv(Environment):
         self._initialized = False
         self._moderator_prompt_template = moderator_prompt_template
         self._moderator_prompt_input = moderator_prompt_input
+        self._moderator_prompt = None  # opening message, formatted once per instance
         self._round_length = round_length
         self.character_limit = character_limit
         self.agent_selector = agent_selector(self.player_names)
@@ -56,25 +77,49 @@ class UmshiniBaseEnv(Environment):
         self._current_phase = "start"
         self._winner = None
         self._initialized = True
+        for _, future, _ in getattr(self, "_pending_judgments", []):
+            if future is not None:
+                future.cancel()
+        self._pending_judgments: List[
+            Tuple[Optional[Callable[[], Any]], Optional[Future], Callable]
+        ] = []
+        # Rewards of the judgments reconciled before the end of the episode (e.g., for a checkpoint)
+        self._reconciled_rewards: Dict[str, float] = {}
         self.agent_selector = agent_selector(self.player_names)
-        self._moderator_speak(
-            self._moderator_prompt_template.format(
+        if self._moderator_prompt is None:
+            self._moderator_prompt = self._moderator_prompt_template.format(
                 moderator_prompt_input=self._moderator_prompt_input,
                 character_limit=self.character_limit,
             )
-        )
+        self._moderator_speak(self._moderator_prompt)
         return TimeStep(
             observation=self.get_observation(),
             reward=self.get_zero_rewards(),
             terminal=False,
         )
 
-    def _moderator_speak(self, text: str, visible_to: Union[str, List[str]] = "all"):
-        """Moderator say something to both players."""
+    @classmethod
+    def _compile_moderator_prompt_template(cls, suffix: str = "") -> PromptTemplate:
+        """Build a per-instance moderator prompt template from the class-level one.
+
+        The class-level template is shared by every instance, so it must never be mutated.
+        """
+        return PromptTemplate(
+            input_variables=list(cls._moderator_prompt_template.input_variables),
+            template=cls._moderator_prompt_template.template + suffix,
+        )
+
+    def _moderator_speak(
+        self,
+        text: str,
+        visible_to: Union[str, List[str]] = "all",
+        turn: Optional[int] = None,
+    ):
+        """Moderator say something to both players, at the current turn unless another one is given."""
         message = Message(
             agent_name="Moderator",
             content=text,
-            turn=self._current_turn,
+            turn=self._current_turn if turn is None else turn,
             visible_to=visible_to,
         )
         self.message_pool.append_message(message)
@@ -144,6 +189,54 @@ class UmshiniBaseEnv(Environment):
         """Get the name of the next player."""
         return self.agent_selector.next()
 
+    def _queue_judgment(
+        self,
+        judge: Optional[Callable[[], Any]],
+        reconcile: Callable[[Any], Dict[str, float]],
+    ):
+        """Defer a judgment until the end of the episode.
+
+        Args:
+            judge: slow call to the judge, working on a snapshot of the state (None if no call is needed)
+            reconcile: turns the result of the judge into rewards (and announces them), called at the end of the episode
+        """
+        future = None
+        if judge is not None and self.judging_mode == "background":
+            future = _get_judge_executor().submit(judge)
+        self._pending_judgments.append((judge, future, reconcile))
+
+    def _reconcile_judgments(self) -> Dict[str, float]:
+        """Wait for the deferred judgments and return the sum of their rewards."""
+        pending, self._pending_judgments = self._pending_judgments, []
+        reconciled, self._reconciled_rewards = self._reconciled_rewards, {}
+        # Submit every judgment that is not running yet, so that they run as one concurrent batch
+        pending = [
+            (
+                judge,
+                future
+                if future is not None or judge is None
+                else _get_judge_executor().submit(judge),
+                reconcile,
+            )
+            for judge, future, reconcile in pending
+        ]
+
+        rewards = self.get_zero_rewards()
+        for player_name, reward in reconciled.items():
+            rewards[player_name] = rewards.get(player_name, 0.0) + reward
+        for _, future, reconcile in pending:
+            result = future.result() if future is not None else None
+            for player_name, reward in reconcile(result).items():
+                rewards[player_name] = rewards.get(player_name, 0.0) + reward
+        return rewards
+
+    def get_state(self) -> Dict[str, Any]:
+        # The queued judge calls cannot be pickled, so they are reconciled into verdicts before the state is saved,
+        # and their rewards are kept until the end of the episode
+        if self._pending_judgments:
+            self._reconciled_rewards = self._reconcile_judgments()
+        return super().get_state()
+
     def get_rewards(self) -> Dict[str, float]:
         """Use langchain to analyze the conversation, pick a winner, and set the reward."""
         raise NotImplementedError
@@ -3,15 +3,14 @@
 from __future__ import annotations
 
 import ast
-import os
 import random
 
-from langchain.chat_models import AzureChatOpenAI, ChatOpenAI
 from langchain.prompts import PromptTemplate
 from langchain.schema import AIMessage, HumanMessage, SystemMessage
 
 from chatarena.environments.base import TimeStep
 from chatarena.environments.umshini.base import UmshiniBaseEnv
+from chatarena.environments.umshini.judge import get_judge_service
 from chatarena.message import Message, MessagePool
 
 
@@ -39,13 +38,13 @@ Your first response should be an opening statement.""",
         disable_judging=False,
         **kwargs,
     ):
-        self._moderator_prompt_template.template = (
-            self._moderator_prompt_template.template
-            + f"{player_names[0]} is playing as the Proponent, and {player_names[1]} is playing as the Opponent."
-        )  # add the first player's name to the end of the prompt template
+        # add the first player's name to the end of the prompt template (per instance, the class-level template is shared)
+        moderator_prompt_template = self._compile_moderator_prompt_template(
+            f"{player_names[0]} is playing as the Proponent, and {player_names[1]} is playing as the Opponent."
+        )
         super().__init__(
             player_names=player_names,
-            moderator_prompt_template=self._moderator_prompt_template,
+            moderator_prompt_template=moderator_prompt_template,
             moderator_prompt_input=topic,
             round_length=round_length,
             character_limit=character_limit,
@@ -159,34 +158,9 @@ def judge_debate(
                     content=f"{message.agent_name} -> Turn:{message.turn}:\n{message.content}"
                 )
             )
-    if os.getenv("OPENAI_API_TYPE") == "azure":
-        llm = AzureChatOpenAI(
-            temperature=0,
-            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-            azure_deployment=os.getenv("AZURE_DEPLOYMENT") or "gpt-4",
-            openai_api_version=os.getenv("OPENAI_API_VERSION") or "2023-05-15",
-        )
-        try:
-            response = llm(langchain_messages)
-        except Exception as e:
-            print(e)
-    else:
-        llm = ChatOpenAI(
-            temperature=0,
-            openai_api_key=os.getenv("OPENAI_API_KEY"),
-            model_name=model_name,
-        )
-        try:
-            response = llm(langchain_messages)
-        except Exception:
-            backup_model = "gpt-3.5-turbo-16k"
-            print(f"{model_name} not found, using {backup_model}")
-            llm = ChatOpenAI(
-                temperature=0,
-                openai_api_key=os.getenv("OPENAI_API_KEY"),
-                model_name=backup_model,
-            )
-            response = llm(langchain_messages)
+    response = get_judge_service().judge(
+        langchain_messages, model_name=model_name, backup_model="gpt-3.5-turbo-16k"
+    )
 
     start_index = response.content.find("SCORES:")
     if start_index != -1:
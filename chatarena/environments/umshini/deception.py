@@ -2,16 +2,15 @@
 # pyright: reportOptionalMemberAccess=false
 from __future__ import annotations
 
-import os
 import random
 import re
 
-from langchain.chat_models import AzureChatOpenAI, ChatOpenAI
 from langchain.prompts import PromptTemplate
 from langchain.schema import AIMessage, HumanMessage, SystemMessage
 
 from chatarena.environments import TimeStep
 from chatarena.environments.umshini.base import UmshiniBaseEnv
+from chatarena.environments.umshini.judge import get_judge_service
 from chatarena.message import Message, MessagePool
 
 
@@ -46,14 +45,14 @@ You will be told when you are swapping roles.
         disable_judging: bool | None = False,
         **kwargs,
     ):
-        self._moderator_prompt_template.template = (
-            self._moderator_prompt_template.template
-            + f"{player_names[0]} is attacking first, and {player_names[1]} is defending."
-        )  # add the first player's name to the end of the prompt template
+        # add the first player's name to the end of the prompt template (per instance, the class-level template is shared)
+        moderator_prompt_template = self._compile_moderator_prompt_template(
+            f"{player_names[0]} is attacking first, and {player_names[1]} is defending."
+        )
 
         super().__init__(
             player_names=player_names,
-            moderator_prompt_template=self._moderator_prompt_template,
+            moderator_prompt_template=moderator_prompt_template,
             moderator_prompt_input=restricted_action,
             character_limit=character_limit,
             disable_judging=disable_judging,
@@ -253,32 +252,7 @@ EXPLANATION: [explanation of why it is/is not a violation, and an explanation of
                 content=f"[{defender_response.agent_name} (defender) -> all]:{defender_response.content}"
             )
         )
-        if os.getenv("OPENAI_API_TYPE") == "azure":
-            llm = AzureChatOpenAI(
-                temperature=0,
-                azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-                azure_deployment=os.getenv("AZURE_DEPLOYMENT") or "gpt-4",
-                openai_api_version=os.getenv("OPENAI_API_VERSION") or "2023-05-15",
-            )
-            response = llm(langchain_messages)
-        else:
-            llm = ChatOpenAI(
-                temperature=0,
-                openai_api_key=os.getenv("OPENAI_API_KEY"),
-                model_name=model_name,
-            )
-            try:
-                response = llm(langchain_messages)
-            except Exception:
-                backup_model = "gpt-3.5-turbo"
-                print(f"{model_name} not found, using {backup_model}")
-                llm = ChatOpenAI(
-                    temperature=0,
-                    openai_api_key=os.getenv("OPENAI_API_KEY"),
-                    model_name=backup_model,
-                )
-                response = llm(langchain_messages)
-        return response
+        return get_judge_service().judge(langchain_messages, model_name=model_name)
 
 
 def create_deception_env(
@@ -0,0 +1,144 @@
+# pyright: reportGeneralTypeIssues=false
+"""Shared judge service for Umshini environments.
+
+Judge clients are pooled per model and reused across judgments and environments,
+and verdicts are memoized by the hash of the judge prompt and the judged messages,
+so replays and repeated attacks skip the network call.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+
+from langchain.chat_models import AzureChatOpenAI, ChatOpenAI
+from langchain.schema import AIMessage, BaseMessage
+
+from chatarena.message import _hash
+
+
+class JudgeService:
+    """Pool of judge clients with a memoized verdict cache.
+
+    The service is thread-safe, so a single instance can be shared by every environment in a process.
+    """
+
+    def __init__(self, cache_size: int | None = 4096):
+        """Judge service.
+
+        Args:
+            cache_size (Optional[int]): maximum number of memoized verdicts (None for unbounded, 0 to disable)
+        """
+        self.cache_size = cache_size
+        self._clients: dict[tuple[str, str], ChatOpenAI] = {}
+        self._verdicts: OrderedDict[str, AIMessage] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_client(self, model_name: str) -> ChatOpenAI:
+        """Return the pooled client for a model, creating it on first use."""
+        api_type = "azure" if os.getenv("OPENAI_API_TYPE") == "azure" else "openai"
+        key = (api_type, model_name)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                if api_type == "azure":
+                    client = AzureChatOpenAI(
+                        temperature=0,
+                        azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+                        azure_deployment=os.getenv("AZURE_DEPLOYMENT") or "gpt-4",
+                        openai_api_version=os.getenv("OPENAI_API_VERSION")
+                        or "2023-05-15",
+                    )
+                else:
+                    client = ChatOpenAI(
+                        temperature=0,
+                        openai_api_key=os.getenv("OPENAI_API_KEY"),
+                        model_name=model_name,
+                    )
+                self._clients[key] = client
+        return client
+
+    @staticmethod
+    def verdict_key(langchain_messages: list[BaseMessage], model_name: str) -> str:
+        """Hash the judge prompt (which contains the policy or restricted action) and the judged messages."""
+        message_hashes = [
+            f"{message.type}:{_hash(message.content)}" for message in langchain_messages
+        ]
+        return _hash(model_name + "\n" + "\n".join(message_hashes))
+
+    def _lookup(self, key: str) -> AIMessage | None:
+        with self._lock:
+            verdict = self._verdicts.get(key)
+            if verdict is not None:
+                self._verdicts.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return verdict
+
+    def _store(self, key: str, verdict: AIMessage):
+        if self.cache_size == 0:
+            return
+        with self._lock:
+            self._verdicts[key] = verdict
+            self._verdicts.move_to_end(key)
+            if self.cache_size is not None:
+                while len(self._verdicts) > self.cache_size:
+                    self._verdicts.popitem(last=False)
+
+    def judge(
+        self,
+        langchain_messages: list[BaseMessage],
+        model_name: str = "gpt-3.5-turbo",
+        backup_model: str | None = "gpt-3.5-turbo",
+        key_messages: list[BaseMessage] | None = None,
+    ) -> AIMessage:
+        """Get a verdict from the judge, using the cache when the same judgment was already made.
+
+        Args:
+            langchain_messages (list[BaseMessage]): judge prompt followed by the messages to judge
+            model_name (str): model used for the judgment
+            backup_model (Optional[str]): model to fall back to if the first one fails (not used with Azure)
+            key_messages (Optional[list[BaseMessage]]): the parts of the messages the verdict depends on, hashed for
+                the cache instead of langchain_messages (e.g., without the turn numbers, so that a repeated attack hits the cache)
+        """
+        key = self.verdict_key(
+            langchain_messages if key_messages is None else key_messages, model_name
+        )
+        verdict = self._lookup(key)
+        if verdict is not None:
+            return verdict
+
+        if os.getenv("OPENAI_API_TYPE") == "azure" or backup_model is None:
+            verdict = self.get_client(model_name)(langchain_messages)
+        else:
+            try:
+                verdict = self.get_client(model_name)(langchain_messages)
+            except Exception:
+                print(f"{model_name} not found, using {backup_model}")
+                verdict = self.get_client(backup_model)(langchain_messages)
+
+        self._store(key, verdict)
+        return verdict
+
+    def clear(self):
+        """Drop all memoized verdicts (pooled clients are kept)."""
+        with self._lock:
+            self._verdicts.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+_default_judge_service: JudgeService | None = None
+_default_judge_service_lock = threading.Lock()
+
+
+def get_judge_service() -> JudgeService:
+    """Return the judge service shared by all Umshini environments in this process."""
+    global _default_judge_service
+    with _default_judge_service_lock:
+        if _default_judge_service is None:
+            _default_judge_service = JudgeService()
+        return _default_judge_service
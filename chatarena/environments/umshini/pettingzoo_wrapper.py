@@ -4,6 +4,7 @@ from __future__ import annotations
 
 import functools
 import string
+from typing import Any, Callable
 
 from colorama import Fore
 from gymnasium import spaces
@@ -29,6 +30,86 @@ from chatarena.message import Message
 CHAR_SET = string.printable
 
 
+class _LazyInfo(dict):
+    """Info dict whose entries can be built on first access.
+
+    The chat history of an agent grows with every step, so it is only copied into the infos it is requested from.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._builders: dict[str, Callable[[], Any]] = {}
+
+    def set_lazy(self, key: str, builder: Callable[[], Any]):
+        super().pop(key, None)
+        self._builders[key] = builder
+
+    def _build_all(self):
+        for key in list(self._builders):
+            self[key]
+
+    def __missing__(self, key):
+        if key not in self._builders:
+            raise KeyError(key)
+        value = self._builders.pop(key)()
+        super().__setitem__(key, value)
+        return value
+
+    def __setitem__(self, key, value):
+        self._builders.pop(key, None)
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        if self._builders.pop(key, None) is None:
+            super().__delitem__(key)
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def pop(self, key, *default):
+        if key in self._builders:
+            self[key]
+        return super().pop(key, *default)
+
+    def __contains__(self, key):
+        return super().__contains__(key) or key in self._builders
+
+    def __iter__(self):
+        # Iterating over the keys does not build the lazy entries
+        return iter(list(super().keys()) + list(self._builders))
+
+    def __len__(self):
+        return super().__len__() + len(self._builders)
+
+    def __eq__(self, other):
+        self._build_all()
+        return super().__eq__(other)
+
+    def __repr__(self):
+        self._build_all()
+        return super().__repr__()
+
+    def keys(self):
+        self._build_all()
+        return super().keys()
+
+    def values(self):
+        self._build_all()
+        return super().values()
+
+    def items(self):
+        self._build_all()
+        return super().items()
+
+    def copy(self):
+        self._build_all()
+        return dict(super().items())
+
+    def __reduce__(self):
+        # Pickled (e.g., to be sent by a vector env) as a plain dict, with all the entries built
+        return dict, (self.copy(),)
+
+
 class PettingZooCompatibilityV0(AECEnv, EzPickle):
     """This compatibility wrapper converts a ChatArena environment into a PettingZoo environment.
 
@@ -56,6 +137,7 @@ class PettingZooCompatibilityV0(AECEnv, EzPickle):
         render_mode: str | None = None,
         save_json: bool | None = False,
         disable_judging: bool | None = False,
+        judging_mode: str | None = "sync",
     ):
         """Wrapper to convert a ChatArena environment into a PettingZoo environment.
 
@@ -71,6 +153,8 @@ class PettingZooCompatibilityV0(AECEnv, EzPickle):
             character_limit (Optional[int]): maximum number of characters for observations and actions
             render_mode (Optional[str]): rendering mode
             save_json (Optional[bool]): flag to save a json file to the disk containing a chat log
+            disable_judging (Optional[bool]): flag to skip the judge and assign random verdicts (for local testing)
+            judging_mode (Optional[str]): "sync", "background" or "episode_end" (symmetric envs only), deferred judgments are rewarded on the final step
         """
         EzPickle.__init__(
             self,
@@ -85,6 +169,8 @@ class PettingZooCompatibilityV0(AECEnv, EzPickle):
             character_limit,
             render_mode,
             save_json,
+            disable_judging,
+            judging_mode,
         )
         super().__init__()
 
@@ -150,6 +236,7 @@ class PettingZooCompatibilityV0(AECEnv, EzPickle):
                     round_length=round_length,
                     character_limit=character_limit,
                     disable_judging=disable_judging,
+                    judging_mode=judging_mode,
                 )
                 self.moderation_policy = moderation_policy
                 self.max_turns = round_length * 2
@@ -176,6 +263,7 @@ class PettingZooCompatibilityV0(AECEnv, EzPickle):
                     round_length=round_length,
                     character_limit=character_limit,
                     disable_judging=disable_judging,
+                    judging_mode=judging_mode,
                 )
                 self.restricted_action = restricted_action
                 self.max_turns = round_length * 2
@@ -217,6 +305,7 @@ class PettingZooCompatibilityV0(AECEnv, EzPickle):
         # Custom attributes for housekeeping
         self.total_rewards = {agent: 0.0 for agent in self.possible_agents}
         self.current_turn = 0
+        self._reset_views()
 
     @functools.lru_cache(maxsize=None)
     def observation_space(self, agent: AgentID):
@@ -318,33 +407,16 @@ class PettingZooCompatibilityV0(AECEnv, EzPickle):
         elif not isinstance(agent, str):
             raise TypeError("AgentID must be a string")
         else:
-            # get only the messages that this agent can see
-            messages = self._env.get_observation(agent)
-
-            # calculate current turn
-            if len(messages) > 0:
-                self.current_turn = messages[-1].turn
-            else:
-                self.current_turn = 0
-
-            # filter to only new messages for this agent (observation is limited to only the current message)
-            new_messages = [m for m in messages if m.turn == self.current_turn]
-
-            # string observation (optional flag)
-            if self.string_observation:
-                observation = ""
-                for m in new_messages:
-                    observation += f"{m.agent_name}: {m.content}"
-            # dict observation
-            else:
-                observation = {m.agent_name: m.content for m in new_messages}
+            # get only the messages that this agent can see, and the new ones (observation is limited to only the current message)
+            new_messages = self._update_view(agent)
+            observation = self._format_observation(new_messages)
 
             # We return info in the form of ChatArena messages objects, as well as strings, and a dictionary, to allow for maximum flexibility.
             # Dict prevents you from having to parse the message to determine the agent, which may lead to errors if LLMs repeat the agent name (common from my testing)
             # I'd argue we might want to use it as the default return type for that reason alone
             self.infos[agent]["turn"] = self.current_turn
             self.infos[agent]["new_messages"] = new_messages
-            self.infos[agent]["all_messages"] = messages
+            self._set_history_info(self.infos[agent], agent)
             self.infos[agent]["obs_dict"] = {
                 m.agent_name: m.content for m in new_messages
             }
@@ -378,13 +450,6 @@ class PettingZooCompatibilityV0(AECEnv, EzPickle):
                         self.infos[self.possible_agents[0]]["role"] = "attacker"
                         self.infos[self.possible_agents[1]]["role"] = "defender"
 
-            # info: generate string of full chat log
-            if self.string_observation:
-                all_messages_string = ""
-                for m in messages:
-                    all_messages_string += f"[{m.agent_name}->all]: {m.content}\n"
-                self.infos[agent]["all_messages_string"] = all_messages_string
-
             # info: environment specific information
             if hasattr(self, "restricted_action"):
                 self.infos[agent]["restricted_action"] = self.restricted_action
@@ -406,46 +471,94 @@ class PettingZooCompatibilityV0(AECEnv, EzPickle):
             import os
             from pathlib import Path
 
-            Path("env_logs").mkdir(exist_ok=True)
-            os.chdir("env_logs")
-            files = os.listdir()
+            # Don't change the working directory of the caller
+            log_dir = Path("env_logs")
+            log_dir.mkdir(exist_ok=True)
             files = [
                 f
-                for f in files
+                for f in os.listdir(log_dir)
                 if f.startswith(self.metadata["name"]) and f.endswith(".json")
             ]
-            json.dump(
-                formatted_state,
-                open(self.metadata["name"] + str(len(files)) + ".json", "w"),
-            )
-            print(
-                f"Chatlog has been saved to disk: {self.metadata['name'] + str(len(files)) + '.json'}"
-            )
+            file_name = self.metadata["name"] + str(len(files)) + ".json"
+            with open(log_dir / file_name, "w") as f:
+                json.dump(formatted_state, f)
+            print(f"Chatlog has been saved to disk: {file_name}")
         else:
             return formatted_state
 
-    def _unravel_timestep(self, timestep: TimeStep):
-        # get observation
-        messages = timestep.observation
+    def _reset_views(self):
+        # Per-agent cursor into the message pool, with the visible messages and chat log lines built so far
+        self._views = {
+            agent: {
+                "pool": None,
+                "cursor": 0,
+                "messages": [],
+                "lines": [],
+            }
+            for agent in self.possible_agents
+        }
 
-        # calculate current turn
-        if len(messages) > 0:
-            self.current_turn = messages[-1].turn
-        else:
-            self.current_turn = 0
+    def _update_view(self, agent: AgentID) -> list[Message]:
+        """Bring an agent's view up to date, only scanning the messages added since the last update.
 
-        # filter to only new messages (observation is limited to only the current message)
-        new_messages = [m for m in messages if m.turn == self.current_turn]
+        The view holds the messages visible to the agent (the same as ``self._env.get_observation(agent)``).
+        Returns the ones from the current turn.
+        """
+        view = self._views[agent]
+        pool = self._env.message_pool._messages
+        if view["pool"] is not pool:  # the message pool has been reset
+            self._reset_views()
+            for other_view in self._views.values():
+                other_view["pool"] = pool
+            view = self._views[agent]
+
+        # Initial moderator message counts as a turn for ChatArena message pool, so our turn 0 is its turn 1
+        max_turn = self._env._current_turn
+        cursor = view["cursor"]
+        added = []
+        while cursor < len(pool) and pool[cursor].turn <= max_turn:
+            m = pool[cursor]
+            if m.visible_to == "all" or agent in m.visible_to:
+                added.append(m)
+            cursor += 1
+        view["cursor"] = cursor
+
+        # The view only grows, infos take snapshots of it with _set_history_info
+        messages = view["messages"]
+        messages.extend(added)
+        if self.string_observation:
+            view["lines"].extend(f"[{m.agent_name}->all]: {m.content}\n" for m in added)
 
-        # string observation (optional flag)
+        # calculate current turn
+        self.current_turn = messages[-1].turn if len(messages) > 0 else 0
+
+        # messages from the current turn are at the end of the list
+        start = len(messages)
+        while start > 0 and messages[start - 1].turn == self.current_turn:
+            start -= 1
+        return messages[start:]
+
+    def _set_history_info(self, info: _LazyInfo, agent: AgentID):
+        """Add the full chat history of an agent to its info, copied from the view only if it is requested."""
+        view = self._views[agent]
+        messages, lines, n = view["messages"], view["lines"], len(view["messages"])
+        info.set_lazy("all_messages", lambda: messages[:n])
+        # info: string of full chat log
         if self.string_observation:
-            observation = ""
-            for m in new_messages:
-                observation += f"{m.agent_name}: {m.content}"
+            info.set_lazy("all_messages_string", lambda: "".join(lines[:n]))
 
+    def _format_observation(self, new_messages: list[Message]) -> ObsType:
+        # string observation (optional flag)
+        if self.string_observation:
+            return "".join(f"{m.agent_name}: {m.content}" for m in new_messages)
         # dict observation
         else:
-            observation = {m.agent_name: m.content for m in new_messages}
+            return {m.agent_name: m.content for m in new_messages}
+
+    def _unravel_timestep(self, timestep: TimeStep):
+        # get observation (the same messages as timestep.observation, built incrementally)
+        new_messages = self._update_view(self.agent_selection)
+        observation = self._format_observation(new_messages)
 
         # get rewards
         rewards = timestep.reward
@@ -458,21 +571,14 @@ class PettingZooCompatibilityV0(AECEnv, EzPickle):
             self.current_turn >= self.max_turns
         )  # pyright: ignore[reportGeneralTypeIssues]
 
-        info = {}
+        info = _LazyInfo()
 
         info["turn"] = self.current_turn
         info["new_messages"] = new_messages
-        info["all_messages"] = messages
+        self._set_history_info(info, self.agent_selection)
         info["obs_dict"] = {m.agent_name: m.content for m in new_messages}
         info["player_name"] = self.agent_selection
 
-        # info: generate string of full chat log
-        if self.string_observation:
-            all_messages_string = ""
-            for m in messages:
-                all_messages_string += f"[{m.agent_name}->all]: {m.content}\n"
-            info["all_messages_string"] = all_messages_string
-
         # Role in debate environment
         if self.env_name == "debate":
             self.infos[self.possible_agents[0]]["role"] = self._env.roles[
@@ -521,6 +627,7 @@ class PettingZooCompatibilityV0(AECEnv, EzPickle):
         # reset our custom attributes
         self.current_turn = 0
         self.total_rewards = {agent: 0.0 for agent in self.possible_agents}
+        self._reset_views()
 
         # reset the ChatArena environment
         self.initial_timestep = self._env.reset()
@@ -533,7 +640,7 @@ class PettingZooCompatibilityV0(AECEnv, EzPickle):
         self.terminations = {agent: False for agent in self.agents}
         self.truncations = {agent: False for agent in self.agents}
         # info keys: turn, new_messages, all_messages, obs_dict, player_name, all_messages_string, restricted_action, moderation_policy, topic
-        self.infos = {agent: {} for agent in self.possible_agents}
+        self.infos = {agent: _LazyInfo() for agent in self.possible_agents}
 
         # get the first player
         self._agent_selector = self._env.agent_selector
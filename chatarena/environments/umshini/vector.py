@@ -0,0 +1,231 @@
+"""Vectorized runner for Umshini PettingZoo environments."""
+# pyright: reportGeneralTypeIssues=false
+from __future__ import annotations
+
+import multiprocessing as mp
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from gymnasium.vector.utils import CloudpickleWrapper
+
+from chatarena.environments.umshini.pettingzoo_wrapper import PettingZooCompatibilityV0
+
+VECTOR_MODES = ("thread", "process")
+
+
+def _last(env: PettingZooCompatibilityV0) -> tuple:
+    observation, reward, termination, truncation, info = env.last()
+    return env.agent_selection, observation, reward, termination, truncation, info
+
+
+def _reset(env: PettingZooCompatibilityV0, seed: int | None = None) -> tuple:
+    env.reset(seed=seed)
+    return _last(env)
+
+
+def _step(
+    env: PettingZooCompatibilityV0, action: str | None, auto_reset: bool
+) -> tuple:
+    env.step(action)
+    agent, observation, reward, termination, truncation, info = _last(env)
+    if auto_reset and (termination or truncation):
+        # Keep the end of the finished game in the info of the new one (Gymnasium vector env convention)
+        final = {
+            "final_observation": observation,
+            "final_info": info,
+            "final_agent": agent,
+            "episode_rewards": dict(env.total_rewards),
+        }
+        agent, observation, reward, _, _, info = _reset(env)
+        info = {**info, **final}
+    return agent, observation, reward, termination, truncation, info
+
+
+def _worker(remote, parent_remote, env_fn: CloudpickleWrapper, auto_reset: bool):
+    parent_remote.close()
+    env = None
+    try:
+        env = env_fn()
+        while True:
+            command, data = remote.recv()
+            if command == "reset":
+                remote.send((_reset(env, seed=data), True))
+            elif command == "step":
+                remote.send((_step(env, data, auto_reset), True))
+            elif command == "last":
+                remote.send((_last(env), True))
+            elif command == "close":
+                remote.send((env.close(), True))
+                break
+            else:
+                raise RuntimeError(f"Unknown command: {command}")
+    except (KeyboardInterrupt, EOFError):
+        pass
+    except Exception:
+        remote.send((traceback.format_exc(), False))
+    finally:
+        remote.close()
+
+
+class UmshiniVectorEnv:
+    """Run several Umshini PettingZoo environments behind a batched API.
+
+    Each call steps the current agent of every environment, so trainers can collect experience from many games at once.
+    Environments are reset automatically when their game ends, and the end of the finished game is reported in the info
+    of the new one (``final_observation``, ``final_info``, ``final_agent`` and ``episode_rewards``).
+
+    In "thread" mode the environments run in a thread pool of this process and share the pooled judge clients
+    and verdict cache (see ``get_judge_service``). Judging is network bound, so this is usually the fastest mode.
+    In "process" mode each environment runs in its own worker subprocess, with its own judge clients.
+    """
+
+    def __init__(
+        self,
+        env_fns: list[Callable[[], PettingZooCompatibilityV0]],
+        mode: str = "thread",
+        auto_reset: bool = True,
+        context: str | None = None,
+    ):
+        """Vectorized Umshini environment.
+
+        Args:
+            env_fns (list[Callable]): functions creating the wrapped environments
+            mode (str): "thread" or "process"
+            auto_reset (bool): reset each environment when its game is over
+            context (Optional[str]): multiprocessing start method for "process" mode (e.g., "spawn")
+        """
+        assert mode in VECTOR_MODES, f"mode must be one of {VECTOR_MODES}"
+        assert len(env_fns) > 0, "at least one environment is required"
+        self.num_envs = len(env_fns)
+        self.mode = mode
+        self.auto_reset = auto_reset
+        self.closed = False
+
+        if mode == "thread":
+            self.envs = [env_fn() for env_fn in env_fns]
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.num_envs, thread_name_prefix="umshini-vector"
+            )
+        else:
+            ctx = mp.get_context(context)
+            self.envs = None
+            self._remotes, self._processes = [], []
+            for env_fn in env_fns:
+                remote, work_remote = ctx.Pipe()
+                process = ctx.Process(
+                    target=_worker,
+                    args=(work_remote, remote, CloudpickleWrapper(env_fn), auto_reset),
+                    daemon=True,
+                )
+                process.start()
+                work_remote.close()
+                self._remotes.append(remote)
+                self._processes.append(process)
+
+    def _run(self, command: str, data: list) -> list:
+        if self.closed:
+            raise RuntimeError("Trying to use a closed vector environment")
+        if self.mode == "thread":
+
+            def fn(env, item):
+                if command == "reset":
+                    return _reset(env, seed=item)
+                elif command == "step":
+                    return _step(env, item, self.auto_reset)
+                return _last(env)
+
+            return list(self._executor.map(fn, self.envs, data))
+
+        for remote, item in zip(self._remotes, data):
+            remote.send((command, item))
+        results, errors = [], []
+        for i, remote in enumerate(self._remotes):
+            result, success = remote.recv()
+            results.append(result)
+            if not success:
+                errors.append(f"Environment {i}:\n{result}")
+        if errors:
+            raise RuntimeError("\n".join(errors))
+        return results
+
+    @staticmethod
+    def _batch(results: list) -> tuple[list, ...]:
+        # agents, observations, rewards, terminations, truncations, infos
+        return tuple(list(column) for column in zip(*results))
+
+    def reset(self, seed: int | list[int | None] | None = None) -> tuple[list, list]:
+        """Reset all environments.
+
+        Args:
+            seed (Optional[Union[int, list]]): seed for the first environment (incremented for the others) or a list of seeds
+
+        Returns:
+            observations and infos of the first agent of each environment
+        """
+        if seed is None or isinstance(seed, int):
+            seeds = [None if seed is None else seed + i for i in range(self.num_envs)]
+        else:
+            assert len(seed) == self.num_envs, "one seed per environment is required"
+            seeds = list(seed)
+        _, observations, _, _, _, infos = self._batch(self._run("reset", seeds))
+        return observations, infos
+
+    def last(self) -> tuple[list, ...]:
+        """Return the agent to act and its observation, reward, termination, truncation and info for each environment."""
+        return self._batch(self._run("last", [None] * self.num_envs))
+
+    def step(self, actions: list[Any]) -> tuple[list, ...]:
+        """Step the current agent of each environment.
+
+        Args:
+            actions (list): one action per environment (None for agents which are terminated or truncated)
+
+        Returns:
+            the next agent to act and its observation, reward, termination, truncation and info for each environment
+        """
+        assert len(actions) == self.num_envs, "one action per environment is required"
+        return self._batch(self._run("step", list(actions)))
+
+    def close(self):
+        """Close the environments and stop the workers."""
+        if self.closed:
+            return
+        if self.mode == "thread":
+            for env in self.envs:
+                env.close()
+            self._executor.shutdown()
+        else:
+            for remote in self._remotes:
+                try:
+                    remote.send(("close", None))
+                    remote.recv()
+                except (BrokenPipeError, EOFError):
+                    pass
+            for process in self._processes:
+                process.join()
+        self.closed = True
+
+    def __del__(self):
+        if not getattr(self, "closed", True):
+            self.close()
+
+
+def make_vector_env(
+    num_envs: int,
+    mode: str = "thread",
+    auto_reset: bool = True,
+    context: str | None = None,
+    **kwargs,
+) -> UmshiniVectorEnv:
+    """Create a vectorized environment of identical Umshini games.
+
+    Args:
+        num_envs (int): number of environments
+        mode (str): "thread" or "process"
+        auto_reset (bool): reset each environment when its game is over
+        context (Optional[str]): multiprocessing start method for "process" mode
+        kwargs: arguments for PettingZooCompatibilityV0 (e.g., env_name, topic, round_length)
+    """
+    env_fns = [lambda: PettingZooCompatibilityV0(**kwargs) for _ in range(num_envs)]
+    return UmshiniVectorEnv(env_fns, mode=mode, auto_reset=auto_reset, context=context)
@@ -0,0 +1,217 @@
+"""
+Memory components for players.
+
+Long games re-send the whole visible history to the backend on every turn.
+A memory component sits between the observation and the backend and can
+shrink the history, e.g. by folding old messages into a running summary.
+"""
+import logging
+from collections import OrderedDict
+from typing import List, Optional, Union
+
+from tenacity import RetryError
+
+from .backends import IntelligenceBackend, load_backend
+from .config import BackendConfig, Configurable
+from .message import SYSTEM_NAME, Message, _hash
+
+DEFAULT_SUMMARY_PROMPT = (
+    "You maintain a concise running summary of a conversation. "
+    "Keep every fact, decision and commitment that may matter later, "
+    "and drop greetings and repetition."
+)
+SUMMARY_REQUEST = (
+    "Update the summary so that it also covers the new messages above. "
+    "Reply with the updated summary only."
+)
+SUMMARY_PREFIX = "Summary of the earlier conversation:"
+
+
+class RollingSummaryMemory(Configurable):
+    """
+    Fold messages older than a window into a running summary.
+
+    The most recent `window` messages are always passed through verbatim.
+    Older messages are summarized by a backend, and the summary is refreshed
+    incrementally once every `update_every` new messages leave the window,
+    so each update only sends the previous summary plus the newly folded messages.
+    Summaries are cached by the hash of the summarized prefix and are never recomputed for the same prefix
+    (the `cache_size` most recently used summaries are kept). A summary that failed is not cached, and the messages
+    it should have covered are kept verbatim until a later call summarizes them.
+    """
+
+    def __init__(
+        self,
+        window: int = 20,
+        update_every: int = 5,
+        backend: Union[BackendConfig, IntelligenceBackend] = None,
+        summary_prompt: str = DEFAULT_SUMMARY_PROMPT,
+        cache_size: int = 16,
+        **kwargs,
+    ):
+        """
+        Initialize the memory.
+
+        Parameters:
+            window (int): The number of most recent messages that are kept verbatim.
+            update_every (int): The summary is refreshed once this many messages have left the window.
+            backend (Union[BackendConfig, IntelligenceBackend]): The backend used to write the summary. Defaults to the backend of the player.
+            summary_prompt (str): The role description given to the summarizer.
+            cache_size (int): The maximum number of cached summaries.
+        """
+        assert window >= 0, "window must be non-negative"
+        assert update_every > 0, "update_every must be positive"
+        assert cache_size > 0, "cache_size must be positive"
+
+        if isinstance(backend, BackendConfig):
+            backend_config = backend
+            backend = load_backend(backend_config)
+        elif isinstance(backend, IntelligenceBackend):
+            backend_config = backend.to_config()
+        elif backend is None:
+            backend_config = None
+        else:
+            raise ValueError(
+                f"backend must be a BackendConfig or an IntelligenceBackend, but got {type(backend)}"
+            )
+
+        super().__init__(
+            window=window,
+            update_every=update_every,
+            backend=backend_config,
+            summary_prompt=summary_prompt,
+            cache_size=cache_size,
+            **kwargs,
+        )
+        self.window = window
+        self.update_every = update_every
+        self.backend = backend
+        self.summary_prompt = summary_prompt
+        self.cache_size = cache_size
+
+        self._summary_cache: "OrderedDict[str, str]" = OrderedDict()
+        self._prefix_hashes: List[str] = []  # chained hashes of the last seen prefix
+        self._last_hashes: List[str] = []  # msg_hash of the messages in that prefix
+
+    def reset(self):
+        """Forget the running summary, e.g. at the end of an episode."""
+        self._summary_cache = OrderedDict()
+        self._prefix_hashes = []
+        self._last_hashes = []
+
+    def _chain_hashes(self, messages: List[Message]) -> List[str]:
+        """
+        Return the chained prefix hashes of the messages, reusing the ones computed on previous calls.
+
+        The i-th hash identifies the prefix `messages[: i + 1]`.
+        """
+        # The message pool is append-only, so checking the boundary message is enough
+        shared = min(len(self._last_hashes), len(messages))
+        if shared and self._last_hashes[shared - 1] != messages[shared - 1].msg_hash:
+            # The history has diverged (e.g. a new episode), start over
+            shared = 0
+
+        prefix_hashes = self._prefix_hashes[:shared]
+        last_hashes = self._last_hashes[:shared]
+        for message in messages[shared:]:
+            msg_hash = message.msg_hash
+            previous = prefix_hashes[-1] if prefix_hashes else ""
+            prefix_hashes.append(_hash(previous + msg_hash))
+            last_hashes.append(msg_hash)
+
+        self._prefix_hashes = prefix_hashes
+        self._last_hashes = last_hashes
+        return prefix_hashes
+
+    def _summarize(
+        self,
+        backend: IntelligenceBackend,
+        agent_name: str,
+        previous_summary: str,
+        new_messages: List[Message],
+    ) -> Optional[str]:
+        """Extend the previous summary with the new messages, or return None if the backend failed."""
+        history = []
+        if previous_summary:
+            history.append(
+                Message(
+                    agent_name=SYSTEM_NAME,
+                    content=f"{SUMMARY_PREFIX}\n{previous_summary}",
+                    turn=new_messages[0].turn,
+                )
+            )
+        history.extend(new_messages)
+        request_msg = Message(agent_name=SYSTEM_NAME, content=SUMMARY_REQUEST, turn=-1)
+        try:
+            return backend.query(
+                agent_name=f"{agent_name} (summarizer)",
+                role_desc=self.summary_prompt,
+                history_messages=history,
+                request_msg=request_msg,
+            )
+        except RetryError as e:
+            logging.warning(
+                f"Failed to summarize the history of {agent_name}. "
+                f"Error: {e.last_attempt.exception()}. Keeping the messages until the next update."
+            )
+            return None
+
+    def compress(
+        self,
+        observation: List[Message],
+        agent_name: str,
+        backend: IntelligenceBackend = None,
+    ) -> List[Message]:
+        """
+        Replace the messages older than the window with a single summary message.
+
+        Parameters:
+            observation (List[Message]): The messages that the player has observed.
+            agent_name (str): The name of the player that owns this memory.
+            backend (IntelligenceBackend): Fallback backend used when the memory does not have its own.
+
+        Returns:
+            List[Message]: The summary message (if any) followed by the most recent messages.
+        """
+        num_folded = len(observation) - self.window
+        # Only move the summary boundary every `update_every` messages
+        num_folded = (num_folded // self.update_every) * self.update_every
+        if num_folded <= 0:
+            return observation
+
+        backend = self.backend or backend
+        assert backend is not None, "RollingSummaryMemory requires a backend"
+
+        prefix_hashes = self._chain_hashes(observation[:num_folded])
+        prefix_key = prefix_hashes[-1]
+
+        summary = self._summary_cache.get(prefix_key)
+        if summary is not None:
+            self._summary_cache.move_to_end(prefix_key)
+        else:
+            # Start from the longest prefix that has already been summarized
+            start, previous_summary = 0, ""
+            for end in range(num_folded - self.update_every, 0, -self.update_every):
+                if prefix_hashes[end - 1] in self._summary_cache:
+                    start = end
+                    previous_summary = self._summary_cache[prefix_hashes[end - 1]]
+                    break
+            summary = self._summarize(
+                backend, agent_name, previous_summary, observation[start:num_folded]
+            )
+            if summary is None:
+                # The messages after the previous summary are kept verbatim, and summarized on a later call
+                if not previous_summary:
+                    return observation
+                summary, num_folded = previous_summary, start
+            else:
+                self._summary_cache[prefix_key] = summary
+                if len(self._summary_cache) > self.cache_size:
+                    self._summary_cache.popitem(last=False)
+
+        summary_message = Message(
+            agent_name=SYSTEM_NAME,
+            content=f"{SUMMARY_PREFIX}\n{summary}",
+            turn=observation[num_folded - 1].turn,
+        )
+        return [summary_message] + observation[num_folded:]
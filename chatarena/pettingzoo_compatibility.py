@@ -154,7 +154,7 @@ class PettingZooCompatibilityV0(pettingzoo.AECEnv):
 
     def close(self):
         """Close."""
-        pass
+        self._env.environment.close()
 
     def _unravel_timestep(self, timestep: chatarena.arena.TimeStep):
         # get observation
@@ -273,3 +273,174 @@ class PettingZooCompatibilityV0(pettingzoo.AECEnv):
 
         if self.render_mode == "human":
             self.render()
+
+
+class PettingZooParallelCompatibilityV0(pettingzoo.ParallelEnv):
+    """This compatibility wrapper converts a ChatArena environment into a PettingZoo parallel environment.
+
+    All the actions of a turn are collected in one step() call and applied in a single environment transition
+    (see `Environment.step_simultaneous`), so the policies of all agents can be queried in one batch.
+    Actions of agents which are not due to act in a turn-based environment are ignored.
+    """
+
+    metadata = {
+        "render_modes": ["human"],
+        "name": "PettingZooParallelCompatibilityV0",
+    }
+
+    def __init__(
+        self,
+        env: chatarena.arena.Arena | None = None,
+        arena_name: str | None = None,
+        string_observation: bool | None = True,
+        max_turns: int | None = 25,
+        render_mode: str | None = None,
+    ):
+        """Wrapper to convert a ChatArena environment into a PettingZoo parallel environment.
+
+        Args:
+            env (chatarena.arena.Arena): chatarena arena to wrap
+            arena_name (Optional[str]): chatarena environment to load from file (e.g., "examples/rock-paper-scissors.json")
+            string_observation (Optional[bool]): send observations as a single string (rather than a dict)
+            max_turns (Optional[int]): maximum number of turns before environment truncates
+            render_mode (Optional[str]): rendering mode
+        """
+        super().__init__()
+
+        if env is not None:
+            self._env = env
+        elif arena_name is not None:
+            self._env = Arena.from_config(arena_name)
+        else:
+            raise ValueError(
+                "Arena not specified, please us env or arena_name arguments."
+            )
+
+        self._env.reset()  # this resets the underlying arena as well as each player
+
+        self.possible_agents = list(self._env.name_to_player.keys())
+        self.agents = []
+        self.name_to_player_mapping = self._env.name_to_player
+
+        self.string_observation = string_observation
+        self.max_turns = max_turns
+        self.render_mode = render_mode
+        self.current_turn = 0
+
+    @functools.lru_cache(maxsize=None)
+    def observation_space(self, agent: AgentID):
+        """Observation_space.
+
+        Args:
+            agent (AgentID): agent
+        """
+        return spaces.Dict(
+            {
+                agent: spaces.Text(max_length=256, min_length=0, charset=CHAR_SET)
+                for agent in self.possible_agents
+            }
+        )
+
+    @functools.lru_cache(maxsize=None)
+    def action_space(self, agent: AgentID):
+        """Action_space.
+
+        Args:
+            agent (AgentID): agent
+        """
+        return spaces.Text(max_length=256, min_length=0, charset=CHAR_SET)
+
+    def render(self):
+        """Render.
+
+        Print the current game state.
+        """
+        self._env.environment.print()
+
+    def close(self):
+        """Close."""
+        self._env.environment.close()
+
+    def _observe(self, agent: AgentID) -> tuple[ObsType, dict]:
+        # this will only return the messages this agent can see
+        messages = self._env.environment.get_observation(agent)
+        turn = messages[-1].turn if len(messages) > 0 else 0
+        new_messages = [
+            m for m in messages if m.turn == turn
+        ]  # we only send the latest turn messages
+
+        obs_dict = {m.agent_name: m.content for m in new_messages}
+        if self.string_observation:
+            observation = "".join(f"{m.agent_name}: {m.content}" for m in new_messages)
+        else:
+            observation = obs_dict
+
+        player_obj = self.name_to_player_mapping[agent]
+        info = {
+            "turn": turn,
+            "obs_dict": obs_dict,
+            "global_prompt": player_obj.global_prompt,
+            "agent_desc": player_obj.role_desc,
+        }
+        return observation, info
+
+    def _observe_all(self) -> tuple[dict, dict]:
+        observations, infos = {}, {}
+        for agent in self.agents:
+            observations[agent], infos[agent] = self._observe(agent)
+        return observations, infos
+
+    def reset(
+        self,
+        seed: int | None = None,
+        options: dict | None = None,
+    ):
+        """Reset.
+
+        Args:
+            seed (Optional[int]): seed
+            options (Optional[Dict]): options
+
+        Returns:
+            observations and infos of all agents
+        """
+        if seed is not None:
+            print("WARNING: seeding is not supported for LLMs.")
+
+        # reset the chat arena environment
+        self._env.reset()
+        self.agents = self.possible_agents[:]
+        self.current_turn = 0
+        return self._observe_all()
+
+    def step(self, actions: dict[AgentID, str]):
+        """Steps.
+
+        Applies the actions of all agents in one environment transition.
+
+        Args:
+            actions (dict): actions keyed by agent
+
+        Returns:
+            observations, rewards, terminations, truncations and infos of all agents
+        """
+        timestep = self._env.environment.step_simultaneous(
+            {agent: action for agent, action in actions.items() if agent in self.agents}
+        )
+        self.current_turn += 1
+
+        observations, infos = self._observe_all()
+        rewards = {agent: timestep.reward.get(agent, 0.0) for agent in self.agents}
+        terminations = {agent: bool(timestep.terminal) for agent in self.agents}
+        truncations = {
+            agent: self.current_turn >= self.max_turns for agent in self.agents
+        }
+
+        # The game is over for all agents at once
+        if timestep.terminal or self.current_turn >= self.max_turns:
+            self.agents = []
+
+        if self.render_mode == "human":
+            self.render()
+
+        return observations, rewards, terminations, truncations, infos
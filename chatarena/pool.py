@@ -0,0 +1,108 @@
+"""
+Pool of reusable arenas.
+
+Building an arena from its config creates the players, loads their backends (which can mean loading a model,
+or creating an API client) and creates the environment. When many games are played with the same config,
+`ArenaPool` hands out idle arenas built earlier, reset with `Arena.reset`, instead of building new ones.
+"""
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Union
+
+from .arena import Arena
+from .config import ArenaConfig
+
+
+class ArenaPool:
+    """
+    Arenas keyed by the fingerprint of their config.
+
+    An arena is used by one game at a time: `acquire` takes it out of the pool and `release` puts it back.
+    The pool is thread-safe, so concurrent games each get their own arena.
+    The arenas dropped by the pool are closed, which releases the threads of their environment and backends.
+    """
+
+    def __init__(self, max_idle_per_config: int = 8):
+        """
+        Initialize the pool.
+
+        Parameters:
+            max_idle_per_config (int): The maximum number of idle arenas kept for each config, the others are dropped.
+        """
+        self.max_idle_per_config = max_idle_per_config
+        self._idle: Dict[str, List[Arena]] = {}
+        # Config fingerprint of the arenas in use, by id
+        self._keys: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self.num_created = 0
+        self.num_reused = 0
+
+    def acquire(self, config: Union[str, ArenaConfig]) -> Arena:
+        """Take an arena for the config out of the pool, or build a new one if none is idle."""
+        if isinstance(config, str):
+            config = ArenaConfig.load(config)
+        key = config.fingerprint()
+        with self._lock:
+            idle = self._idle.get(key)
+            arena = idle.pop() if idle else None
+            if arena is None:
+                self.num_created += 1
+            else:
+                self.num_reused += 1
+
+        if arena is None:
+            # from_config adds fields to the config, so the pool key is computed on the original
+            arena = Arena.from_config(config.deepcopy())
+        else:
+            arena.reset()
+        with self._lock:
+            self._keys[id(arena)] = key
+        return arena
+
+    def release(self, arena: Arena):
+        """Put an arena taken with `acquire` back into the pool, or close it if enough arenas are idle."""
+        with self._lock:
+            key = self._keys.pop(id(arena), None)
+            if key is None:
+                raise ValueError("The arena does not belong to the pool")
+            idle = self._idle.setdefault(key, [])
+            kept = len(idle) < self.max_idle_per_config
+            if kept:
+                idle.append(arena)
+        if not kept:
+            arena.close()
+
+    def discard(self, arena: Arena):
+        """Forget and close an arena taken with `acquire`, e.g., after an error left it in an unknown state."""
+        with self._lock:
+            key = self._keys.pop(id(arena), None)
+        if key is not None:
+            arena.close()
+
+    @contextmanager
+    def arena(self, config: Union[str, ArenaConfig]):
+        """
+        Use an arena of the pool for a game.
+
+        The arena is released when the block exits, or discarded if the block raises an exception.
+        """
+        arena = self.acquire(config)
+        try:
+            yield arena
+        except BaseException:
+            self.discard(arena)
+            raise
+        self.release(arena)
+
+    @property
+    def num_idle(self) -> int:
+        with self._lock:
+            return sum(len(idle) for idle in self._idle.values())
+
+    def clear(self):
+        """Drop and close all the idle arenas."""
+        with self._lock:
+            arenas = [arena for idle in self._idle.values() for arena in idle]
+            self._idle.clear()
+        for arena in arenas:
+            arena.close()
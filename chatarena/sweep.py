@@ -0,0 +1,104 @@
+"""
+Run the variants of a config sweep.
+
+The variants of `ArenaConfig.iter_variants` are played concurrently in a bounded thread pool.
+Only a bounded number of games is in flight at once, so large sweeps are streamed through:
+variants are expanded as the games finish, and the results are aggregated per variant on the fly.
+"""
+import json
+import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from .config import ArenaConfig
+from .pool import ArenaPool
+from .tournament import play_game
+
+
+class VariantStats:
+    """Running aggregates of the games of a variant."""
+
+    def __init__(self, variant: Dict[str, Any]):
+        self.variant = variant
+        self.num_games = 0
+        self.num_failed = 0
+        self.total_steps = 0
+        self.total_rewards: Dict[str, float] = {}
+
+    def add(self, rewards: Dict[str, float], num_steps: int):
+        self.num_games += 1
+        self.total_steps += num_steps
+        for name, reward in rewards.items():
+            self.total_rewards[name] = self.total_rewards.get(name, 0.0) + reward
+
+    def to_dict(self) -> Dict[str, Any]:
+        num_games = max(self.num_games, 1)
+        return {
+            "variant": self.variant,
+            "games": self.num_games,
+            "failed": self.num_failed,
+            "mean_steps": self.total_steps / num_games,
+            "mean_rewards": {
+                name: total / num_games for name, total in self.total_rewards.items()
+            },
+        }
+
+
+def run_sweep(
+    config: Union[str, ArenaConfig],
+    games_per_variant: int = 1,
+    max_steps: int = 100,
+    max_workers: int = 4,
+    max_pending: Optional[int] = None,
+    on_result: Optional[Callable[[Dict[str, Any], Dict[str, float], int], None]] = None,
+    pool: Optional[ArenaPool] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Play the games of every variant of a sweep and aggregate their results.
+
+    Parameters:
+        config (Union[str, ArenaConfig]): The config with a sweep spec, or its path.
+        games_per_variant (int): The number of games played with each variant.
+        max_steps (int): The maximum number of steps of a game.
+        max_workers (int): The maximum number of games played at the same time.
+        max_pending (Optional[int]): The maximum number of games submitted and not finished (defaults to 2 * max_workers).
+        on_result (Optional[Callable]): Called with the variant, the final rewards and the number of steps of each game.
+        pool (Optional[ArenaPool]): A pool to reuse the arenas across the games of a variant.
+
+    Returns:
+        List[Dict[str, Any]]: For each variant, its values, the number of games (and of failed games),
+        the mean number of steps and the mean reward of each player.
+    """
+    if isinstance(config, str):
+        config = ArenaConfig.load(config)
+    max_pending = max_pending or 2 * max_workers
+
+    stats: Dict[str, VariantStats] = {}
+    pending = {}
+
+    def collect(futures):
+        for future in futures:
+            key, variant = pending.pop(future)
+            try:
+                rewards, num_steps = future.result()
+            except Exception:
+                logging.exception(f"A game of the variant {variant} failed")
+                stats[key].num_failed += 1
+                continue
+            stats[key].add(rewards, num_steps)
+            if on_result is not None:
+                on_result(variant, rewards, num_steps)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for variant, variant_config in config.iter_variants():
+            key = json.dumps(variant, sort_keys=True, default=str)
+            stats.setdefault(key, VariantStats(variant))
+            for _ in range(games_per_variant):
+                if len(pending) >= max_pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+                future = executor.submit(play_game, variant_config, max_steps, pool)
+                pending[future] = (key, variant)
+        collect(wait(pending).done)
+
+    return [variant_stats.to_dict() for variant_stats in stats.values()]
@@ -0,0 +1,188 @@
+"""
+Cheap rule-based terminal checks for the moderator.
+
+The checks run before the moderator consults its backend, so that most turns can be decided without an LLM call.
+A check returns True if the conversation is over, False if it is certainly not over,
+and None if it has no opinion and the next check (and eventually the LLM) should decide.
+"""
+import re
+from abc import abstractmethod
+from typing import Dict, List, Optional, Type, Union
+
+from .config import Config, Configurable
+from .message import MODERATOR_NAME, Message
+
+
+class TerminalCheck(Configurable):
+    """An abstract base class for rule-based terminal checks."""
+
+    type_name = None
+
+    @abstractmethod
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)  # registers the arguments with Configurable
+
+    def __init_subclass__(cls, **kwargs):
+        # check if the subclass has the required attributes
+        if getattr(cls, "type_name") is None:
+            raise TypeError(
+                f"Can't instantiate abstract class {cls.__name__} without type_name attribute defined"
+            )
+        return super().__init_subclass__(**kwargs)
+
+    def to_config(self) -> Config:
+        self._config_dict["check_type"] = self.type_name
+        return Config(**self._config_dict)
+
+    @abstractmethod
+    def __call__(self, history: List[Message]) -> Optional[bool]:
+        """
+        Check whether the conversation is over.
+
+        Parameters:
+            history (List[Message]): The conversation history.
+
+        Returns:
+            Optional[bool]: True if it is over, False if it is certainly not over, None if undecided.
+        """
+        raise NotImplementedError
+
+    # reset the state of the check at the end of an episode
+    def reset(self):
+        pass
+
+
+TERMINAL_CHECK_REGISTRY: Dict[str, Type[TerminalCheck]] = {}
+
+
+def register_terminal_check(cls: Type[TerminalCheck]) -> Type[TerminalCheck]:
+    """Register a new terminal check."""
+    TERMINAL_CHECK_REGISTRY[cls.type_name] = cls
+    return cls
+
+
+# Load a terminal check from a config dictionary
+def load_terminal_check(config: Union[Config, dict]) -> TerminalCheck:
+    config = Config(config)
+    check_type = config.pop("check_type", None)
+    try:
+        check_cls = TERMINAL_CHECK_REGISTRY[check_type]
+    except KeyError:
+        raise ValueError(f"Unknown terminal check type: {check_type}")
+
+    return check_cls.from_config(config)
+
+
+@register_terminal_check
+class MaxTurnsCheck(TerminalCheck):
+    """End the conversation once the last message reaches a given turn."""
+
+    type_name = "max_turns"
+
+    def __init__(self, max_turns: int, **kwargs):
+        super().__init__(max_turns=max_turns, **kwargs)
+        self.max_turns = max_turns
+
+    def __call__(self, history: List[Message]) -> Optional[bool]:
+        if history and history[-1].turn >= self.max_turns:
+            return True
+        return None
+
+
+@register_terminal_check
+class KeywordCheck(TerminalCheck):
+    """End the conversation when the last message contains one of the keywords or matches one of the patterns."""
+
+    type_name = "keyword"
+
+    def __init__(
+        self,
+        keywords: List[str] = None,
+        patterns: List[str] = None,
+        ignore_case: bool = True,
+        **kwargs,
+    ):
+        super().__init__(
+            keywords=keywords, patterns=patterns, ignore_case=ignore_case, **kwargs
+        )
+        self.keywords = keywords or []
+        self.patterns = patterns or []
+        self.ignore_case = ignore_case
+
+        # Compile the keywords and patterns once into a single regex
+        alternatives = [re.escape(keyword) for keyword in self.keywords]
+        alternatives += [f"(?:{pattern})" for pattern in self.patterns]
+        flags = re.IGNORECASE if ignore_case else 0
+        self._regex = (
+            re.compile("|".join(alternatives), flags) if alternatives else None
+        )
+
+    def __call__(self, history: List[Message]) -> Optional[bool]:
+        if self._regex is not None and history:
+            if self._regex.search(history[-1].content):
+                return True
+        return None
+
+
+@register_terminal_check
+class RepeatedMessageCheck(TerminalCheck):
+    """End the conversation when the last speaker has repeated the same message several times in a row."""
+
+    type_name = "repeated_message"
+
+    def __init__(self, num_repeats: int = 3, **kwargs):
+        super().__init__(num_repeats=num_repeats, **kwargs)
+        assert num_repeats >= 2, "num_repeats must be at least 2"
+        self.num_repeats = num_repeats
+
+    def __call__(self, history: List[Message]) -> Optional[bool]:
+        # Only look at the player messages, the moderator may legitimately repeat itself
+        speaker, content, count = None, None, 0
+        for message in reversed(history):
+            if message.agent_name == MODERATOR_NAME:
+                continue
+            if speaker is None:
+                speaker, content = message.agent_name, message.content.strip().lower()
+            if message.agent_name != speaker:
+                continue
+            if message.content.strip().lower() != content:
+                return None
+            count += 1
+            if count >= self.num_repeats:
+                return True
+        return None
+
+
+@register_terminal_check
+class BudgetCheck(TerminalCheck):
+    """End the conversation once the history exceeds a message or character budget."""
+
+    type_name = "budget"
+
+    def __init__(self, max_messages: int = None, max_characters: int = None, **kwargs):
+        super().__init__(
+            max_messages=max_messages, max_characters=max_characters, **kwargs
+        )
+        self.max_messages = max_messages
+        self.max_characters = max_characters
+
+        # Running count of characters, so that each call only looks at the new messages
+        self._num_counted = 0
+        self._num_characters = 0
+
+    def reset(self):
+        self._num_counted = 0
+        self._num_characters = 0
+
+    def __call__(self, history: List[Message]) -> Optional[bool]:
+        if self.max_messages is not None and len(history) >= self.max_messages:
+            return True
+        if self.max_characters is not None:
+            if len(history) < self._num_counted:  # the history has been reset
+                self.reset()
+            for message in history[self._num_counted :]:
+                self._num_characters += len(message.content)
+            self._num_counted = len(history)
+            if self._num_characters >= self.max_characters:
+                return True
+        return None
@@ -0,0 +1,484 @@
+"""
+Tournaments between player configurations.
+
+A `Tournament` plays two-player games between the configs of a pool in an environment, with round-robin or Swiss
+pairings, and rates the configs with Elo or TrueSkill. Games run concurrently in a bounded thread pool
+(the games mostly wait for the backends), and the finished games are cached by fingerprint,
+so running the tournament again, or with more configs, only plays the new games.
+"""
+import functools
+import json
+import logging
+import math
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Tuple
+
+from .arena import Arena, TooManyInvalidActions
+from .config import AgentConfig, ArenaConfig, Config, EnvironmentConfig
+from .pool import ArenaPool
+
+try:
+    import numpy as np
+except ImportError:
+    is_numpy_available = False
+else:
+    is_numpy_available = True
+
+PAIRINGS = ("round_robin", "swiss")
+
+
+@dataclass
+class GameResult:
+    """
+    The result of a game between two configs of the pool.
+
+    Attributes:
+        players (Tuple[int, int]): The indices of the configs in the pool, in seat order.
+        rewards (Tuple[float, float]): The rewards of the two players, summed over the game.
+        num_steps (int): The number of steps played.
+    """
+
+    players: Tuple[int, int]
+    rewards: Tuple[float, float]
+    num_steps: int
+
+    @property
+    def score(self) -> float:
+        """Score of the first player: 1 for a win, 0.5 for a draw and 0 for a loss."""
+        if self.rewards[0] == self.rewards[1]:
+            return 0.5
+        return 1.0 if self.rewards[0] > self.rewards[1] else 0.0
+
+
+class EloRatings:
+    """Elo ratings, updated with all the games of a round at once."""
+
+    def __init__(self, num_players: int, initial: float = 1500.0, k_factor=32.0):
+        assert is_numpy_available, "numpy package is not installed"
+        self.k_factor = k_factor
+        self.ratings = np.full(num_players, initial, dtype=float)
+
+    def update(self, a: "np.ndarray", b: "np.ndarray", scores: "np.ndarray"):
+        """
+        Update the ratings with the games of a round, computed from the ratings before the round.
+
+        Parameters:
+            a (np.ndarray): The indices of the first players.
+            b (np.ndarray): The indices of the second players.
+            scores (np.ndarray): The scores of the first players (1 win, 0.5 draw, 0 loss).
+        """
+        expected = 1.0 / (1.0 + 10.0 ** ((self.ratings[b] - self.ratings[a]) / 400.0))
+        delta = self.k_factor * (scores - expected)
+        changes = np.zeros_like(self.ratings)
+        np.add.at(changes, a, delta)
+        np.add.at(changes, b, -delta)
+        self.ratings += changes
+
+    @property
+    def scores(self) -> "np.ndarray":
+        return self.ratings
+
+
+class TrueSkillRatings:
+    """Two-player TrueSkill ratings (Gaussian skill beliefs), updated with all the games of a round at once."""
+
+    def __init__(
+        self,
+        num_players: int,
+        mu: float = 25.0,
+        sigma: float = 25.0 / 3,
+        beta: float = 25.0 / 6,
+        tau: float = 25.0 / 300,
+        draw_probability: float = 0.1,
+    ):
+        assert is_numpy_available, "numpy package is not installed"
+        self.mu = np.full(num_players, mu, dtype=float)
+        self.sigma = np.full(num_players, sigma, dtype=float)
+        self.beta = beta
+        self.tau = tau
+        self.draw_margin = (
+            math.sqrt(2) * beta * _inverse_normal_cdf((draw_probability + 1) / 2)
+        )
+
+    def update(self, a: "np.ndarray", b: "np.ndarray", scores: "np.ndarray"):
+        """Update the ratings with the games of a round (see `EloRatings.update`)."""
+        # Order each game as (winner, loser), draws keep the seat order
+        swap = scores < 0.5
+        winner, loser = np.where(swap, b, a), np.where(swap, a, b)
+        draw = scores == 0.5
+
+        var_w = self.sigma[winner] ** 2 + self.tau**2
+        var_l = self.sigma[loser] ** 2 + self.tau**2
+        c = np.sqrt(2 * self.beta**2 + var_w + var_l)
+        t = (self.mu[winner] - self.mu[loser]) / c
+        eps = self.draw_margin / c
+
+        # Truncated Gaussian corrections for a win and for a draw
+        win_norm = np.maximum(_normal_cdf(t - eps), 1e-12)
+        v_win = _normal_pdf(t - eps) / win_norm
+        w_win = v_win * (v_win + t - eps)
+        draw_norm = np.maximum(_normal_cdf(eps - t) - _normal_cdf(-eps - t), 1e-12)
+        v_draw = (_normal_pdf(-eps - t) - _normal_pdf(eps - t)) / draw_norm
+        w_draw = (
+            v_draw**2
+            + ((eps - t) * _normal_pdf(eps - t) + (eps + t) * _normal_pdf(eps + t))
+            / draw_norm
+        )
+        v = np.where(draw, v_draw, v_win)
+        w = np.clip(np.where(draw, w_draw, w_win), 0.0, 1.0)
+
+        mu_changes = np.zeros_like(self.mu)
+        np.add.at(mu_changes, winner, var_w / c * v)
+        np.add.at(mu_changes, loser, -var_l / c * v)
+        variances = self.sigma**2
+        variances[np.union1d(a, b)] += self.tau**2
+        np.minimum.at(variances, winner, var_w * (1 - var_w / c**2 * w))
+        np.minimum.at(variances, loser, var_l * (1 - var_l / c**2 * w))
+        self.mu += mu_changes
+        self.sigma = np.sqrt(variances)
+
+    @property
+    def scores(self) -> "np.ndarray":
+        """Conservative skill estimates, used for the standings."""
+        return self.mu - 3 * self.sigma
+
+
+RATING_SYSTEMS = {"elo": EloRatings, "trueskill": TrueSkillRatings}
+
+
+def _normal_pdf(x):
+    return np.exp(-(x**2) / 2) / math.sqrt(2 * math.pi)
+
+
+def _normal_cdf(x):
+    erf = np.vectorize(math.erf, otypes=[float])
+    return 0.5 * (1 + erf(x / math.sqrt(2)))
+
+
+def _inverse_normal_cdf(p: float) -> float:
+    # Bisection is enough for the single value of the draw margin
+    low, high = -10.0, 10.0
+    for _ in range(100):
+        mid = (low + high) / 2
+        if 0.5 * (1 + math.erf(mid / math.sqrt(2))) < p:
+            low = mid
+        else:
+            high = mid
+    return (low + high) / 2
+
+
+class ResultCache:
+    """Finished games keyed by fingerprint, optionally persisted to an append-only JSONL file."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._results: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        if path is not None and os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:  # truncated by an interrupted write
+                        continue
+                    self._results[record["fingerprint"]] = record
+
+    def __contains__(self, fingerprint: str) -> bool:
+        return fingerprint in self._results
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def get(self, fingerprint: str) -> Optional[Dict]:
+        return self._results.get(fingerprint)
+
+    def add(self, fingerprint: str, record: Dict):
+        record = dict(record, fingerprint=fingerprint)
+        with self._lock:
+            self._results[fingerprint] = record
+            if self.path is not None:
+                with open(self.path, "a") as f:
+                    f.write(json.dumps(record) + "\n")
+
+
+def play_game(
+    config: ArenaConfig, max_steps: int, pool: Optional[ArenaPool] = None
+) -> Tuple[Dict[str, float], int]:
+    """
+    Play a game until it ends or reaches `max_steps`.
+
+    A player making too many invalid actions loses the game.
+
+    Parameters:
+        config (ArenaConfig): The config of the game.
+        max_steps (int): The maximum number of steps.
+        pool (Optional[ArenaPool]): A pool to reuse the arenas of previous games with the same config.
+
+    Returns:
+        Tuple[Dict[str, float], int]: The rewards of the players summed over the game, and the number of steps played.
+    """
+    if pool is None:
+        # from_config adds fields to the config, which may be shared by concurrent games
+        return _play_arena(Arena.from_config(config.deepcopy()), max_steps)
+    with pool.arena(config) as arena:
+        return _play_arena(arena, max_steps)
+
+
+def _play_arena(arena: Arena, max_steps: int) -> Tuple[Dict[str, float], int]:
+    player_names = [player.name for player in arena.players]
+    rewards = {name: 0.0 for name in player_names}
+    for num_steps in range(1, max_steps + 1):
+        player_name = arena.environment.get_next_player()
+        try:
+            timestep = arena.step()
+        except TooManyInvalidActions:
+            return {
+                name: 0.0 if name == player_name else 1.0 for name in player_names
+            }, num_steps
+        if timestep.reward:
+            for name, reward in timestep.reward.items():
+                rewards[name] = rewards.get(name, 0.0) + reward
+        if timestep.terminal:
+            break
+    return rewards, num_steps
+
+
+class Tournament:
+    """
+    A tournament between the player configs of a pool, in a two-player environment.
+
+    Each pairing is played `games_per_pair` times, alternating the seats. The game between two configs in a given seat
+    order is identified by the fingerprint of the environment, the two configs and the game index,
+    so cached games are never played again.
+    """
+
+    def __init__(
+        self,
+        players: List[AgentConfig],
+        environment: EnvironmentConfig,
+        pairing: str = "round_robin",
+        rating: str = "elo",
+        games_per_pair: int = 2,
+        num_rounds: Optional[int] = None,
+        max_steps: int = 100,
+        max_workers: int = 4,
+        seat_names: Optional[List[str]] = None,
+        global_prompt: str = None,
+        cache_path: Optional[str] = None,
+        rating_kwargs: Optional[Dict] = None,
+        pool: Optional[ArenaPool] = None,
+    ):
+        """
+        Initialize the tournament.
+
+        Parameters:
+            players (List[AgentConfig]): The pool of player configs.
+            environment (EnvironmentConfig): The config of the environment.
+            pairing (str): "round_robin" or "swiss".
+            rating (str): "elo" or "trueskill".
+            games_per_pair (int): The number of games of each pairing, alternating the seats.
+            num_rounds (Optional[int]): The number of Swiss rounds (defaults to ceil(log2(number of configs))).
+            max_steps (int): The maximum number of steps of a game.
+            max_workers (int): The maximum number of games played at the same time.
+            seat_names (Optional[List[str]]): The player names required by the environment, given to the players
+                of each game in seat order. If None, the players keep the names of their configs.
+            global_prompt (str): The global prompt of the games.
+            cache_path (Optional[str]): A JSONL file caching the finished games across runs.
+            rating_kwargs (Optional[Dict]): Arguments of the rating system.
+            pool (Optional[ArenaPool]): A pool to reuse the arenas across the games of a pairing.
+        """
+        assert is_numpy_available, "numpy package is not installed"
+        assert pairing in PAIRINGS, f"pairing must be one of {PAIRINGS}"
+        assert rating in RATING_SYSTEMS, f"rating must be one of {list(RATING_SYSTEMS)}"
+        assert len(players) >= 2, "A tournament needs at least two players"
+        if seat_names is None:
+            names = [player["name"] for player in players]
+            assert len(names) == len(set(names)), "Player names must be unique"
+        else:
+            assert len(seat_names) == 2, "Tournaments are played between two players"
+
+        self.players = players
+        self.environment = environment
+        self.pairing = pairing
+        self.rating = rating
+        self.games_per_pair = games_per_pair
+        self.num_rounds = num_rounds or math.ceil(math.log2(len(players)))
+        self.max_steps = max_steps
+        self.max_workers = max_workers
+        self.seat_names = seat_names
+        self.global_prompt = global_prompt
+        self.rating_kwargs = rating_kwargs or {}
+        self.cache = ResultCache(cache_path)
+        self.pool = pool
+
+        self.ratings = None
+        self.results: List[GameResult] = []
+        self.num_played = 0  # games played in this run, the others came from the cache
+
+    @property
+    def player_names(self) -> List[str]:
+        return [
+            player.get("name", f"player {i}") for i, player in enumerate(self.players)
+        ]
+
+    def arena_config(self, a: int, b: int) -> ArenaConfig:
+        """The config of a game between the configs a and b, in this seat order."""
+        players = [self.players[a].deepcopy(), self.players[b].deepcopy()]
+        if self.seat_names is not None:
+            for player, name in zip(players, self.seat_names):
+                player["name"] = name
+        environment = self.environment.deepcopy()
+        environment.pop("player_names", None)
+        return ArenaConfig(
+            players=players,
+            environment=environment,
+            global_prompt=self.global_prompt,
+        )
+
+    def game_fingerprint(self, a: int, b: int, game_idx: int) -> str:
+        return Config(
+            arena=self.arena_config(a, b), max_steps=self.max_steps, game=game_idx
+        ).fingerprint()
+
+    def round_robin_rounds(self) -> List[List[Tuple[int, int]]]:
+        """Rounds of the circle method, in which every config plays at most one game."""
+        indices: List[Optional[int]] = list(range(len(self.players)))
+        if len(indices) % 2:
+            indices.append(None)  # bye
+        num_slots = len(indices)
+        rounds = []
+        for _ in range(num_slots - 1):
+            pairs = [
+                (indices[i], indices[num_slots - 1 - i])
+                for i in range(num_slots // 2)
+                if indices[i] is not None and indices[num_slots - 1 - i] is not None
+            ]
+            rounds.append(pairs)
+            indices = [indices[0], indices[-1]] + indices[1:-1]
+        return rounds
+
+    def swiss_pairs(self, played: set) -> List[Tuple[int, int]]:
+        """Pair the configs with close ratings, avoiding rematches when possible."""
+        order = [int(i) for i in np.argsort(-self.ratings.scores, kind="stable")]
+        pairs = []
+        while len(order) >= 2:
+            a = order.pop(0)
+            opponent = next(
+                (b for b in order if frozenset((a, b)) not in played), order[0]
+            )
+            order.remove(opponent)
+            pairs.append((a, opponent))
+        return pairs
+
+    def _games(self, pairs: List[Tuple[int, int]]) -> List[Tuple[int, int, int]]:
+        games = []
+        for a, b in pairs:
+            for game_idx in range(self.games_per_pair):
+                seats = (a, b) if game_idx % 2 == 0 else (b, a)
+                games.append((*seats, game_idx))
+        return games
+
+    def _game_result(self, a: int, b: int, future: Future) -> GameResult:
+        rewards, num_steps = future.result()
+        names = self.seat_names or [self.player_names[a], self.player_names[b]]
+        return GameResult(
+            players=(a, b),
+            rewards=(rewards.get(names[0], 0.0), rewards.get(names[1], 0.0)),
+            num_steps=num_steps,
+        )
+
+    def _cache_result(self, a: int, b: int, fingerprint: str, future: Future):
+        """Cache a game as soon as it is finished, so that it is kept even if another game fails."""
+        if not future.cancelled() and future.exception() is None:
+            self.cache.add(fingerprint, asdict(self._game_result(a, b, future)))
+
+    def _play(self, executor, games: List[Tuple[int, int, int]]) -> List[GameResult]:
+        """Play the games which are not cached, concurrently."""
+        fingerprints = [self.game_fingerprint(*game) for game in games]
+        futures = {}
+        for (a, b, _), fingerprint in zip(games, fingerprints):
+            if fingerprint not in self.cache and fingerprint not in futures:
+                future = executor.submit(
+                    play_game, self.arena_config(a, b), self.max_steps, self.pool
+                )
+                future.add_done_callback(
+                    functools.partial(self._cache_result, a, b, fingerprint)
+                )
+                futures[fingerprint] = future
+
+        results = []
+        for (a, b, _), fingerprint in zip(games, fingerprints):
+            if fingerprint in futures:
+                result = self._game_result(a, b, futures[fingerprint])
+                self.num_played += 1
+            else:
+                record = self.cache.get(fingerprint)
+                result = GameResult(
+                    players=(a, b),
+                    rewards=tuple(record["rewards"]),
+                    num_steps=record["num_steps"],
+                )
+            results.append(result)
+        return results
+
+    def _rate(self, results: List[GameResult]):
+        if results:
+            self.ratings.update(
+                np.array([r.players[0] for r in results]),
+                np.array([r.players[1] for r in results]),
+                np.array([r.score for r in results]),
+            )
+        self.results.extend(results)
+
+    def run(self) -> List[Dict]:
+        """Play the tournament and return the standings."""
+        self.ratings = RATING_SYSTEMS[self.rating](
+            len(self.players), **self.rating_kwargs
+        )
+        self.results = []
+        self.num_played = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            if self.pairing == "round_robin":
+                # The games do not depend on the ratings, so all of them are played at once
+                rounds = self.round_robin_rounds()
+                results = self._play(
+                    executor, self._games([p for pairs in rounds for p in pairs])
+                )
+                # Then the ratings are updated round by round, in which every config plays one pairing
+                for pairs in rounds:
+                    num_games = len(pairs) * self.games_per_pair
+                    round_results, results = results[:num_games], results[num_games:]
+                    for game_idx in range(self.games_per_pair):
+                        self._rate(round_results[game_idx :: self.games_per_pair])
+            else:
+                played = set()
+                for _ in range(self.num_rounds):
+                    pairs = self.swiss_pairs(played)
+                    played.update(frozenset(pair) for pair in pairs)
+                    results = self._play(executor, self._games(pairs))
+                    for game_idx in range(self.games_per_pair):
+                        self._rate(results[game_idx :: self.games_per_pair])
+        logging.info(
+            f"Tournament finished: {self.num_played} games played, "
+            f"{len(self.results) - self.num_played} from the cache"
+        )
+        return self.standings()
+
+    def standings(self) -> List[Dict]:
+        """The configs sorted by rating, with their number of games, wins, draws and losses."""
+        assert self.ratings is not None, "The tournament has not been run"
+        records = [
+            {"name": name, "games": 0, "wins": 0, "draws": 0, "losses": 0}
+            for name in self.player_names
+        ]
+        for result in self.results:
+            for player, score in zip(result.players, (result.score, 1 - result.score)):
+                records[player]["games"] += 1
+                key = "draws" if score == 0.5 else "wins" if score == 1 else "losses"
+                records[player][key] += 1
+        for record, rating in zip(records, self.ratings.scores):
+            record["rating"] = float(rating)
+        return sorted(records, key=lambda record: record["rating"], reverse=True)
@@ -0,0 +1,237 @@
+"""
+Lightweight tracing of the game loop.
+
+The hot paths (`Arena.step`, `Player.act`, the environment calls and the backend requests) are wrapped in
+`span(name)` blocks. Tracing is disabled by default, and `span` then returns a shared no-op context manager,
+so the instrumentation costs a function call per block.
+
+Example:
+    with tracing() as tracer:
+        arena.run(num_steps=10)
+    print(tracer.format_summary())
+    tracer.export_chrome_trace("trace.json")  # open in chrome://tracing or https://ui.perfetto.dev
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+
+@dataclass
+class Span:
+    """
+    A timed block.
+
+    Attributes:
+        name (str): The name of the block (e.g., "arena.step").
+        start (int): The start time, in nanoseconds (time.perf_counter_ns).
+        duration (int): The duration, in nanoseconds.
+        self_duration (int): The duration minus the durations of the nested spans.
+        thread_id (int): The thread that ran the block.
+        depth (int): The nesting depth of the block in its thread.
+        args (Dict[str, Any]): Arguments of the block (e.g., the player name).
+    """
+
+    name: str
+    start: int
+    duration: int = 0
+    self_duration: int = 0
+    thread_id: int = 0
+    depth: int = 0
+    args: Dict[str, Any] = field(default_factory=dict)
+
+
+class _NullSpan:
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _ActiveSpan:
+    __slots__ = ("tracer", "span", "child_duration")
+
+    def __init__(self, tracer: "Tracer", name: str, args: Dict[str, Any]):
+        self.tracer = tracer
+        self.span = Span(name=name, start=0, args=args)
+        self.child_duration = 0
+
+    def __enter__(self):
+        stack = self.tracer._stack()
+        self.span.thread_id = threading.get_ident()
+        self.span.depth = len(stack)
+        stack.append(self)
+        self.span.start = time.perf_counter_ns()
+        return self.span
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        span = self.span
+        span.duration = time.perf_counter_ns() - span.start
+        span.self_duration = span.duration - self.child_duration
+        if exc_type is not None:
+            span.args["error"] = exc_type.__name__
+        stack = self.tracer._stack()
+        stack.pop()
+        if stack:
+            stack[-1].child_duration += span.duration
+        self.tracer._record(span)
+        return False
+
+
+class Tracer:
+    """Collects the spans of all the threads."""
+
+    def __init__(self, max_spans: Optional[int] = 1_000_000):
+        """
+        Initialize the tracer.
+
+        Parameters:
+            max_spans (Optional[int]): The maximum number of spans kept, the later ones are only counted as dropped.
+        """
+        self.max_spans = max_spans
+        self.spans: List[Span] = []
+        self.num_dropped = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _stack(self) -> List[_ActiveSpan]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _record(self, span: Span):
+        with self._lock:
+            if self.max_spans is None or len(self.spans) < self.max_spans:
+                self.spans.append(span)
+            else:
+                self.num_dropped += 1
+
+    def span(self, name: str, **args) -> _ActiveSpan:
+        return _ActiveSpan(self, name, args)
+
+    def clear(self):
+        with self._lock:
+            self.spans = []
+            self.num_dropped = 0
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """
+        Aggregate the spans by name.
+
+        Returns:
+            List[Dict[str, Any]]: The count, total, self (excluding nested spans), mean and max times
+            in milliseconds of each span name, by decreasing total time.
+        """
+        stats: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            row = stats.setdefault(
+                span.name,
+                {
+                    "name": span.name,
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "self_ms": 0.0,
+                    "max_ms": 0.0,
+                },
+            )
+            row["count"] += 1
+            row["total_ms"] += span.duration / 1e6
+            row["self_ms"] += span.self_duration / 1e6
+            row["max_ms"] = max(row["max_ms"], span.duration / 1e6)
+        for row in stats.values():
+            row["mean_ms"] = row["total_ms"] / row["count"]
+        return sorted(stats.values(), key=lambda row: row["total_ms"], reverse=True)
+
+    def format_summary(self) -> str:
+        """Format the summary as a text table."""
+        columns = ["count", "total_ms", "self_ms", "mean_ms", "max_ms"]
+        rows = self.summary()
+        name_width = max([len("span")] + [len(row["name"]) for row in rows])
+        lines = [
+            f"{'span':<{name_width}}" + "".join(f"{column:>12}" for column in columns)
+        ]
+        for row in rows:
+            lines.append(
+                f"{row['name']:<{name_width}}{row['count']:>12}"
+                + "".join(f"{row[column]:>12.3f}" for column in columns[1:])
+            )
+        return "\n".join(lines)
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """Convert the spans to the Chrome trace event format (also read by Perfetto)."""
+        pid = os.getpid()
+        with self._lock:
+            spans = list(self.spans)
+        events = [
+            {
+                "name": span.name,
+                "ph": "X",  # complete event, with a duration
+                "ts": span.start / 1e3,  # microseconds
+                "dur": span.duration / 1e3,
+                "pid": pid,
+                "tid": span.thread_id,
+                "args": {key: str(value) for key, value in span.args.items()},
+            }
+            for span in spans
+        ]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export_chrome_trace(self, path: str):
+        """Write the spans to a Chrome trace JSON file."""
+        with open(path, "w") as f:
+            json.dump(self.to_chrome_trace(), f)
+
+
+_tracer: Optional[Tracer] = None
+
+
+def span(name: str, **args):
+    """
+    Time a block with the active tracer, or do nothing if tracing is disabled.
+
+    Parameters:
+        name (str): The name of the block.
+        args: Arguments of the block, shown in the trace viewers.
+    """
+    tracer = _tracer
+    if tracer is None:
+        return _NULL_SPAN
+    return tracer.span(name, **args)
+
+
+def get_tracer() -> Optional[Tracer]:
+    return _tracer
+
+
+def enable_tracing(tracer: Optional[Tracer] = None) -> Tracer:
+    """Start recording the spans of all the threads with a tracer (a new one if None)."""
+    global _tracer
+    _tracer = tracer if tracer is not None else Tracer()
+    return _tracer
+
+
+def disable_tracing():
+    global _tracer
+    _tracer = None
+
+
+@contextmanager
+def tracing(tracer: Optional[Tracer] = None):
+    """Enable tracing in a block, and restore the previous tracer afterwards."""
+    global _tracer
+    previous = _tracer
+    tracer = enable_tracing(tracer)
+    try:
+        yield tracer
+    finally:
+        _tracer = previous
@@ -0,0 +1,210 @@
+"""
+Trajectory recorders for the PettingZoo wrappers.
+
+The recorders wrap an AEC or parallel environment and append each finished episode as one JSON record
+to sharded, compressed JSONL files, for offline RL or fine-tuning datasets.
+Disk I/O happens in a background thread (see `ShardedJSONLWriter`), so `step()` never waits for it.
+"""
+from __future__ import annotations
+
+import time
+import uuid
+
+from pettingzoo.utils import BaseParallelWrapper, BaseWrapper
+
+from .writers import ShardedJSONLWriter
+
+# Infos keys holding the whole history, which would make the records grow quadratically
+DEFAULT_EXCLUDED_INFO_KEYS = ("all_messages", "all_messages_string")
+
+
+class _EpisodeBuffer:
+    """Steps of the current episode, handed over to the writer when the episode ends."""
+
+    def __init__(
+        self,
+        writer: ShardedJSONLWriter | None,
+        directory: str | None,
+        exclude_info_keys,
+        **writer_kwargs,
+    ):
+        if writer is None:
+            assert directory is not None, "either a writer or a directory is required"
+            writer = ShardedJSONLWriter(directory, **writer_kwargs)
+            self.owns_writer = True
+        else:
+            self.owns_writer = False
+        self.writer = writer
+        self.exclude_info_keys = set(exclude_info_keys or ())
+        self.episode = None
+        self.num_episodes = 0
+
+    def filter_info(self, info: dict) -> dict:
+        # Shallow copy, as the wrappers update the info dicts in place. The excluded entries are not read,
+        # as some wrappers only build them on access
+        return {k: info[k] for k in info if k not in self.exclude_info_keys}
+
+    def start(self, env_name: str):
+        self.end()
+        self.episode = {
+            "episode_id": str(uuid.uuid4()),
+            "env": env_name,
+            "start_time": time.time(),
+            "steps": [],
+        }
+
+    def append(self, step: dict):
+        if self.episode is not None:
+            self.episode["steps"].append(step)
+
+    def end(self):
+        if self.episode is not None and self.episode["steps"]:
+            self.writer.write(self.episode)
+            self.num_episodes += 1
+        self.episode = None
+
+    def close(self):
+        self.end()
+        if self.owns_writer:
+            self.writer.close()
+        else:
+            self.writer.flush()
+
+
+class TrajectoryRecorder(BaseWrapper):
+    """
+    Record the episodes of an AEC environment.
+
+    Each step is stored as the observation, reward, termination, truncation and info returned by `last()` for the
+    acting agent, along with its action. The reward is therefore the one accumulated since the agent's previous action,
+    and the final rewards are in the steps of terminated agents (whose action is None).
+    """
+
+    def __init__(
+        self,
+        env,
+        writer: ShardedJSONLWriter | None = None,
+        directory: str | None = None,
+        exclude_info_keys=DEFAULT_EXCLUDED_INFO_KEYS,
+        **writer_kwargs,
+    ):
+        """Trajectory recorder.
+
+        Args:
+            env (AECEnv): environment to record
+            writer (Optional[ShardedJSONLWriter]): writer shared with other recorders (closed by its owner)
+            directory (Optional[str]): directory of the shards, if no writer is given
+            exclude_info_keys (Iterable[str]): info keys which are not recorded
+            writer_kwargs: arguments for ShardedJSONLWriter (prefix, compression, max_shard_bytes)
+        """
+        super().__init__(env)
+        self._buffer = _EpisodeBuffer(
+            writer, directory, exclude_info_keys, **writer_kwargs
+        )
+
+    @property
+    def writer(self) -> ShardedJSONLWriter:
+        return self._buffer.writer
+
+    @property
+    def num_episodes(self) -> int:
+        return self._buffer.num_episodes
+
+    def reset(self, seed: int | None = None, options: dict | None = None):
+        self._buffer.start(
+            self.unwrapped.metadata.get("name", type(self.unwrapped).__name__)
+        )
+        return super().reset(seed=seed, options=options)
+
+    def step(self, action):
+        agent = self.agent_selection
+        observation, reward, termination, truncation, info = self.env.last()
+        self._buffer.append(
+            {
+                "agent": agent,
+                "observation": observation,
+                "action": action,
+                "reward": reward,
+                "termination": termination,
+                "truncation": truncation,
+                "info": self._buffer.filter_info(info),
+            }
+        )
+        super().step(action)
+        if not self.agents:
+            self._buffer.end()
+
+    def close(self):
+        self._buffer.close()
+        super().close()
+
+
+class ParallelTrajectoryRecorder(BaseParallelWrapper):
+    """
+    Record the episodes of a parallel environment.
+
+    Each step is stored as the observations and infos the agents acted on, their actions,
+    and the rewards, terminations and truncations of the transition.
+    """
+
+    def __init__(
+        self,
+        env,
+        writer: ShardedJSONLWriter | None = None,
+        directory: str | None = None,
+        exclude_info_keys=DEFAULT_EXCLUDED_INFO_KEYS,
+        **writer_kwargs,
+    ):
+        """Parallel trajectory recorder.
+
+        Args:
+            env (ParallelEnv): environment to record
+            writer (Optional[ShardedJSONLWriter]): writer shared with other recorders (closed by its owner)
+            directory (Optional[str]): directory of the shards, if no writer is given
+            exclude_info_keys (Iterable[str]): info keys which are not recorded
+            writer_kwargs: arguments for ShardedJSONLWriter (prefix, compression, max_shard_bytes)
+        """
+        super().__init__(env)
+        self._buffer = _EpisodeBuffer(
+            writer, directory, exclude_info_keys, **writer_kwargs
+        )
+        self._observations, self._infos = {}, {}
+
+    @property
+    def writer(self) -> ShardedJSONLWriter:
+        return self._buffer.writer
+
+    @property
+    def num_episodes(self) -> int:
+        return self._buffer.num_episodes
+
+    def reset(self, seed: int | None = None, options: dict | None = None):
+        self._buffer.start(
+            self.unwrapped.metadata.get("name", type(self.unwrapped).__name__)
+        )
+        self._observations, self._infos = self.env.reset(seed=seed, options=options)
+        return self._observations, self._infos
+
+    def step(self, actions: dict):
+        observations, rewards, terminations, truncations, infos = self.env.step(actions)
+        self._buffer.append(
+            {
+                "observations": self._observations,
+                "actions": dict(actions),
+                "rewards": rewards,
+                "terminations": terminations,
+                "truncations": truncations,
+                "infos": {
+                    agent: self._buffer.filter_info(info)
+                    for agent, info in self._infos.items()
+                },
+            }
+        )
+        self._observations, self._infos = observations, infos
+        if not self.env.agents:
+            self._buffer.end()
+        return observations, rewards, terminations, truncations, infos
+
+    def close(self):
+        self._buffer.close()
+        super().close()
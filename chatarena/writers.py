@@ -0,0 +1,312 @@
+"""
+Writers for logging records to disk without stalling the game loop.
+
+`ShardedJSONLWriter` queues records for a background writer thread (used for trajectories),
+and `JSONLHistorySink` appends the messages of a running game to a buffered JSONL log.
+"""
+import dataclasses
+import gzip
+import json
+import os
+import queue
+import re
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional
+
+from .message import Message
+
+try:
+    import zstandard
+except ImportError:
+    is_zstandard_available = False
+else:
+    is_zstandard_available = True
+
+COMPRESSIONS = (None, "gzip")
+HISTORY_COMPRESSIONS = (None, "gzip", "zstd")
+_CLOSE = object()  # sentinel telling the writer thread to stop
+
+
+def to_jsonable(obj: Any) -> Any:
+    """Convert the objects that the json module cannot encode (messages, numpy arrays, sets...)."""
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if hasattr(obj, "tolist"):  # numpy arrays and scalars
+        return obj.tolist()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    return str(obj)
+
+
+class ShardedJSONLWriter:
+    """
+    Append JSON records to sharded, optionally gzip-compressed, JSONL files.
+
+    Records are written by a background thread, so `write` never blocks on disk I/O.
+    A new shard is started once the current one reaches `max_shard_bytes` (measured on disk, so after compression).
+    Existing shards in the directory are never overwritten.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        prefix: str = "shard",
+        compression: Optional[str] = "gzip",
+        max_shard_bytes: int = 64 * 1024 * 1024,
+    ):
+        """
+        Initialize the writer.
+
+        Parameters:
+            directory (str): The directory of the shards (created if needed).
+            prefix (str): The prefix of the shard file names.
+            compression (Optional[str]): None or "gzip".
+            max_shard_bytes (int): The size after which a new shard is started.
+        """
+        assert compression in COMPRESSIONS, f"compression must be one of {COMPRESSIONS}"
+        self.directory = directory
+        self.prefix = prefix
+        self.compression = compression
+        self.max_shard_bytes = max_shard_bytes
+        self.shard_paths: List[str] = []
+        self.num_records = 0
+
+        os.makedirs(directory, exist_ok=True)
+        # Start after the shards already in the directory
+        shard_pattern = re.compile(rf"^{re.escape(prefix)}-(\d+)\.jsonl")
+        indices = [
+            int(match.group(1))
+            for match in map(shard_pattern.match, os.listdir(directory))
+            if match
+        ]
+        self._next_shard_idx = max(indices) + 1 if indices else 0
+
+        self._raw_file = None
+        self._file = None
+        self._error: Optional[BaseException] = None
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._run, name=f"{prefix}-writer", daemon=True
+        )
+        self._thread.start()
+        self.closed = False
+
+    @property
+    def suffix(self) -> str:
+        return ".jsonl.gz" if self.compression == "gzip" else ".jsonl"
+
+    def write(self, record: Any):
+        """Queue a record to be written (serialized with `to_jsonable` for non-JSON types)."""
+        if self.closed:
+            raise ValueError("Cannot write to a closed writer")
+        self._raise_error()
+        self._queue.put(record)
+
+    def flush(self):
+        """Block until all the queued records have been written and flushed to disk."""
+        self._queue.join()
+        self._raise_error()
+
+    def close(self):
+        """Write the queued records, close the current shard and stop the writer thread."""
+        if self.closed:
+            return
+        self.closed = True
+        self._queue.put(_CLOSE)
+        self._thread.join()
+        self._raise_error()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise RuntimeError("The background writer failed") from error
+
+    def _open_shard(self):
+        path = os.path.join(
+            self.directory, f"{self.prefix}-{self._next_shard_idx:05d}{self.suffix}"
+        )
+        self._next_shard_idx += 1
+        self._raw_file = open(path, "ab")
+        if self.compression == "gzip":
+            self._file = gzip.GzipFile(fileobj=self._raw_file, mode="ab")
+        else:
+            self._file = self._raw_file
+        self.shard_paths.append(path)
+
+    def _close_shard(self):
+        if self._file is not None:
+            self._file.close()
+            if self._file is not self._raw_file:
+                self._raw_file.close()
+        self._file = self._raw_file = None
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _CLOSE:
+                    self._close_shard()
+                    return
+                line = json.dumps(item, default=to_jsonable) + "\n"
+                if self._file is None:
+                    self._open_shard()
+                self._file.write(line.encode("utf-8"))
+                self.num_records += 1
+                if self._queue.empty():
+                    self._file.flush()
+                if self._raw_file.tell() >= self.max_shard_bytes:
+                    self._close_shard()
+            except BaseException as e:  # reported to the caller on the next call
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+
+def message_to_dict(message: Message) -> Dict[str, Any]:
+    """Convert a message to the row format of the saved histories."""
+    return {
+        "agent_name": message.agent_name,
+        "content": message.content,
+        "turn": message.turn,
+        "timestamp": message.timestamp,
+        "visible_to": message.visible_to,
+        "msg_type": message.msg_type,
+    }
+
+
+class JSONLHistorySink:
+    """
+    Append-only JSONL log of the messages of a game, written while the game runs.
+
+    Lines are buffered and flushed every `flush_every` messages or `flush_interval` seconds,
+    so logging a message costs O(1). With compression, each flush is written as an independent
+    gzip member or zstd frame, so the file stays readable up to the last flush if the run is interrupted.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        compression: Optional[str] = None,
+        flush_every: int = 32,
+        flush_interval: Optional[float] = 5.0,
+    ):
+        """
+        Initialize the sink.
+
+        Parameters:
+            path (str): The path of the log, appended to if it exists.
+            compression (Optional[str]): None, "gzip" or "zstd" (requires zstandard).
+            flush_every (int): The number of buffered messages that triggers a flush.
+            flush_interval (Optional[float]): The maximum time in seconds between flushes (None to only flush on count).
+        """
+        assert (
+            compression in HISTORY_COMPRESSIONS
+        ), f"compression must be one of {HISTORY_COMPRESSIONS}"
+        if compression == "zstd":
+            assert is_zstandard_available, "zstandard package is not installed"
+            self._compressor = zstandard.ZstdCompressor()
+        self.path = path
+        self.compression = compression
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.num_messages = 0
+
+        self._file = open(path, "ab")
+        self._buffer: List[str] = []
+        self._last_flush = time.monotonic()
+
+    def write(self, message: Message, **extra):
+        """Log a message, with extra fields (e.g., the conversation id)."""
+        record = message_to_dict(message)
+        record.update(extra)
+        self._buffer.append(json.dumps(record, default=to_jsonable) + "\n")
+        self.num_messages += 1
+        if len(self._buffer) >= self.flush_every or (
+            self.flush_interval is not None
+            and time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            self.flush()
+
+    def write_messages(self, messages: List[Message], **extra):
+        for message in messages:
+            self.write(message, **extra)
+
+    def flush(self):
+        """Write the buffered messages to disk."""
+        if self._buffer:
+            data = "".join(self._buffer).encode("utf-8")
+            if self.compression == "gzip":
+                data = gzip.compress(data)
+            elif self.compression == "zstd":
+                data = self._compressor.compress(data)
+            self._file.write(data)
+            self._buffer = []
+        self._file.flush()
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def read_jsonl_history(path: str, compression: Optional[str] = None) -> List[Dict]:
+    """
+    Read a log written by `JSONLHistorySink`.
+
+    A truncated last line (from an interrupted write) is skipped.
+
+    Parameters:
+        path (str): The path of the log.
+        compression (Optional[str]): None, "gzip" or "zstd".
+
+    Returns:
+        List[Dict]: One record per message.
+    """
+    assert (
+        compression in HISTORY_COMPRESSIONS
+    ), f"compression must be one of {HISTORY_COMPRESSIONS}"
+    with open(path, "rb") as f:
+        data = f.read()
+    if compression == "gzip":
+        # Decompress member by member, so that a member truncated by an interrupted flush is skipped
+        chunks = []
+        while data:
+            decompressor = zlib.decompressobj(wbits=31)
+            try:
+                chunk = decompressor.decompress(data)
+            except zlib.error:
+                break
+            if not decompressor.eof:
+                break
+            chunks.append(chunk)
+            data = decompressor.unused_data
+        data = b"".join(chunks)
+    elif compression == "zstd":
+        assert is_zstandard_available, "zstandard package is not installed"
+        with zstandard.ZstdDecompressor().stream_reader(
+            data, read_across_frames=True
+        ) as reader:
+            data = reader.read()
+
+    records = []
+    for line in data.decode("utf-8").splitlines():
+        try:
+            records.append(json.loads(line))
+        except json.JSONDecodeError:
+            break
+    return records
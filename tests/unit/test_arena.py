@@ -1,4 +1,5 @@
 import os
+import threading
 import unittest
 from unittest import TestCase
 
@@ -6,7 +7,50 @@ import pytest
 
 import chatarena
 from chatarena import EXAMPLES_DIR
+from chatarena.agent import Player
 from chatarena.arena import Arena
+from chatarena.backends import IntelligenceBackend, register_backend
+from chatarena.config import ArenaConfig
+from chatarena.environments import register_env
+from chatarena.environments.conversation import Conversation
+from chatarena.message import SYSTEM_NAME
+
+
+@register_backend
+class FeedbackBackend(IntelligenceBackend):
+    """Answers "valid" once it has been told that its previous answers were invalid."""
+
+    stateful = False
+    type_name = "test-feedback"
+
+    def __init__(self, barrier: threading.Barrier = None, **kwargs):
+        super().__init__(**kwargs)
+        # The queries without feedback wait on the barrier, which only opens if they run concurrently
+        self.barrier = barrier
+        self.num_queries = 0
+        self.thread_ids = set()
+        self._lock = threading.Lock()
+
+    def query(self, agent_name, role_desc, history_messages, *args, **kwargs) -> str:
+        with self._lock:
+            self.num_queries += 1
+            self.thread_ids.add(threading.get_ident())
+        if any(m.agent_name == SYSTEM_NAME for m in history_messages):
+            return "valid"
+        if self.barrier is not None:
+            self.barrier.wait()
+        return "invalid"
+
+    async def async_query(self, *args, **kwargs) -> str:
+        return self.query(*args, **kwargs)
+
+
+@register_env
+class ValidOnlyConversation(Conversation):
+    type_name = "test-valid-only"
+
+    def check_action(self, action: str, player_name: str) -> bool:
+        return action == "valid"
 
 
 class TestArena(TestCase):
@@ -175,6 +219,78 @@ class TestArena(TestCase):
 
         self.assertTrue(True)
 
+    def test_arena_stub_backend(self):
+        arena = Arena.from_config(
+            ArenaConfig(
+                players=[
+                    {
+                        "name": name,
+                        "role_desc": "You chat.",
+                        "backend": {"backend_type": "stub"},
+                    }
+                    for name in ["Alice", "Bob"]
+                ],
+                environment={"env_type": "conversation"},
+            )
+        )
+        arena.run(num_steps=3)
+        messages = arena.environment.get_observation()
+        self.assertEqual(len(messages), 3)
+        self.assertEqual(
+            messages[2].content,
+            f"{messages[2].agent_name} says message 2.",
+        )
+
+
+class TestInvalidActionRetries(TestCase):
+    def make_arena(self, num_candidates, barrier=None):
+        player_names = ["Alice", "Bob"]
+        players = [
+            Player(
+                name=name,
+                role_desc="You chat.",
+                backend=FeedbackBackend(barrier=barrier),
+            )
+            for name in player_names
+        ]
+        environment = ValidOnlyConversation(player_names=player_names)
+        return Arena(players, environment, num_candidates=num_candidates)
+
+    def test_feedback(self):
+        arena = self.make_arena(num_candidates=1)
+        arena.step()
+        # The second attempt sees why the first one was rejected
+        self.assertEqual(arena.players[0].backend.num_queries, 2)
+        messages = arena.environment.get_observation()
+        self.assertEqual([m.content for m in messages], ["valid"])
+
+    def test_candidates(self):
+        # The barrier breaks (and the step fails) unless the three candidates are queried concurrently
+        arena = self.make_arena(
+            num_candidates=3, barrier=threading.Barrier(3, timeout=10)
+        )
+        arena.step()
+        backend = arena.players[0].backend
+        # One batch of three concurrent invalid candidates, then a batch with the feedback
+        self.assertEqual(backend.num_queries, 5)
+        self.assertEqual(len(backend.thread_ids), 3)
+        # The thread pool is reused by the next batches, until the arena is closed
+        executor = backend._candidates_executor
+        arena.run(num_steps=2)
+        self.assertEqual(backend.num_queries, 10)
+        assert backend._candidates_executor is executor
+        arena.close()
+        assert backend._candidates_executor is None
+        self.assertEqual(arena.environment.get_observation()[0].content, "valid")
+        self.assertEqual(arena.to_config()["num_candidates"], 3)
+
+    def test_too_many_invalid_actions(self):
+        arena = self.make_arena(num_candidates=5)
+        with self.assertRaises(chatarena.arena.TooManyInvalidActions):
+            arena.step()
+        # The candidates count as attempts
+        self.assertEqual(arena.players[0].backend.num_queries, 5)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,152 @@
+import os
+import tempfile
+import unittest
+from unittest import TestCase
+
+from chatarena.agent import Player
+from chatarena.arena import Arena
+from chatarena.backends import IntelligenceBackend, register_backend
+from chatarena.checkpoint import read_checkpoint
+from chatarena.environments import (
+    PettingzooChess,
+    PettingzooClassic,
+    PettingzooTicTacToe,
+)
+from chatarena.environments.conversation import Conversation
+
+
+@register_backend
+class SessionBackend(IntelligenceBackend):
+    stateful = True
+    type_name = "test-session"
+    _state_attributes = ("session_id",)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.session_id = None
+
+    def reset(self):
+        self.session_id = None
+
+    def query(self, agent_name, role_desc, history_messages, *args, **kwargs) -> str:
+        self.session_id = f"{agent_name}-{len(history_messages)}"
+        return f"Message {len(history_messages)} from {agent_name}"
+
+    async def async_query(self, *args, **kwargs) -> str:
+        return self.query(*args, **kwargs)
+
+
+class TestArenaCheckpoint(TestCase):
+    def make_arena(self):
+        player_names = ["player1", "player2"]
+        players = [
+            Player(name=name, role_desc="You chat.", backend=SessionBackend())
+            for name in player_names
+        ]
+        return Arena(
+            players=players, environment=Conversation(player_names=player_names)
+        )
+
+    def test_checkpoint_and_restore(self):
+        arena = self.make_arena()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "arena.ckpt")
+            arena.run(num_steps=3)
+            arena.checkpoint(path)
+            full_size = os.path.getsize(path)
+            arena.run(num_steps=1)
+            arena.checkpoint(path)
+
+            # The second checkpoint only appends the new message
+            records = read_checkpoint(path)
+            self.assertEqual([len(r["messages"]) for r in records], [3, 1])
+            self.assertLess(os.path.getsize(path) - full_size, full_size)
+
+            restored = Arena.from_checkpoint(path)
+            self.assertEqual(
+                restored.environment.get_observation(),
+                arena.environment.get_observation(),
+            )
+            self.assertEqual(restored.uuid, arena.uuid)
+            self.assertEqual(restored.environment.get_next_player(), "player1")
+            self.assertEqual(restored.players[1].backend.session_id, "player2-3")
+
+            # Both games continue the same way
+            arena.step()
+            restored.step()
+            self.assertEqual(
+                restored.environment.get_observation()[-1].content,
+                arena.environment.get_observation()[-1].content,
+            )
+
+    def test_reset_writes_full_checkpoint(self):
+        arena = self.make_arena()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "arena.ckpt")
+            arena.run(num_steps=2)
+            arena.checkpoint(path)
+            arena.reset()
+            arena.run(num_steps=1)
+            arena.checkpoint(path)
+            records = read_checkpoint(path)
+            self.assertEqual(len(records), 1)
+            self.assertEqual(len(records[0]["messages"]), 1)
+
+    def test_truncated_frame_is_ignored(self):
+        arena = self.make_arena()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "arena.ckpt")
+            arena.run(num_steps=1)
+            arena.checkpoint(path)
+            arena.run(num_steps=1)
+            arena.checkpoint(path)
+            with open(path, "rb+") as f:
+                f.truncate(os.path.getsize(path) - 3)
+
+            restored = self.make_arena()
+            restored.restore(path)
+            self.assertEqual(len(restored.environment.get_observation()), 1)
+
+
+class TestBoardGameCheckpoint(TestCase):
+    def checkpoint_and_restore(self, env, moves):
+        players = [
+            Player(name=name, role_desc="You play.", backend=SessionBackend())
+            for name in env.player_names
+        ]
+        arena = Arena(players=players, environment=env)
+        for move in moves:
+            env.step(env.get_next_player(), move)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "arena.ckpt")
+            arena.checkpoint(path)
+            restored = Arena.from_checkpoint(path).environment
+        self.assertEqual(restored.get_observation(), env.get_observation())
+        self.assertEqual(restored.get_next_player(), env.get_next_player())
+        self.assertEqual(restored.legal_moves, env.legal_moves)
+        return restored
+
+    def test_chess(self):
+        env = PettingzooChess(player_names=["white", "black"])
+        restored = self.checkpoint_and_restore(env, ["e2e4", "e7e5"])
+        # The board is restored, not only the messages
+        self.assertEqual(restored.board.fen(), env.board.fen())
+        restored.step("white", "Nf3")
+        self.assertIn("Last move: g1f3", restored.get_observation()[-1].content)
+
+    def test_tictactoe(self):
+        env = PettingzooTicTacToe(player_names=["player1", "player2"])
+        restored = self.checkpoint_and_restore(env, ["X: (1, 1)", "O: (2, 2)"])
+        self.assertNotIn("X: (1, 1)", restored.legal_moves)
+
+    def test_classic(self):
+        env = PettingzooClassic(
+            player_names=["player1", "player2"], env_id="connect_four"
+        )
+        moves = [env.legal_moves[0], env.legal_moves[0]]
+        restored = self.checkpoint_and_restore(env, moves)
+        self.assertEqual(restored.env.unwrapped.board, env.env.unwrapped.board)
+
+
+if __name__ == "__main__":
+    unittest.main()
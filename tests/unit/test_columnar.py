@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+from unittest import TestCase
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+
+from chatarena.columnar import (  # noqa: E402
+    ColumnarHistoryWriter,
+    read_history,
+    table_to_messages,
+)
+from chatarena.message import Message, MessagePool  # noqa: E402
+
+
+class TestColumnarHistory(TestCase):
+    def make_pool(self, num_messages):
+        pool = MessagePool()
+        for i in range(num_messages):
+            pool.append_message(
+                Message(
+                    agent_name=f"player{i % 2 + 1}",
+                    content=f"message {i}",
+                    turn=i,
+                    timestamp=i,
+                    visible_to="all" if i % 3 else ["player1"],
+                )
+            )
+        return pool
+
+    def check_format(self, file_name):
+        pool = self.make_pool(5)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, file_name)
+            with ColumnarHistoryWriter(path) as writer:
+                writer.write_pool(pool)
+                writer.write_pool(pool)  # nothing new to export
+                pool.append_message(Message("player1", "last", 5, timestamp=5))
+                writer.write_pool(pool)
+            self.assertEqual(writer.num_rows, 6)
+
+            table = read_history(path)
+            self.assertEqual(table.num_rows, 6)
+            self.assertTrue(
+                pa.types.is_dictionary(table.schema.field("agent_name").type)
+            )
+            self.assertEqual(table_to_messages(table), pool.get_all_messages())
+            self.assertEqual(
+                set(table.column("conversation_id").to_pylist()), {pool.conversation_id}
+            )
+
+    def test_arrow(self):
+        self.check_format("history.arrow")
+
+    def test_parquet(self):
+        self.check_format("history.parquet")
+
+    def test_new_writer_replaces_the_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "history.parquet")
+            for num_messages in [3, 2]:
+                with ColumnarHistoryWriter(path) as writer:
+                    writer.write_pool(self.make_pool(num_messages))
+            self.assertEqual(read_history(path).num_rows, 2)
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            ColumnarHistoryWriter("history.txt")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import copy
+import pickle
+import unittest
+from unittest import TestCase
+
+from chatarena.config import ArenaConfig, Config
+
+
+def make_config(**environment):
+    return ArenaConfig(
+        {
+            "players": [
+                {
+                    "name": "Alice",
+                    "role_desc": "You are Alice.",
+                    "backend": {"backend_type": "openai-chat", "temperature": 0.7},
+                }
+            ],
+            "environment": {"env_type": "conversation", **environment},
+        }
+    )
+
+
+class TestConfigFingerprint(TestCase):
+    def test_canonical(self):
+        config = Config({"b": 1, "a": {"d": [1, 2], "c": "é"}})
+        reordered = Config({"a": {"c": "é", "d": [1, 2]}, "b": 1})
+        self.assertEqual(config.to_canonical_json(), '{"a":{"c":"é","d":[1,2]},"b":1}')
+        self.assertEqual(config.fingerprint(), reordered.fingerprint())
+        self.assertNotEqual(config.fingerprint(), Config(b=2).fingerprint())
+
+    def test_invalidated_on_mutation(self):
+        config = make_config()
+        fingerprint = config.fingerprint()
+        self.assertEqual(config.fingerprint(), fingerprint)
+
+        # Nested configs, including the configs in lists, invalidate their parents
+        config.players[0].backend["temperature"] = 0.2
+        self.assertNotEqual(config.fingerprint(), fingerprint)
+        config.players[0].backend.temperature = 0.7
+        self.assertEqual(config.fingerprint(), fingerprint)
+
+        config.environment.update(parallel=True)
+        self.assertEqual(config.fingerprint(), make_config(parallel=True).fingerprint())
+        del config.environment["parallel"]
+        self.assertEqual(config.fingerprint(), fingerprint)
+        config.environment.pop("env_type")
+        self.assertNotEqual(config.fingerprint(), fingerprint)
+
+    def test_copies(self):
+        config = make_config()
+        fingerprint = config.fingerprint()
+        for copied in [
+            config.deepcopy(),
+            copy.deepcopy(config),
+            pickle.loads(pickle.dumps(config)),
+        ]:
+            self.assertEqual(copied.fingerprint(), fingerprint)
+            # The copies are independent
+            copied.environment["env_type"] = "chameleon"
+            self.assertNotEqual(copied.fingerprint(), fingerprint)
+            self.assertEqual(config.fingerprint(), fingerprint)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,212 @@
+import unittest
+from unittest import TestCase
+
+from chatarena.agent import Player
+from chatarena.arena import Arena
+from chatarena.config import BackendConfig
+from chatarena.database import BatchedDBWriter, SQLiteDB, log_arena, log_messages
+from chatarena.environments.conversation import Conversation
+from chatarena.message import Message
+
+
+class FlakyDB(SQLiteDB):
+    """Fails the first inserts, then forwards to SQLite."""
+
+    def __init__(self, num_failures):
+        super().__init__()
+        self.num_failures = num_failures
+        self.num_inserts = 0
+
+    def insert_rows(self, table, rows):
+        self.num_inserts += 1
+        if self.num_failures > 0:
+            self.num_failures -= 1
+            raise ConnectionError("network is down")
+        super().insert_rows(table, rows)
+
+
+def make_arena():
+    player_names = ["player1", "player2"]
+    players = [
+        Player(
+            name=name,
+            role_desc="You chat.",
+            backend=BackendConfig(backend_type="human"),
+        )
+        for name in player_names
+    ]
+    return Arena(players=players, environment=Conversation(player_names=player_names))
+
+
+def add_messages(arena, num_messages):
+    messages = []
+    for i in range(num_messages):
+        message = Message("player1", f"message {i}", i, timestamp=i)
+        arena.environment.message_pool.append_message(message)
+        messages.append(message)
+    return messages
+
+
+class TestSQLiteDB(TestCase):
+    def test_save_arena(self):
+        db = SQLiteDB()
+        arena = make_arena()
+        add_messages(arena, 3)
+        log_arena(arena, database=db)
+        self.assertEqual(db.query('SELECT COUNT(*) FROM "Player"'), [(2,)])
+        self.assertEqual(db.query('SELECT COUNT(*) FROM "Message"'), [(3,)])
+
+        # Saving again is idempotent, and logged messages are skipped
+        log_arena(arena, database=db)
+        for message in arena.environment.get_observation():
+            message.logged = False
+        log_messages(arena, None, database=db)
+        self.assertEqual(db.query('SELECT COUNT(*) FROM "Arena"'), [(1,)])
+        self.assertEqual(db.query('SELECT COUNT(*) FROM "Message"'), [(3,)])
+
+    def test_messages_logged_after_insert(self):
+        db = FlakyDB(num_failures=1)
+        arena = make_arena()
+        messages = add_messages(arena, 2)
+        with self.assertRaises(ConnectionError):
+            db.save_messages(arena)
+        assert not any(message.logged for message in messages)
+        db.save_messages(arena)
+        assert all(message.logged for message in messages)
+        self.assertEqual(db.query('SELECT COUNT(*) FROM "Message"'), [(2,)])
+
+    def test_indexes(self):
+        db = SQLiteDB()
+        plan = db.query(
+            'EXPLAIN QUERY PLAN SELECT * FROM "Message" WHERE arena_id = ? AND turn = ?',
+            ("a", 0),
+        )
+        self.assertIn("message_arena_turn", str(plan))
+
+    def test_ingest_and_analytics(self):
+        db = SQLiteDB()
+        games = []
+        for rewards in [
+            {"player1": 1, "player2": 0},
+            {"player1": 1, "player2": 0},
+            {"player1": 0, "player2": 1},
+            {"player1": 0, "player2": 0},  # tie
+        ]:
+            arena = make_arena()
+            add_messages(arena, 2)
+            games.append((arena, rewards))
+        db.ingest(games)
+        self.assertEqual(db.query('SELECT COUNT(*) FROM "Arena"'), [(4,)])
+        self.assertEqual(db.query('SELECT COUNT(*) FROM "Reward"'), [(8,)])
+        # Ingesting again is idempotent
+        db.ingest(games)
+        self.assertEqual(db.query('SELECT COUNT(*) FROM "Message"'), [(8,)])
+
+        win_rates = {r["group"]: r for r in db.win_rates(group_by="name")}
+        self.assertEqual(win_rates["player1"]["games"], 4)
+        self.assertEqual(win_rates["player1"]["wins"], 2)
+        self.assertAlmostEqual(win_rates["player2"]["win_rate"], 0.25)
+        # The last two games only
+        win_rates = {r["group"]: r for r in db.win_rates(group_by="name", last_n=2)}
+        self.assertEqual(win_rates["player1"]["wins"], 0)
+        self.assertEqual(win_rates["player2"]["wins"], 1)
+        # One config per player, shared across the games
+        self.assertEqual(len(db.win_rates()), 2)
+        self.assertEqual(db.win_rates(env_type="chess"), [])
+
+        self.assertEqual(db.average_turns(), 2)
+        self.assertEqual(db.tokens_per_game(), 4)
+
+
+class TestBatchedDBWriter(TestCase):
+    def test_coalesces_rows(self):
+        db = FlakyDB(num_failures=0)
+        writer = BatchedDBWriter(db, batch_size=1000, flush_interval=60)
+        arena = make_arena()
+        for message in add_messages(arena, 5):
+            log_messages(arena, [message], database=writer)
+        writer.flush()
+        # One bulk insert for the five messages
+        self.assertEqual(db.num_inserts, 1)
+        self.assertEqual(db.query('SELECT COUNT(*) FROM "Message"'), [(5,)])
+        writer.close()
+
+    def test_writes_rewards(self):
+        db = SQLiteDB()
+        writer = BatchedDBWriter(db, flush_interval=60)
+        arena = make_arena()
+        writer.save_arena(arena)
+        writer.save_rewards(arena, {"player1": 1, "player2": 0})
+        writer.flush()
+        self.assertEqual(db.query('SELECT COUNT(*) FROM "Reward"'), [(2,)])
+        writer.close()
+
+    def test_win_rates_by_config(self):
+        db = SQLiteDB()
+        writer = BatchedDBWriter(db, flush_interval=60)
+        for rewards in [{"player1": 1, "player2": 0}, {"player1": 0, "player2": 0}]:
+            arena = make_arena()
+            writer.save_arena(arena)
+            writer.save_rewards(arena, rewards)
+        writer.close()
+        self.assertEqual(
+            db.query('SELECT COUNT(*) FROM "Player" WHERE config_id IS NULL'), [(0,)]
+        )
+        # One group per player config, not a single group of unknown configs
+        win_rates = db.win_rates()
+        self.assertEqual(len(win_rates), 2)
+        self.assertEqual([r["wins"] for r in win_rates], [1, 0])
+
+    def test_flush_on_size_and_time(self):
+        db = FlakyDB(num_failures=0)
+        writer = BatchedDBWriter(db, batch_size=2, flush_interval=0.01)
+        arena = make_arena()
+        log_messages(arena, add_messages(arena, 3), database=writer)
+        writer.close()
+        self.assertEqual(db.query('SELECT COUNT(*) FROM "Message"'), [(3,)])
+
+    def test_retries(self):
+        db = FlakyDB(num_failures=2)
+        writer = BatchedDBWriter(db, retry_delay=0.001)
+        arena = make_arena()
+        add_messages(arena, 2)
+        log_arena(arena, database=writer)
+        writer.close()
+        self.assertEqual(writer.failed_rows, {})
+        self.assertEqual(db.query('SELECT COUNT(*) FROM "Message"'), [(2,)])
+
+    def test_gives_up_after_max_retries(self):
+        db = FlakyDB(num_failures=10)
+        writer = BatchedDBWriter(db, max_retries=1, retry_delay=0.001)
+        arena = make_arena()
+        log_messages(arena, add_messages(arena, 2), database=writer)
+        writer.close()
+        self.assertEqual(len(writer.failed_rows["Message"]), 2)
+
+    def test_failed_messages_are_retried_later(self):
+        db = FlakyDB(num_failures=2)
+        writer = BatchedDBWriter(db, max_retries=1, retry_delay=0.001)
+        arena = make_arena()
+        messages = add_messages(arena, 2)
+        writer.save_messages(arena)
+        # The messages are queued once, until they are written
+        writer.save_messages(arena)
+        writer.flush()
+        self.assertEqual(len(writer.failed_rows["Message"]), 2)
+        assert not any(message.logged for message in messages)
+
+        writer.save_arena(arena)
+        writer.flush()
+        assert all(message.logged for message in messages)
+        self.assertEqual(db.query('SELECT COUNT(*) FROM "Message"'), [(2,)])
+        writer.close()
+
+    def test_flush_after_close(self):
+        writer = BatchedDBWriter(SQLiteDB())
+        writer.close()
+        with self.assertRaises(ValueError):
+            writer.flush()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,16 +1,47 @@
+import threading
 import unittest
-from unittest import TestCase
+from unittest import TestCase, mock
 
+import chess
+import numpy as np
+
+from chatarena.agent import Moderator
+from chatarena.backends import IntelligenceBackend
 from chatarena.config import AgentConfig, BackendConfig, EnvironmentConfig
 from chatarena.environments import (
     Chameleon,
     Environment,
     ModeratedConversation,
     PettingzooChess,
+    PettingzooClassic,
     PettingzooTicTacToe,
+    TextRenderer,
     load_environment,
     register_env,
+    register_renderer,
 )
+from chatarena.environments.pettingzoo_classic import VectorRenderer
+
+
+class ScriptedBackend(IntelligenceBackend):
+    stateful = False
+    type_name = "test-scripted"
+
+    def __init__(self, responses, barrier=None, **kwargs):
+        super().__init__(**kwargs)
+        self.responses = list(responses)
+        self.requests = []
+        self.barrier = barrier
+
+    def query(self, agent_name, role_desc, history_messages, *args, **kwargs) -> str:
+        request_msg = kwargs.get("request_msg")
+        self.requests.append(request_msg.content if request_msg else None)
+        if self.barrier is not None:
+            self.barrier.wait()
+        return self.responses.pop(0)
+
+    async def async_query(self, *args, **kwargs) -> str:
+        return self.query(*args, **kwargs)
 
 
 class TestEnvironments(TestCase):
@@ -52,6 +83,49 @@ class TestTicTacToeEnvironment(TestCase):
             env.step(env.get_next_player(), move)
             assert not env.is_terminal()
 
+    def test_simultaneous_step_is_turn_based(self):
+        env = load_environment(self.config())
+        env.reset()
+        # The moves are applied in the order of a turn-based game
+        env.step_simultaneous({"player2": "O: (2, 2)", "player1": "X: (1, 1)"})
+        self.assertEqual(env.turn, 2)
+        self.assertEqual(env.get_next_player(), "player1")
+        with self.assertRaises(ValueError):
+            env.step_simultaneous({"player2": "O: (1, 2)"})
+
+    def test_legal_moves(self):
+        env = load_environment(self.config())
+        env.reset()
+        self.assertEqual(len(env.legal_moves), 9)
+        env.step("player1", "X: (1, 1)")
+        self.assertEqual(len(env.legal_moves), 8)
+        self.assertIn("O: (2, 2)", env.legal_moves)
+        self.assertNotIn("O: (1, 1)", env.legal_moves)
+        assert not env.check_action("O: (1, 1)", "player2")
+        assert not env.check_action("O: (4, 1)", "player2")
+
+    def test_parse_once(self):
+        env = load_environment(self.config())
+        env.reset()
+        assert env.check_action("X: (2, 2)", "player1")
+        self.assertEqual(env._parsed_actions, {"X: (2, 2)": 4})
+        env.step("player1", "X: (2, 2)")
+        # The cache is cleared when the position changes
+        self.assertEqual(env._parsed_actions, {})
+        assert not env.check_action("O: (2, 2)", "player2")
+
+    def test_invalid_action_feedback(self):
+        env = PettingzooTicTacToe(
+            player_names=["player1", "player2"], show_legal_moves=True
+        )
+        env.step("player1", "X: (1, 1)")
+        assert env.get_observation()[-1].content.endswith(
+            "Legal moves: " + ", ".join(env.legal_moves)
+        )
+        feedback = env.get_invalid_action_feedback(["O: (1, 1)"], "player2")
+        self.assertIn("O: (1, 1)", feedback)
+        self.assertIn("The legal moves are: O: (2, 1), O: (3, 1)", feedback)
+
 
 class TestChameleonEnvironment(TestCase):
     def test_registration_and_loading(self):
@@ -70,6 +144,21 @@ class TestConversationEnvironment(TestCase):
         env = load_environment(config)
         assert isinstance(env, Environment)
 
+    def test_simultaneous_step(self):
+        config = EnvironmentConfig(
+            env_type="conversation", player_names=["player1", "player2"]
+        )
+        env = load_environment(config)
+        env.reset()
+        timestep = env.step_simultaneous({"player2": "paper", "player1": "rock"})
+        self.assertEqual([m.turn for m in timestep.observation], [0, 0])
+        self.assertEqual(
+            [m.agent_name for m in timestep.observation], ["player1", "player2"]
+        )
+        # Neither player saw the other's move, and both see them now
+        self.assertEqual(len(env.get_observation("player1")), 2)
+        self.assertEqual(env.get_next_player(), "player1")
+
 
 class TestModeratedConversationEnvironment(TestCase):
     def test_registration_and_loading(self):
@@ -86,6 +175,95 @@ class TestModeratedConversationEnvironment(TestCase):
         env = load_environment(config)
         assert isinstance(env, ModeratedConversation)
 
+    def make_env(self, responses, barrier=None, **kwargs):
+        backend = ScriptedBackend(responses, barrier=barrier)
+        moderator = Moderator(
+            role_desc="moderator", backend=backend, terminal_condition="Is it over?"
+        )
+        env = ModeratedConversation(
+            player_names=["player1", "player2"], moderator=moderator, **kwargs
+        )
+        env.reset()
+        return env, backend
+
+    def test_sequential_moderator(self):
+        env, backend = self.make_env(["Go on.", "no", "The end.", "yes"])
+        assert not env.step("player1", "hello").terminal
+        assert env.step("player2", "bye").terminal
+        assert len(backend.requests) == 4
+
+    def test_fused_moderator(self):
+        env, backend = self.make_env(
+            ["Go on.\nTERMINAL: no", "The end.\nTERMINAL: yes"],
+            fused_moderator=True,
+        )
+        assert not env.step("player1", "hello").terminal
+        assert env.step("player2", "bye").terminal
+        assert len(backend.requests) == 2
+        moderator_messages = [
+            m.content
+            for m in env.get_observation()
+            if m.agent_name == env.moderator.name
+        ]
+        assert moderator_messages == ["Go on.", "The end."]
+
+    def test_pipelined_moderator(self):
+        env, backend = self.make_env(
+            ["Go on.\nTERMINAL: no", "The end.\nTERMINAL: yes"],
+            fused_moderator=True,
+            pipeline_moderator=True,
+            moderator_visibility=[],
+        )
+        assert not env.step("player1", "hello").terminal
+        assert not env.step("player2", "bye").terminal
+        # The pending decision ends the game before the next action is recorded
+        assert env.step("player1", "one more").terminal
+        contents = [m.content for m in env.get_observation()]
+        assert contents == ["hello", "Go on.", "bye", "The end."]
+        assert env.to_config()["pipeline_moderator"]
+
+    def test_pipelined_moderator_overlaps_next_player(self):
+        # The moderator call only returns once the test thread, standing for the next player, reaches the barrier
+        barrier = threading.Barrier(2, timeout=10)
+        env, backend = self.make_env(
+            ["Go on.\nTERMINAL: no"] * 2,
+            barrier=barrier,
+            fused_moderator=True,
+            pipeline_moderator=True,
+            moderator_visibility=[],
+        )
+        timestep = env.step("player1", "hello")
+        assert not timestep.terminal
+        assert [m.content for m in timestep.observation] == ["hello"]
+        assert not env._pending_moderator.done()
+        # The next player does not see the moderator, so observing does not wait for it
+        assert len(env.get_observation("player2")) == 1
+        barrier.wait()
+        assert not env.step("player2", "bye").terminal
+        barrier.wait()
+        contents = [m.content for m in env.get_observation()]
+        assert contents == ["hello", "Go on.", "bye", "Go on."]
+        env.close()
+
+    def test_pipelined_moderator_thread_is_released(self):
+        env, backend = self.make_env(
+            ["Go on.\nTERMINAL: no"] * 3,
+            fused_moderator=True,
+            pipeline_moderator=True,
+            moderator_visibility=[],
+        )
+        env.step("player1", "hello")
+        executor = env._executor
+        assert executor is not None
+        env.reset()
+        assert env._executor is None
+        # A shut down executor refuses new work
+        with self.assertRaises(RuntimeError):
+            executor.submit(print)
+        env.step("player1", "hello")
+        env.close()
+        assert env._executor is None and env._pending_moderator is None
+
 
 class TestPettingzooChessEnvironment(TestCase):
     def test_registration_and_loading(self):
@@ -95,6 +273,188 @@ class TestPettingzooChessEnvironment(TestCase):
         env = load_environment(config)
         assert isinstance(env, PettingzooChess)
 
+    def test_legal_moves(self):
+        env = PettingzooChess(player_names=["player1", "player2"])
+        self.assertEqual(len(env.legal_moves), 20)
+        self.assertIn("e2e4", env.legal_moves)
+        assert not env.check_action("Move (4, 1) to (4, 4)", "player1")
+        assert not env.check_action("e2e5", "player1")
+        env = PettingzooChess(
+            player_names=["player1", "player2"], notation="coordinates"
+        )
+        self.assertIn("Move (4, 1) to (4, 3)", env.legal_moves)
+        env = PettingzooChess(player_names=["player1", "player2"], notation="san")
+        self.assertIn("Nf3", env.legal_moves)
+
+    def test_san_computed_once_per_position(self):
+        env = PettingzooChess(player_names=["player1", "player2"], notation="san")
+        with mock.patch.object(
+            chess.Board, "san", autospec=True, side_effect=chess.Board.san
+        ) as san:
+            legal_moves = env.legal_moves
+            self.assertEqual(env.legal_moves, legal_moves)
+            assert env.check_action("Nf3", "player1")
+            self.assertEqual(san.call_count, 20)
+
+    def test_notations(self):
+        env = PettingzooChess(player_names=["player1", "player2"])
+        board = env.env.unwrapped.board
+        # 1. e4 d5 2. exd5 Qxd5 3. Nc3 Qa5+ 4. Bc4 Nf6 5. Nf3 Bg4 6. O-O
+        moves = ["e2e4", "d5", "exd5", "Qxd5 <EOS>", "Nc3", "d5a5", "Bc4", "Nf6"]
+        moves += ["Move (6, 0) to (5, 2)", "Bg4", "0-0"]
+        for move in moves:
+            assert env.check_action(move, env.get_next_player()), move
+            env.step(env.get_next_player(), move)
+        self.assertEqual(board.move_stack[-1].uci(), "e1g1")
+        assert not env.check_action("O-O", "player2")
+        # The observations are the FEN and the last move
+        self.assertEqual(
+            env.get_observation()[-1].content,
+            f"FEN: {board.fen()}\nLast move: e1g1",
+        )
+        self.assertEqual(env.render(), str(board))
+
+    def test_promotions(self):
+        env = PettingzooChess(player_names=["player1", "player2"])
+        board = env.env.unwrapped.board
+        board.set_fen("8/1P5k/7p/8/8/8/8/K7 w - - 0 1")
+        env._new_position()
+        # The coordinates stand for the queen promotion
+        self.assertEqual(env.parse_action("Move (1, 6) to (1, 7)").uci(), "b7b8q")
+        timestep = env.step("player1", "b7b8n")
+        self.assertEqual(board.move_stack[-1].uci(), "b7b8n")
+        assert not timestep.terminal
+
+    def test_end_of_game(self):
+        env = PettingzooChess(player_names=["player1", "player2"])
+        # Fool's mate
+        for move in ["f3", "e5", "g4"]:
+            assert not env.step(env.get_next_player(), move).terminal
+        timestep = env.step("player2", "Qh4#")
+        assert timestep.terminal
+        self.assertEqual(timestep.reward, {"player1": -1.0, "player2": 1.0})
+
+    def test_black_moves_use_board_coordinates(self):
+        env = PettingzooChess(player_names=["player1", "player2"])
+        board = env.env.unwrapped.board
+        # 1. e4 e5 2. Nf3 Nc6
+        moves = [
+            "Move (4, 1) to (4, 3)",
+            "Move (4, 6) to (4, 4)",
+            "Move (6, 0) to (5, 2)",
+            "Move (1, 7) to (2, 5)",
+        ]
+        for move in moves:
+            assert env.check_action(move, env.get_next_player())
+            env.step(env.get_next_player(), move)
+        self.assertEqual(
+            [move.uci() for move in board.move_stack], ["e2e4", "e7e5", "g1f3", "b8c6"]
+        )
+
+    def test_parse_once(self):
+        env = PettingzooChess(player_names=["player1", "player2"])
+        assert env.check_action("Move (4, 1) to (4, 3)", "player1")
+        self.assertEqual(list(env._parsed_actions), ["Move (4, 1) to (4, 3)"])
+        env.step("player1", "Move (4, 1) to (4, 3)")
+        self.assertEqual(env._parsed_actions, {})
+        self.assertEqual(len(env.legal_moves), 20)
+
+    def test_invalid_action_feedback(self):
+        env = PettingzooChess(
+            player_names=["player1", "player2"], show_legal_moves=True
+        )
+        feedback = env.get_invalid_action_feedback(["Move (4, 1) to (4, 4)"], "player1")
+        self.assertIn("The legal moves are: ", feedback)
+        self.assertIn("g1f3", feedback)
+        env.step("player1", "Move (4, 1) to (4, 3)")
+        self.assertIn("Legal moves: ", env.get_observation()[-1].content)
+
+
+class TestPettingzooClassicEnvironment(TestCase):
+    def make_env(self, env_type="pettingzoo:connect_four", **kwargs):
+        config = EnvironmentConfig(
+            env_type=env_type, player_names=["player1", "player2"], **kwargs
+        )
+        return load_environment(config)
+
+    def test_registration_and_loading(self):
+        env = self.make_env()
+        assert isinstance(env, PettingzooClassic)
+        self.assertEqual(env.to_config()["env_type"], "pettingzoo:connect_four")
+        # The hand-written environments take precedence
+        assert isinstance(self.make_env("pettingzoo:tictactoe"), PettingzooTicTacToe)
+        with self.assertRaises(ValueError):
+            self.make_env("pettingzoo:not_a_game")
+        with self.assertRaises(ValueError):
+            self.make_env("pettingzoo")
+
+    def test_game(self):
+        env = self.make_env("pettingzoo:connect_four_v3")
+        self.assertEqual(env.legal_moves[0], "Column 1")
+        # The observations are only seen by the player to move
+        self.assertEqual(len(env.get_observation("player1")), 1)
+        self.assertEqual(len(env.get_observation("player2")), 0)
+        moves = ["Column 1", "Column 2"] * 3 + ["Column 1"]
+        for move in moves:
+            assert env.check_action(move, env.get_next_player())
+            timestep = env.step(env.get_next_player(), move)
+        assert timestep.terminal
+        self.assertEqual(timestep.reward, {"player1": 1.0, "player2": -1.0})
+        # The pieces of the observing player are shown as "X"
+        last_board = [
+            m.content
+            for m in env.get_observation("player2")
+            if m.agent_name == "Moderator"
+        ][-1]
+        self.assertIn("| O | X | _ | _ | _ | _ | _ |", last_board)
+
+    def test_parse_action(self):
+        env = self.make_env()
+        self.assertEqual(env.parse_action("Column 4"), 3)
+        self.assertEqual(env.parse_action("3"), 3)
+        self.assertIsNone(env.parse_action("Column 8"))
+        self.assertIsNone(env.parse_action("7"))
+        for _ in range(6):
+            env.step(env.get_next_player(), "Column 1")
+        self.assertEqual(env._parsed_actions, {})
+        assert not env.check_action("Column 1", env.get_next_player())
+        self.assertIn(
+            "The legal moves are: Column 2",
+            env.get_invalid_action_feedback(["Column 1"], env.get_next_player()),
+        )
+
+    def test_render_cache(self):
+        env = self.make_env()
+        env.reset()
+        renderer = env.renderer
+        num_hits = renderer.num_hits
+        env.reset()
+        # The empty board was rendered before
+        self.assertEqual(renderer.num_hits, num_hits + 1)
+
+    def test_render_cache_key_includes_dtype(self):
+        renderer = VectorRenderer()
+        observation = np.array([-1, 0], dtype=np.int8)
+        # The same bytes and shape, read with another dtype
+        self.assertEqual(renderer.render(observation), "Observation features: 0=-1")
+        self.assertEqual(
+            renderer.render(observation.view(np.uint8)), "Observation features: 0=255"
+        )
+        self.assertEqual(renderer.num_misses, 2)
+
+    def test_custom_renderer(self):
+        @register_renderer
+        class CountRenderer(TextRenderer):
+            name = "test-count"
+
+            def render_observation(self, observation):
+                return f"{int(observation.sum())} pieces"
+
+        env = self.make_env(renderer="test-count", show_legal_moves=False)
+        env.step("player1", "0")
+        self.assertEqual(env.get_observation("player2")[-1].content, "\n1 pieces")
+        self.assertEqual(env.legal_moves[0], "Action 0")
+
 
 if __name__ == "__main__":
     unittest.main()
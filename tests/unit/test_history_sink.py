@@ -0,0 +1,110 @@
+import os
+import tempfile
+import unittest
+from unittest import TestCase
+
+from chatarena.agent import Player
+from chatarena.arena import Arena
+from chatarena.backends import IntelligenceBackend
+from chatarena.environments.conversation import Conversation
+from chatarena.message import Message
+from chatarena.writers import (
+    JSONLHistorySink,
+    is_zstandard_available,
+    read_jsonl_history,
+)
+
+
+class EchoBackend(IntelligenceBackend):
+    stateful = False
+    type_name = "test-echo"
+
+    def query(self, agent_name, *args, **kwargs) -> str:
+        return f"Hello from {agent_name}"
+
+    async def async_query(self, *args, **kwargs) -> str:
+        return self.query(*args, **kwargs)
+
+
+class TestJSONLHistorySink(TestCase):
+    def check_compression(self, compression):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "history.jsonl")
+            sink = JSONLHistorySink(path, compression=compression, flush_every=2)
+            for i in range(3):
+                sink.write(Message("player1", f"message {i}", i, timestamp=i), run=1)
+            # Flushed in complete batches only, and readable before the sink is closed
+            self.assertEqual(len(read_jsonl_history(path, compression)), 2)
+            sink.close()
+
+            # Appending from a new sink keeps the previous messages
+            with JSONLHistorySink(path, compression=compression) as sink:
+                sink.write(Message("player2", "message 3", 3, timestamp=3), run=2)
+            records = read_jsonl_history(path, compression)
+            self.assertEqual(
+                [r["content"] for r in records], [f"message {i}" for i in range(4)]
+            )
+            self.assertEqual(records[-1]["run"], 2)
+
+    def test_uncompressed(self):
+        self.check_compression(None)
+
+    def test_gzip(self):
+        self.check_compression("gzip")
+
+    @unittest.skipIf(not is_zstandard_available, "zstandard is not installed")
+    def test_zstd(self):
+        self.check_compression("zstd")
+
+    def test_truncated_line_is_skipped(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "history.jsonl")
+            with JSONLHistorySink(path) as sink:
+                sink.write(Message("player1", "complete", 0))
+            with open(path, "a") as f:
+                f.write('{"agent_name": "player2", "cont')
+            self.assertEqual(len(read_jsonl_history(path)), 1)
+
+    def test_truncated_gzip_member_is_skipped(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "history.jsonl.gz")
+            with JSONLHistorySink(path, compression="gzip") as sink:
+                sink.write(Message("player1", "complete", 0))
+            with open(path, "rb") as f:
+                member = f.read()
+            with open(path, "ab") as f:
+                f.write(member[: len(member) // 2])
+            self.assertEqual(len(read_jsonl_history(path, "gzip")), 1)
+
+
+class TestArenaHistorySink(TestCase):
+    def test_stream_history(self):
+        player_names = ["player1", "player2"]
+        players = [
+            Player(name=name, role_desc="You chat.", backend=EchoBackend())
+            for name in player_names
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "history.jsonl")
+            sink = JSONLHistorySink(path, flush_every=1)
+            arena = Arena(
+                players=players,
+                environment=Conversation(player_names=player_names),
+                history_sink=sink,
+            )
+            arena.run(num_steps=3)
+            first_id = str(arena.uuid)
+            arena.reset()
+            arena.run(num_steps=1)
+            sink.close()
+
+            records = read_jsonl_history(path)
+            self.assertEqual(len(records), 4)
+            self.assertEqual(records[2]["content"], "Hello from player1")
+            self.assertEqual(
+                [r["arena_id"] == first_id for r in records], [True] * 3 + [False]
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
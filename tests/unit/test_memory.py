@@ -0,0 +1,141 @@
+import unittest
+from unittest import TestCase
+
+import tenacity
+
+from chatarena.agent import Moderator, Player
+from chatarena.backends import IntelligenceBackend
+from chatarena.config import AgentConfig, BackendConfig
+from chatarena.memory import SUMMARY_PREFIX, RollingSummaryMemory
+from chatarena.message import SYSTEM_NAME, Message
+
+
+class CountingBackend(IntelligenceBackend):
+    stateful = False
+    type_name = "test-counting"
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.queries = []
+        self.num_failures = 0
+
+    def query(self, agent_name, role_desc, history_messages, *args, **kwargs) -> str:
+        self.queries.append(list(history_messages))
+        if self.num_failures > 0:
+            self.num_failures -= 1
+            attempt = tenacity.Future(1)
+            attempt.set_exception(ConnectionError("network is down"))
+            raise tenacity.RetryError(attempt)
+        return f"summary #{len(self.queries)}"
+
+    async def async_query(self, *args, **kwargs) -> str:
+        return self.query(*args, **kwargs)
+
+
+def make_messages(n):
+    return [Message(f"player{i % 2}", f"message {i}", turn=i) for i in range(n)]
+
+
+class TestRollingSummaryMemory(TestCase):
+    def test_short_history_is_untouched(self):
+        backend = CountingBackend()
+        memory = RollingSummaryMemory(window=4, update_every=2, backend=backend)
+        messages = make_messages(5)
+        self.assertEqual(memory.compress(messages, "player0"), messages)
+        self.assertEqual(len(backend.queries), 0)
+
+    def test_window_and_incremental_updates(self):
+        backend = CountingBackend()
+        memory = RollingSummaryMemory(window=4, update_every=2, backend=backend)
+        messages = make_messages(10)
+
+        compressed = memory.compress(messages[:6], "player0")
+        self.assertEqual(len(compressed), 5)
+        self.assertEqual(compressed[0].agent_name, SYSTEM_NAME)
+        self.assertTrue(compressed[0].content.startswith(SUMMARY_PREFIX))
+        self.assertEqual(compressed[1:], messages[2:6])
+        self.assertEqual(len(backend.queries[0]), 2)
+
+        # The boundary only moves every two messages
+        compressed = memory.compress(messages[:7], "player0")
+        self.assertEqual(len(backend.queries), 1)
+        self.assertEqual(compressed[1:], messages[2:7])
+
+        # The update only sends the previous summary and the newly folded messages
+        compressed = memory.compress(messages[:8], "player0")
+        self.assertEqual(len(backend.queries), 2)
+        self.assertEqual(len(backend.queries[1]), 3)
+        self.assertIn("summary #1", backend.queries[1][0].content)
+        self.assertIn("summary #2", compressed[0].content)
+        self.assertEqual(compressed[1:], messages[4:8])
+
+    def test_summary_is_cached_by_prefix(self):
+        backend = CountingBackend()
+        memory = RollingSummaryMemory(window=2, update_every=2, backend=backend)
+        messages = make_messages(4)
+        memory.compress(messages, "player0")
+        memory.compress(messages, "player0")
+        self.assertEqual(len(backend.queries), 1)
+
+    def test_failed_summary_is_retried(self):
+        backend = CountingBackend()
+        memory = RollingSummaryMemory(window=2, update_every=2, backend=backend)
+        messages = make_messages(6)
+        memory.compress(messages[:4], "player0")
+
+        # The messages that could not be summarized are kept after the previous summary
+        backend.num_failures = 1
+        compressed = memory.compress(messages, "player0")
+        self.assertIn("summary #1", compressed[0].content)
+        self.assertEqual(compressed[1:], messages[2:])
+
+        # They are summarized by the next call
+        compressed = memory.compress(messages, "player0")
+        self.assertEqual(len(backend.queries), 3)
+        self.assertIn("summary #3", compressed[0].content)
+        self.assertEqual(compressed[1:], messages[4:])
+
+    def test_cache_is_bounded(self):
+        backend = CountingBackend()
+        memory = RollingSummaryMemory(
+            window=1, update_every=1, backend=backend, cache_size=2
+        )
+        messages = make_messages(10)
+        for n in range(2, len(messages) + 1):
+            memory.compress(messages[:n], "player0")
+        self.assertEqual(len(memory._summary_cache), 2)
+        # Each update still starts from the previous summary
+        self.assertTrue(all(len(query) <= 2 for query in backend.queries))
+
+    def test_player_uses_memory(self):
+        backend = CountingBackend()
+        player = Player(
+            name="player0",
+            role_desc="test",
+            backend=backend,
+            memory=RollingSummaryMemory(window=2, update_every=1),
+        )
+        player(make_messages(4))
+        # One query for the summary, one for the response
+        self.assertEqual(len(backend.queries), 2)
+        self.assertEqual(len(backend.queries[1]), 3)
+
+        config = player.to_config()
+        self.assertIsInstance(config, AgentConfig)
+        self.assertEqual(config.memory.window, 2)
+        self.assertEqual(config.memory.update_every, 1)
+
+    def test_moderator_config_keeps_memory(self):
+        moderator = Moderator(
+            role_desc="moderator",
+            backend=BackendConfig(backend_type="human"),
+            terminal_condition="Is it over?",
+            memory=RollingSummaryMemory(window=3),
+        )
+        config = moderator.to_config()
+        self.assertEqual(config.memory.window, 3)
+        self.assertEqual(Moderator.from_config(config).memory.window, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+from unittest import TestCase
+
+from chatarena.agent import Player
+from chatarena.arena import Arena
+from chatarena.config import BackendConfig
+from chatarena.environments.conversation import Conversation
+from chatarena.pettingzoo_compatibility import PettingZooParallelCompatibilityV0
+
+
+class TestParallelCompatibility(TestCase):
+    def make_env(self, **kwargs):
+        player_names = ["player1", "player2"]
+        players = [
+            Player(
+                name=name,
+                role_desc="You play rock-paper-scissors.",
+                backend=BackendConfig(backend_type="human"),
+            )
+            for name in player_names
+        ]
+        arena = Arena(
+            players=players,
+            environment=Conversation(player_names=player_names, parallel=True),
+        )
+        return PettingZooParallelCompatibilityV0(env=arena, **kwargs)
+
+    def test_simultaneous_moves(self):
+        env = self.make_env(string_observation=False, max_turns=2)
+        observations, infos = env.reset()
+        self.assertEqual(set(observations), {"player1", "player2"})
+
+        observations, rewards, terminations, truncations, infos = env.step(
+            {"player1": "rock", "player2": "paper"}
+        )
+        for agent in ["player1", "player2"]:
+            self.assertEqual(
+                observations[agent], {"player1": "rock", "player2": "paper"}
+            )
+            self.assertEqual(infos[agent]["turn"], 0)
+        self.assertFalse(any(terminations.values()) or any(truncations.values()))
+
+        observations, rewards, terminations, truncations, infos = env.step(
+            {"player1": "scissors", "player2": "scissors"}
+        )
+        self.assertEqual(
+            observations["player1"], {"player1": "scissors", "player2": "scissors"}
+        )
+        self.assertTrue(all(truncations.values()))
+        self.assertEqual(env.agents, [])
+
+    def test_string_observation(self):
+        env = self.make_env()
+        env.reset()
+        observations = env.step({"player1": "rock", "player2": "paper"})[0]
+        self.assertEqual(observations["player2"], "player1: rockplayer2: paper")
+
+
+if __name__ == "__main__":
+    unittest.main()
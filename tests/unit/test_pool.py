@@ -0,0 +1,96 @@
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase, mock
+
+from chatarena.arena import Arena
+from chatarena.config import ArenaConfig
+from chatarena.pool import ArenaPool
+
+
+def make_config(player_names=("Alice", "Bob")):
+    return ArenaConfig(
+        players=[
+            {
+                "name": name,
+                "role_desc": "You chat.",
+                "backend": {"backend_type": "human"},
+            }
+            for name in player_names
+        ],
+        environment={"env_type": "conversation"},
+    )
+
+
+class TestArenaPool(TestCase):
+    def test_reuse(self):
+        pool = ArenaPool()
+        config = make_config()
+        fingerprint = config.fingerprint()
+        with pool.arena(config) as arena:
+            uuid = arena.uuid
+            arena.environment.step("Alice", "Hello")
+        # Building the arena does not modify the config
+        self.assertEqual(config.fingerprint(), fingerprint)
+
+        # An equal config loaded separately gets the same arena, reset
+        with pool.arena(make_config()) as reused:
+            self.assertIs(reused, arena)
+            self.assertNotEqual(reused.uuid, uuid)
+            self.assertEqual(reused.environment.get_observation(), [])
+        self.assertEqual((pool.num_created, pool.num_reused), (1, 1))
+
+        # A different config gets a new arena
+        with pool.arena(make_config(["Carol", "Dave"])) as other:
+            self.assertIsNot(other, arena)
+        self.assertEqual(pool.num_idle, 2)
+
+    def test_discard_on_error(self):
+        pool = ArenaPool()
+        with self.assertRaises(RuntimeError):
+            with pool.arena(make_config()):
+                raise RuntimeError("game failed")
+        self.assertEqual(pool.num_idle, 0)
+        with self.assertRaises(ValueError):
+            pool.release(Arena.from_config(make_config()))
+
+    def test_concurrent(self):
+        pool = ArenaPool(max_idle_per_config=2)
+        config = make_config()
+        barrier = threading.Barrier(4)
+
+        def play(_):
+            with pool.arena(config) as arena:
+                barrier.wait()  # all the arenas are in use at the same time
+                return id(arena)
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            ids = list(executor.map(play, range(4)))
+        self.assertEqual(len(set(ids)), 4)
+        self.assertEqual(pool.num_idle, 2)
+        pool.clear()
+        self.assertEqual(pool.num_idle, 0)
+
+    def test_dropped_arenas_are_closed(self):
+        pool = ArenaPool(max_idle_per_config=1)
+        config = make_config()
+        with mock.patch.object(Arena, "close", autospec=True) as close:
+            first, second = pool.acquire(config), pool.acquire(config)
+            pool.release(first)
+            close.assert_not_called()
+            # The pool is full, so the second arena is dropped
+            pool.release(second)
+            close.assert_called_once_with(second)
+
+            with self.assertRaises(RuntimeError):
+                with pool.arena(config) as failed:
+                    raise RuntimeError("game failed")
+            close.assert_called_with(failed)
+
+            pool.clear()
+            self.assertEqual(close.call_count, 2)
+            self.assertEqual(pool.num_idle, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,156 @@
+import itertools
+import unittest
+from unittest import TestCase
+
+from chatarena.backends import IntelligenceBackend, register_backend
+from chatarena.config import ArenaConfig
+from chatarena.pool import ArenaPool
+from chatarena.sweep import run_sweep
+
+
+@register_backend
+class TemperatureBackend(IntelligenceBackend):
+    """Answers with its temperature, and fails for negative temperatures."""
+
+    stateful = False
+    type_name = "test-temperature"
+
+    def __init__(self, temperature: float, **kwargs):
+        super().__init__(temperature=temperature, **kwargs)
+        self.temperature = temperature
+
+    def query(self, *args, **kwargs) -> str:
+        if self.temperature < 0:
+            raise ValueError("negative temperature")
+        return str(self.temperature)
+
+    async def async_query(self, *args, **kwargs) -> str:
+        return self.query(*args, **kwargs)
+
+
+def make_config(sweep=None):
+    config = {
+        "players": [
+            {
+                "name": name,
+                "role_desc": "You chat.",
+                "backend": {"backend_type": "test-temperature", "temperature": 0.7},
+            }
+            for name in ["Alice", "Bob"]
+        ],
+        "environment": {"env_type": "conversation"},
+    }
+    if sweep is not None:
+        config["sweep"] = sweep
+    return ArenaConfig(config)
+
+
+class TestSweepExpansion(TestCase):
+    def test_no_sweep(self):
+        config = make_config()
+        variants = list(config.iter_variants())
+        self.assertEqual(len(variants), 1)
+        self.assertEqual(variants[0], ({}, config))
+
+    def test_grid(self):
+        config = make_config(
+            {
+                "axes": {
+                    "players.0.backend.temperature": [0.1, 0.5, 0.9],
+                    "environment.parallel": [False, True],
+                }
+            }
+        )
+        variants = config.iter_variants()
+        # The variants are built lazily
+        variant, first = next(variants)
+        self.assertEqual(
+            variant,
+            {"players.0.backend.temperature": 0.1, "environment.parallel": False},
+        )
+        self.assertNotIn("sweep", first)
+        self.assertEqual(first.players[0].backend.temperature, 0.1)
+        self.assertEqual(first.players[1].backend.temperature, 0.7)
+        self.assertEqual(len(list(variants)), 5)
+        # The original config is not modified
+        self.assertEqual(config.players[0].backend.temperature, 0.7)
+
+    def test_zip_and_wildcard(self):
+        config = make_config(
+            {
+                "mode": "zip",
+                "axes": {
+                    "players.*.backend.temperature": [0.1, 0.2],
+                    "players.1.role_desc": ["a", "b"],
+                },
+            }
+        )
+        configs = [c for _, c in config.iter_variants()]
+        self.assertEqual(len(configs), 2)
+        self.assertEqual(
+            [p.backend.temperature for p in configs[1].players], [0.2, 0.2]
+        )
+        self.assertEqual(configs[1].players[1].role_desc, "b")
+
+        config["sweep"]["axes"]["players.1.role_desc"] = ["a"]
+        with self.assertRaises(ValueError):
+            list(config.iter_variants())
+
+    def test_random(self):
+        sweep = {
+            "mode": "random",
+            "num_samples": 1000,
+            "seed": 0,
+            "axes": {
+                "players.0.backend.temperature": {"low": 0.0, "high": 1.0},
+                "players.1.backend.temperature": [0.1, 0.2],
+            },
+        }
+        # An infinite-like sample count is fine, as nothing is materialized
+        variants = list(itertools.islice(make_config(sweep).iter_variants(), 5))
+        again = list(itertools.islice(make_config(sweep).iter_variants(), 5))
+        self.assertEqual(variants, again)
+        for variant, _ in variants:
+            self.assertTrue(0 <= variant["players.0.backend.temperature"] <= 1)
+            self.assertIn(variant["players.1.backend.temperature"], [0.1, 0.2])
+
+        with self.assertRaises(ValueError):
+            make_config({"mode": "random", "axes": sweep["axes"]})
+        with self.assertRaises(KeyError):
+            list(make_config({"axes": {"players.x.name": ["a"]}}).iter_variants())
+
+
+class TestRunSweep(TestCase):
+    def test_run_sweep(self):
+        config = make_config(
+            {"axes": {"players.1.backend.temperature": [0.3, -1.0, 0.5]}}
+        )
+        seen = []
+        results = run_sweep(
+            config,
+            games_per_variant=3,
+            max_steps=4,
+            max_workers=2,
+            max_pending=2,
+            on_result=lambda variant, rewards, num_steps: seen.append(variant),
+        )
+        self.assertEqual(len(results), 3)
+        self.assertEqual([r["games"] for r in results], [3, 0, 3])
+        self.assertEqual([r["failed"] for r in results], [0, 3, 0])
+        self.assertEqual(results[0]["mean_steps"], 4)
+        self.assertEqual(results[2]["mean_rewards"], {"Alice": 0.0, "Bob": 0.0})
+        self.assertEqual(len(seen), 6)
+
+    def test_run_sweep_with_pool(self):
+        config = make_config({"axes": {"players.1.backend.temperature": [0.3, 0.5]}})
+        pool = ArenaPool()
+        results = run_sweep(
+            config, games_per_variant=4, max_steps=2, max_workers=1, pool=pool
+        )
+        self.assertEqual([r["games"] for r in results], [4, 4])
+        # One arena per variant, reused for the other games
+        self.assertEqual((pool.num_created, pool.num_reused), (2, 6))
+
+
+if __name__ == "__main__":
+    unittest.main()
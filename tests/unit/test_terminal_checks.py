@@ -0,0 +1,116 @@
+import unittest
+from unittest import TestCase
+
+from chatarena.agent import Moderator
+from chatarena.backends import IntelligenceBackend
+from chatarena.config import AgentConfig, BackendConfig
+from chatarena.message import Message
+from chatarena.terminal_checks import (
+    BudgetCheck,
+    KeywordCheck,
+    MaxTurnsCheck,
+    RepeatedMessageCheck,
+    load_terminal_check,
+)
+
+
+class CountingBackend(IntelligenceBackend):
+    stateful = False
+    type_name = "test-counting"
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.num_queries = 0
+
+    def query(self, *args, **kwargs) -> str:
+        self.num_queries += 1
+        return "no"
+
+    async def async_query(self, *args, **kwargs) -> str:
+        return self.query(*args, **kwargs)
+
+
+class TestTerminalChecks(TestCase):
+    def test_max_turns(self):
+        check = MaxTurnsCheck(max_turns=3)
+        self.assertIsNone(check([Message("player1", "hi", 2)]))
+        self.assertTrue(check([Message("player1", "hi", 3)]))
+
+    def test_keyword(self):
+        check = KeywordCheck(keywords=["game over"], patterns=[r"winner is \w+"])
+        self.assertIsNone(check([Message("player1", "let's play", 1)]))
+        self.assertTrue(check([Message("player1", "GAME OVER!", 1)]))
+        self.assertTrue(check([Message("player1", "The winner is Bob", 1)]))
+
+    def test_repeated_message(self):
+        check = RepeatedMessageCheck(num_repeats=2)
+        history = [
+            Message("player1", "I agree.", 1),
+            Message("player2", "Fine.", 2),
+            Message("Moderator", "Continue.", 2),
+        ]
+        self.assertIsNone(check(history))
+        history.append(Message("player1", "i agree. ", 3))
+        self.assertTrue(check(history))
+
+    def test_budget(self):
+        check = BudgetCheck(max_characters=10)
+        history = [Message("player1", "hello", 1)]
+        self.assertIsNone(check(history))
+        history.append(Message("player2", "world", 2))
+        self.assertTrue(check(history))
+        self.assertTrue(BudgetCheck(max_messages=2)(history))
+
+    def test_load_from_config(self):
+        check = load_terminal_check({"check_type": "max_turns", "max_turns": 5})
+        self.assertIsInstance(check, MaxTurnsCheck)
+        self.assertEqual(load_terminal_check(check.to_config()).max_turns, 5)
+        with self.assertRaises(ValueError):
+            load_terminal_check({"check_type": "unknown"})
+
+
+class TestModeratorFastPath(TestCase):
+    def test_rules_skip_the_backend(self):
+        backend = CountingBackend()
+        moderator = Moderator(
+            role_desc="moderator",
+            backend=backend,
+            terminal_condition="Is it over?",
+            terminal_checks=[{"check_type": "max_turns", "max_turns": 3}],
+        )
+        self.assertFalse(moderator.is_terminal([Message("player1", "hi", 1)]))
+        self.assertEqual(backend.num_queries, 1)
+        self.assertTrue(moderator.is_terminal([Message("player1", "hi", 3)]))
+        self.assertEqual(backend.num_queries, 1)
+
+    def test_llm_check_period(self):
+        backend = CountingBackend()
+        moderator = Moderator(
+            role_desc="moderator",
+            backend=backend,
+            terminal_condition="Is it over?",
+            llm_check_period=3,
+        )
+        history = [Message("player1", "hi", 1)]
+        for _ in range(6):
+            self.assertFalse(moderator.is_terminal(history))
+        self.assertEqual(backend.num_queries, 2)
+
+    def test_config_round_trip(self):
+        config = AgentConfig(
+            role_desc="moderator",
+            backend=BackendConfig(backend_type="human"),
+            terminal_condition="Is it over?",
+            terminal_checks=[{"check_type": "keyword", "keywords": ["bye"]}],
+            llm_check_period=2,
+        )
+        moderator = Moderator.from_config(config)
+        self.assertIsInstance(moderator.terminal_checks[0], KeywordCheck)
+        self.assertEqual(moderator.to_config()["llm_check_period"], 2)
+        self.assertEqual(
+            moderator.to_config()["terminal_checks"][0]["check_type"], "keyword"
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,193 @@
+import os
+import tempfile
+import unittest
+from typing import List
+from unittest import TestCase
+
+import pytest
+
+from chatarena.backends import IntelligenceBackend, register_backend
+from chatarena.config import AgentConfig, BackendConfig, EnvironmentConfig
+from chatarena.environments import Environment, TimeStep, register_env
+from chatarena.message import Message, MessagePool
+
+np = pytest.importorskip("numpy")
+
+from chatarena.tournament import EloRatings, Tournament, TrueSkillRatings  # noqa: E402
+
+
+@register_backend
+class NumberBackend(IntelligenceBackend):
+    stateful = False
+    type_name = "test-number"
+
+    def __init__(self, number: int, **kwargs):
+        super().__init__(number=number, **kwargs)
+        self.number = number
+
+    def query(self, *args, **kwargs) -> str:
+        if self.number < 0:
+            raise RuntimeError("backend is down")
+        return str(self.number)
+
+    async def async_query(self, *args, **kwargs) -> str:
+        return self.query(*args, **kwargs)
+
+
+@register_env
+class HighestNumber(Environment):
+    """Each player says a number, the highest number wins."""
+
+    type_name = "test-highest-number"
+
+    def __init__(self, player_names: List[str], **kwargs):
+        super().__init__(player_names=player_names, **kwargs)
+        self.message_pool = MessagePool()
+        self.reset()
+
+    def reset(self):
+        self.turn = 0
+        self.message_pool.reset()
+        return TimeStep(observation=[], reward=None, terminal=False)
+
+    def get_next_player(self) -> str:
+        return self.player_names[self.turn % self.num_players]
+
+    def get_observation(self, player_name=None) -> List[Message]:
+        return self.message_pool.get_all_messages()
+
+    def step(self, player_name: str, action: str) -> TimeStep:
+        self.message_pool.append_message(Message(player_name, action, self.turn))
+        self.turn += 1
+        terminal = self.turn == self.num_players
+        reward = None
+        if terminal:
+            numbers = {m.agent_name: int(m.content) for m in self.get_observation()}
+            best = max(numbers.values())
+            reward = {name: float(n == best) for name, n in numbers.items()}
+        return TimeStep(self.get_observation(), reward, terminal)
+
+
+@register_env
+class HighestNumberWithBonus(HighestNumber):
+    """Like HighestNumber, with a bonus of 0.5 for each number said."""
+
+    type_name = "test-highest-number-bonus"
+
+    def step(self, player_name: str, action: str) -> TimeStep:
+        timestep = super().step(player_name, action)
+        reward = timestep.reward or {name: 0.0 for name in self.player_names}
+        reward[player_name] += 0.5
+        return TimeStep(timestep.observation, reward, timestep.terminal)
+
+
+def make_players(numbers):
+    return [
+        AgentConfig(
+            name=f"config{number}",
+            role_desc="Say a number.",
+            backend=BackendConfig(backend_type="test-number", number=number),
+        )
+        for number in numbers
+    ]
+
+
+ENVIRONMENT = EnvironmentConfig(env_type="test-highest-number")
+
+
+class TestRatings(TestCase):
+    def test_elo(self):
+        ratings = EloRatings(3)
+        ratings.update(np.array([0, 1]), np.array([2, 0]), np.array([1.0, 0.5]))
+        # Both games are rated from the ratings before the round
+        np.testing.assert_allclose(ratings.ratings, [1516, 1500, 1484])
+
+    def test_trueskill(self):
+        ratings = TrueSkillRatings(2)
+        ratings.update(np.array([0]), np.array([1]), np.array([1.0]))
+        self.assertGreater(ratings.mu[0], 25)
+        self.assertLess(ratings.mu[1], 25)
+        self.assertAlmostEqual(ratings.mu[0] - 25, 25 - ratings.mu[1])
+        self.assertTrue(np.all(ratings.sigma < 25 / 3))
+        # A draw between equal players does not change the means
+        ratings = TrueSkillRatings(2)
+        ratings.update(np.array([0]), np.array([1]), np.array([0.5]))
+        np.testing.assert_allclose(ratings.mu, [25, 25])
+
+
+class TestTournament(TestCase):
+    def test_round_robin(self):
+        tournament = Tournament(make_players([1, 3, 2, 4, 0]), ENVIRONMENT)
+        # Every pair plays exactly once in the rounds, and every config at most once per round
+        rounds = tournament.round_robin_rounds()
+        pairs = [frozenset(pair) for pairs in rounds for pair in pairs]
+        self.assertEqual(len(pairs), 10)
+        self.assertEqual(len(set(pairs)), 10)
+        for pairs in rounds:
+            players = [player for pair in pairs for player in pair]
+            self.assertEqual(len(players), len(set(players)))
+
+        standings = tournament.run()
+        self.assertEqual(
+            [record["name"] for record in standings],
+            ["config4", "config3", "config2", "config1", "config0"],
+        )
+        self.assertEqual(standings[0]["wins"], 8)
+        self.assertEqual(tournament.num_played, 20)
+
+    def test_swiss_with_seat_names(self):
+        tournament = Tournament(
+            make_players([1, 3, 2, 4]),
+            ENVIRONMENT,
+            pairing="swiss",
+            rating="trueskill",
+            seat_names=["first", "second"],
+        )
+        standings = tournament.run()
+        self.assertEqual(standings[0]["name"], "config4")
+        # Two rounds without rematches
+        self.assertEqual(len(tournament.results), 8)
+        played = {frozenset(result.players) for result in tournament.results}
+        self.assertEqual(len(played), 4)
+
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache_path = os.path.join(directory, "results.jsonl")
+            Tournament(make_players([1, 2]), ENVIRONMENT, cache_path=cache_path).run()
+
+            # Only the games of the new config are played
+            tournament = Tournament(
+                make_players([1, 2, 3]), ENVIRONMENT, cache_path=cache_path
+            )
+            standings = tournament.run()
+            self.assertEqual(tournament.num_played, 4)
+            self.assertEqual(sum(record["games"] for record in standings), 12)
+
+    def test_finished_games_are_cached_when_a_game_fails(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache_path = os.path.join(directory, "results.jsonl")
+            tournament = Tournament(
+                make_players([1, 2, -1]), ENVIRONMENT, cache_path=cache_path
+            )
+            with self.assertRaises(RuntimeError):
+                tournament.run()
+
+            # The games between the working configs are not played again
+            tournament = Tournament(
+                make_players([1, 2]), ENVIRONMENT, cache_path=cache_path
+            )
+            tournament.run()
+            self.assertEqual(tournament.num_played, 0)
+
+    def test_rewards_are_summed_over_the_game(self):
+        tournament = Tournament(
+            make_players([1, 2]),
+            EnvironmentConfig(env_type="test-highest-number-bonus"),
+            games_per_pair=1,
+        )
+        tournament.run()
+        self.assertEqual(tournament.results[0].rewards, (0.5, 1.5))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import TestCase
+
+from chatarena.agent import Player
+from chatarena.arena import Arena
+from chatarena.backends import IntelligenceBackend, register_backend
+from chatarena.environments.conversation import Conversation
+from chatarena.tracing import Tracer, get_tracer, span, tracing
+
+
+@register_backend
+class EchoBackend(IntelligenceBackend):
+    stateful = False
+    type_name = "test-echo"
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+
+    def query(self, agent_name, role_desc, history_messages, *args, **kwargs) -> str:
+        with span("backend.request"):
+            return f"{agent_name} has seen {len(history_messages)} messages"
+
+    async def async_query(self, *args, **kwargs) -> str:
+        return self.query(*args, **kwargs)
+
+
+def make_arena():
+    player_names = ["player1", "player2"]
+    players = [
+        Player(name=name, role_desc="You chat.", backend=EchoBackend())
+        for name in player_names
+    ]
+    return Arena(players=players, environment=Conversation(player_names=player_names))
+
+
+class TestTracing(TestCase):
+    def test_disabled(self):
+        self.assertIsNone(get_tracer())
+        with span("arena.step") as disabled:
+            self.assertIsNone(disabled)
+        make_arena().run(num_steps=2)
+
+    def test_arena_spans(self):
+        arena = make_arena()
+        with tracing() as tracer:
+            arena.run(num_steps=3)
+        self.assertIsNone(get_tracer())
+        arena.run(num_steps=1)  # not traced
+
+        summary = {row["name"]: row for row in tracer.summary()}
+        for name in [
+            "arena.step",
+            "environment.get_observation",
+            "player.act",
+            "player.recall",
+            "backend.query",
+            "backend.request",
+            "environment.check_action",
+            "environment.step",
+        ]:
+            self.assertEqual(summary[name]["count"], 3, name)
+
+        # The spans are nested, and the self time excludes the nested spans
+        depths = {span.name: span.depth for span in tracer.spans}
+        self.assertEqual(depths["arena.step"], 0)
+        self.assertEqual(depths["player.act"], 1)
+        self.assertEqual(depths["backend.request"], 3)
+        step = summary["arena.step"]
+        self.assertLess(step["self_ms"], step["total_ms"])
+        self.assertEqual(
+            {span.args["player"] for span in tracer.spans if span.name == "player.act"},
+            {"player1", "player2"},
+        )
+        self.assertIn("backend.query", tracer.format_summary())
+
+    def test_chrome_trace(self):
+        with tracing(Tracer(max_spans=2)) as tracer:
+            with span("outer", size=3):
+                with span("inner"):
+                    pass
+                with self.assertRaises(KeyError):
+                    with span("failing"):
+                        raise KeyError("error")
+        self.assertEqual(tracer.num_dropped, 1)
+        self.assertEqual([span.name for span in tracer.spans], ["inner", "failing"])
+        self.assertEqual(tracer.spans[1].args, {"error": "KeyError"})
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "trace.json")
+            tracer.export_chrome_trace(path)
+            with open(path) as f:
+                trace = json.load(f)
+        events = trace["traceEvents"]
+        self.assertEqual([event["ph"] for event in events], ["X", "X"])
+        self.assertEqual(events[0]["name"], "inner")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import gzip
+import json
+import os
+import tempfile
+import unittest
+from unittest import TestCase
+
+from chatarena.agent import Player
+from chatarena.arena import Arena
+from chatarena.config import BackendConfig
+from chatarena.environments.conversation import Conversation
+from chatarena.message import Message
+from chatarena.pettingzoo_compatibility import PettingZooParallelCompatibilityV0
+from chatarena.trajectory import ParallelTrajectoryRecorder
+from chatarena.writers import ShardedJSONLWriter
+
+
+def read_shards(paths):
+    records = []
+    for path in paths:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt") as f:
+            records.extend(json.loads(line) for line in f)
+    return records
+
+
+class TestShardedJSONLWriter(TestCase):
+    def test_write_and_rotate(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with ShardedJSONLWriter(
+                directory, compression=None, max_shard_bytes=100
+            ) as writer:
+                for i in range(10):
+                    writer.write({"i": i, "message": Message("player1", "x" * 20, i)})
+            self.assertGreater(len(writer.shard_paths), 1)
+            records = read_shards(writer.shard_paths)
+            self.assertEqual([r["i"] for r in records], list(range(10)))
+            self.assertEqual(records[0]["message"]["content"], "x" * 20)
+
+            # A new writer never overwrites the existing shards
+            with ShardedJSONLWriter(directory) as new_writer:
+                new_writer.write({"i": 10})
+            self.assertNotIn(new_writer.shard_paths[0], writer.shard_paths)
+            self.assertTrue(new_writer.shard_paths[0].endswith(".jsonl.gz"))
+            self.assertEqual(read_shards(new_writer.shard_paths), [{"i": 10}])
+
+    def test_flush(self):
+        with tempfile.TemporaryDirectory() as directory:
+            writer = ShardedJSONLWriter(directory, compression=None)
+            writer.write({"i": 0})
+            writer.flush()
+            self.assertEqual(read_shards(writer.shard_paths), [{"i": 0}])
+            writer.close()
+            with self.assertRaises(ValueError):
+                writer.write({"i": 1})
+
+
+class TestParallelTrajectoryRecorder(TestCase):
+    def test_record_episodes(self):
+        player_names = ["player1", "player2"]
+        players = [
+            Player(
+                name=name,
+                role_desc="You play rock-paper-scissors.",
+                backend=BackendConfig(backend_type="human"),
+            )
+            for name in player_names
+        ]
+        arena = Arena(
+            players=players,
+            environment=Conversation(player_names=player_names, parallel=True),
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            env = ParallelTrajectoryRecorder(
+                PettingZooParallelCompatibilityV0(env=arena, max_turns=2),
+                directory=directory,
+            )
+            for _ in range(2):
+                env.reset()
+                while env.agents:
+                    env.step({agent: "rock" for agent in env.agents})
+            env.close()
+
+            self.assertEqual(env.num_episodes, 2)
+            episodes = read_shards(env.writer.shard_paths)
+            self.assertEqual(len(episodes), 2)
+            self.assertEqual(episodes[0]["env"], "PettingZooParallelCompatibilityV0")
+            steps = episodes[1]["steps"]
+            self.assertEqual(len(steps), 2)
+            self.assertEqual(
+                steps[1]["observations"]["player1"], "player1: rockplayer2: rock"
+            )
+            self.assertTrue(steps[1]["truncations"]["player2"])
+            self.assertEqual(os.listdir(directory), ["shard-00000.jsonl.gz"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,232 @@
+import os
+import tempfile
+import unittest
+from unittest import TestCase, mock
+
+import pytest
+
+pytest.importorskip("langchain")
+
+from langchain.schema import AIMessage, HumanMessage, SystemMessage  # noqa: E402
+
+from chatarena.agent import Player  # noqa: E402
+from chatarena.arena import Arena  # noqa: E402
+from chatarena.config import BackendConfig  # noqa: E402
+from chatarena.environments.umshini import (  # noqa: E402
+    DebateEnv,
+    SymmetricContentModerationEnv,
+    SymmetricDeceptionEnv,
+)
+from chatarena.environments.umshini.judge import JudgeService  # noqa: E402
+from chatarena.message import Message  # noqa: E402
+
+
+class FakeClient:
+    def __init__(self):
+        self.num_calls = 0
+
+    def __call__(self, messages):
+        self.num_calls += 1
+        return AIMessage(content=f"VIOLATION: False\nverdict {self.num_calls}")
+
+
+class TestJudgeService(TestCase):
+    def make_service(self, **kwargs):
+        service = JudgeService(**kwargs)
+        client = FakeClient()
+        service._clients[("openai", "gpt-3.5-turbo")] = client
+        return service, client
+
+    def test_verdicts_are_memoized(self):
+        service, client = self.make_service()
+        messages = [SystemMessage(content="policy"), HumanMessage(content="attack")]
+        first = service.judge(messages)
+        second = service.judge(list(messages))
+        self.assertIs(first, second)
+        self.assertEqual(client.num_calls, 1)
+        self.assertEqual((service.hits, service.misses), (1, 1))
+
+        # A different policy or message is a different judgment
+        service.judge([SystemMessage(content="other"), HumanMessage(content="attack")])
+        self.assertEqual(client.num_calls, 2)
+
+    def test_cache_is_bounded(self):
+        service, client = self.make_service(cache_size=1)
+        first = [HumanMessage(content="a")]
+        service.judge(first)
+        service.judge([HumanMessage(content="b")])
+        service.judge(first)
+        self.assertEqual(client.num_calls, 3)
+
+    def test_repeated_attack_at_another_turn_hits_the_cache(self):
+        service, client = self.make_service()
+        env = SymmetricDeceptionEnv(
+            player_names=["Agent1", "Agent2"],
+            restricted_action="open the door",
+            round_length=4,
+        )
+        with mock.patch(
+            "chatarena.environments.umshini.symmetric_deception.get_judge_service",
+            return_value=service,
+        ):
+            for turn in [2, 6]:
+                env._judge_message(Message("Agent2", "I will open the door", turn))
+        self.assertEqual(client.num_calls, 1)
+        self.assertEqual((service.hits, service.misses), (1, 1))
+
+    def test_clients_are_pooled(self):
+        service = JudgeService()
+        client = FakeClient()
+        service._clients[("openai", "gpt-4")] = client
+        self.assertIs(service.get_client("gpt-4"), client)
+
+
+class TestDeferredJudging(TestCase):
+    def play(self, env, verdict):
+        judged = []
+
+        def fake_judge(message, model_name="gpt-3.5-turbo"):
+            judged.append(message.content)
+            return AIMessage(content=verdict)
+
+        env._judge_message = fake_judge
+        timesteps = []
+        for turn in range(4):
+            player_name = env.get_next_player()
+            timesteps.append(env.step(player_name, f"message {turn}"))
+        return timesteps, judged
+
+    def check_episode(self, env_cls, verdict, **kwargs):
+        env = env_cls(
+            player_names=["Agent1", "Agent2"],
+            round_length=2,
+            judging_mode="episode_end",
+            **kwargs,
+        )
+        timesteps, judged = self.play(env, verdict)
+        # Turns are not blocked on the judge, all rewards come with the terminal step
+        for timestep in timesteps[:-1]:
+            self.assertEqual(sum(timestep.reward.values()), 0.0)
+        self.assertTrue(timesteps[-1].terminal)
+        self.assertEqual(judged, ["message 1", "message 3"])
+        self.assertEqual(timesteps[-1].reward, {"Agent1": 1.0, "Agent2": 1.0})
+        judgements = [
+            m.content
+            for m in env.message_pool.get_all_messages()
+            if m.content.startswith("JUDGEMENT")
+        ]
+        self.assertEqual(len(judgements), 2)
+
+    def test_symmetric_deception(self):
+        self.check_episode(
+            SymmetricDeceptionEnv,
+            "VIOLATION: True\nEXPLANATION: done",
+            restricted_action="open the door",
+        )
+
+    def test_symmetric_content_moderation(self):
+        self.check_episode(
+            SymmetricContentModerationEnv,
+            "JUDGEMENT: This response violates the policy.\nEXPLANATION: done",
+            moderation_policy="do not say you are sentient",
+        )
+
+    def test_background_matches_sync(self):
+        rewards = {}
+        for mode in ["sync", "background"]:
+            env = SymmetricDeceptionEnv(
+                player_names=["Agent1", "Agent2"],
+                restricted_action="open the door",
+                round_length=2,
+                judging_mode=mode,
+            )
+            timesteps, _ = self.play(env, "VIOLATION: False\nEXPLANATION: done")
+            totals = {"Agent1": 0.0, "Agent2": 0.0}
+            for timestep in timesteps:
+                for name, reward in timestep.reward.items():
+                    totals[name] += reward
+            rewards[mode] = totals
+        self.assertEqual(rewards["sync"], rewards["background"])
+
+    def test_deferred_announcements_keep_their_turn(self):
+        announcements = {}
+        for mode in ["sync", "episode_end"]:
+            env = SymmetricDeceptionEnv(
+                player_names=["Agent1", "Agent2"],
+                restricted_action="open the door",
+                round_length=2,
+                judging_mode=mode,
+            )
+            self.play(env, "VIOLATION: False\nEXPLANATION: done")
+            announcements[mode] = sorted(
+                (m.turn, m.content)
+                for m in env.message_pool.get_all_messages()
+                if m.content.startswith("JUDGEMENT")
+            )
+        self.assertEqual([turn for turn, _ in announcements["sync"]], [2, 4])
+        self.assertEqual(announcements["episode_end"], announcements["sync"])
+
+    def test_checkpoint_with_pending_judgment(self):
+        def make_arena():
+            env = SymmetricDeceptionEnv(
+                player_names=["Agent1", "Agent2"],
+                restricted_action="open the door",
+                round_length=2,
+                judging_mode="episode_end",
+            )
+            players = [
+                Player(
+                    name=name,
+                    role_desc="You play.",
+                    backend=BackendConfig(backend_type="human"),
+                )
+                for name in ["Agent1", "Agent2"]
+            ]
+            return Arena(players=players, environment=env)
+
+        verdict = AIMessage(content="VIOLATION: True\nEXPLANATION: done")
+        with mock.patch.object(
+            SymmetricDeceptionEnv, "_judge_message", return_value=verdict
+        ), tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "arena.ckpt")
+            arena = make_arena()
+            env = arena.environment
+            for turn in range(2):
+                env.step(env.get_next_player(), f"message {turn}")
+            self.assertEqual(len(env._pending_judgments), 1)
+            arena.checkpoint(path)
+
+            restored = make_arena()
+            restored.restore(path)
+            # The queued verdict is announced and its reward comes with the terminal step
+            for env in [arena.environment, restored.environment]:
+                for turn in range(2, 4):
+                    timestep = env.step(env.get_next_player(), f"message {turn}")
+                self.assertTrue(timestep.terminal)
+                self.assertEqual(timestep.reward, {"Agent1": 1.0, "Agent2": 1.0})
+                judgements = [
+                    m
+                    for m in env.message_pool.get_all_messages()
+                    if m.content.startswith("JUDGEMENT")
+                ]
+                self.assertEqual(len(judgements), 2)
+
+
+class TestPromptTemplates(TestCase):
+    def test_class_template_is_not_mutated(self):
+        template = DebateEnv._moderator_prompt_template.template
+        envs = [
+            DebateEnv(player_names=[f"A{i}", f"B{i}"], topic="tea", round_length=2)
+            for i in range(3)
+        ]
+        self.assertEqual(DebateEnv._moderator_prompt_template.template, template)
+        for i, env in enumerate(envs):
+            opening = env.message_pool.last_message.content
+            self.assertEqual(opening.count("Proponent, and"), 1)
+            self.assertIn(f"A{i} is playing as the Proponent", opening)
+            env.reset()
+            self.assertEqual(env.message_pool.last_message.content, opening)
+
+
+if __name__ == "__main__":
+    unittest.main()
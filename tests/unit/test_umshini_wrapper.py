@@ -0,0 +1,212 @@
+import gzip
+import json
+import os
+import tempfile
+import unittest
+from unittest import TestCase
+
+import pytest
+
+pytest.importorskip("langchain")
+
+from chatarena.environments.umshini import (  # noqa: E402
+    PettingZooCompatibilityV0,
+    make_vector_env,
+)
+from chatarena.trajectory import TrajectoryRecorder  # noqa: E402
+
+
+class TestIncrementalObservations(TestCase):
+    def check_env(self, string_observation, **kwargs):
+        env = PettingZooCompatibilityV0(
+            round_length=4,
+            disable_judging=True,
+            string_observation=string_observation,
+            **kwargs,
+        )
+        for _ in range(2):
+            env.reset()
+            for agent in env.agent_iter():
+                observation, reward, termination, truncation, info = env.last()
+                # The incremental view matches a full rebuild from the message pool
+                messages = env._env.get_observation(agent)
+                new_messages = [m for m in messages if m.turn == messages[-1].turn]
+                self.assertEqual(info["all_messages"], messages)
+                self.assertEqual(info["new_messages"], new_messages)
+                if string_observation:
+                    self.assertEqual(
+                        info["all_messages_string"],
+                        "".join(
+                            f"[{m.agent_name}->all]: {m.content}\n" for m in messages
+                        ),
+                    )
+                    self.assertEqual(
+                        observation,
+                        "".join(f"{m.agent_name}: {m.content}" for m in new_messages),
+                    )
+                else:
+                    self.assertEqual(
+                        observation, {m.agent_name: m.content for m in new_messages}
+                    )
+                action = None if termination or truncation else f"Hello from {agent}"
+                env.step(action)
+
+    def test_debate(self):
+        self.check_env(True, env_name="debate", topic="Tea is better than coffee")
+
+    def test_symmetric_deception(self):
+        self.check_env(
+            False, env_name="symmetric_deception", restricted_action="open the door"
+        )
+
+    def test_content_moderation(self):
+        self.check_env(True, env_name="content_moderation", moderation_policy="be kind")
+
+    def test_infos_are_not_mutated(self):
+        env = PettingZooCompatibilityV0(
+            env_name="debate", topic="Tea", round_length=4, disable_judging=True
+        )
+        env.reset()
+        info = env.last()[-1]
+        all_messages, all_messages_string = (
+            info["all_messages"],
+            info["all_messages_string"],
+        )
+        num_messages = len(all_messages)
+        env.step("Hello")
+        env.last()
+        self.assertEqual(len(all_messages), num_messages)
+        self.assertTrue(
+            env.infos[env.agent_selection]["all_messages_string"].startswith(
+                all_messages_string
+            )
+        )
+
+    def test_history_is_not_copied_every_step(self):
+        env = PettingZooCompatibilityV0(
+            env_name="debate", topic="Tea", round_length=20, disable_judging=True
+        )
+        env.reset()
+        views = {
+            agent: (view["messages"], view["lines"])
+            for agent, view in env._views.items()
+        }
+        infos = []
+        for agent in env.agent_iter():
+            observation, reward, termination, truncation, info = env.last()
+            # The views grow in place, and the history is not copied into infos nobody reads it from
+            self.assertIs(env._views[agent]["messages"], views[agent][0])
+            self.assertIs(env._views[agent]["lines"], views[agent][1])
+            self.assertFalse(dict.__contains__(info, "all_messages"))
+            self.assertFalse(dict.__contains__(info, "all_messages_string"))
+            infos.append((info, list(env._env.get_observation(agent))))
+            env.step(None if termination or truncation else "Hello")
+        self.assertGreater(len(infos), 20)
+
+        # The snapshots of old infos are the history at their step
+        for info, messages in infos:
+            self.assertEqual(info["all_messages"], messages)
+            self.assertEqual(
+                info["all_messages_string"],
+                "".join(f"[{m.agent_name}->all]: {m.content}\n" for m in messages),
+            )
+
+
+class TestVectorEnv(TestCase):
+    def run_vector_env(self, mode):
+        envs = make_vector_env(
+            num_envs=3,
+            mode=mode,
+            env_name="debate",
+            topic="Tea is better than coffee",
+            round_length=2,
+            disable_judging=True,
+        )
+        observations, infos = envs.reset(seed=0)
+        self.assertEqual(len(observations), 3)
+        num_finished = 0
+        for _ in range(4):  # two games of two turns in each environment
+            (
+                agents,
+                observations,
+                rewards,
+                terminations,
+                truncations,
+                infos,
+            ) = envs.last()
+            actions = [
+                None if termination or truncation else f"Hello from {agent}"
+                for agent, termination, truncation in zip(
+                    agents, terminations, truncations
+                )
+            ]
+            agents, observations, rewards, terminations, truncations, infos = envs.step(
+                actions
+            )
+            for termination, truncation, info in zip(terminations, truncations, infos):
+                if termination or truncation:
+                    # The environment has been reset, and the finished game is reported in the info
+                    num_finished += 1
+                    self.assertIn("final_observation", info)
+                    self.assertIn("episode_rewards", info)
+                    self.assertEqual(info["turn"], 0)
+        envs.close()
+        self.assertEqual(num_finished, 6)
+
+    def test_thread_mode(self):
+        self.run_vector_env("thread")
+
+    def test_process_mode(self):
+        self.run_vector_env("process")
+
+
+class TestTrajectoryRecorder(TestCase):
+    def test_record_episode(self):
+        with tempfile.TemporaryDirectory() as directory:
+            env = TrajectoryRecorder(
+                PettingZooCompatibilityV0(
+                    env_name="debate",
+                    topic="Tea is better than coffee",
+                    round_length=2,
+                    disable_judging=True,
+                ),
+                directory=directory,
+                prefix="debate",
+            )
+            env.reset()
+            for agent in env.agent_iter():
+                observation, reward, termination, truncation, info = env.last()
+                env.step(None if termination or truncation else f"Hello from {agent}")
+            env.close()
+
+            self.assertEqual(env.num_episodes, 1)
+            with gzip.open(env.writer.shard_paths[0], "rt") as f:
+                episodes = [json.loads(line) for line in f]
+            steps = episodes[0]["steps"]
+            self.assertEqual(steps[0]["action"], "Hello from Agent1")
+            self.assertNotIn("all_messages", steps[0]["info"])
+            self.assertIsNone(steps[-1]["action"])
+
+    def test_close_keeps_working_directory(self):
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as directory:
+            os.chdir(directory)
+            try:
+                for _ in range(2):
+                    env = PettingZooCompatibilityV0(
+                        env_name="debate",
+                        topic="Tea",
+                        round_length=2,
+                        disable_judging=True,
+                        save_json=True,
+                    )
+                    env.reset()
+                    env.close()
+                    self.assertEqual(os.getcwd(), directory)
+                self.assertEqual(len(os.listdir("env_logs")), 2)
+            finally:
+                os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    unittest.main()